@@ -1,11 +1,19 @@
 from django.contrib import admin
-from .models import Dataset
+from .models import Dataset, EquipmentRecord
 
 
 @admin.register(Dataset)
 class DatasetAdmin(admin.ModelAdmin):
-	list_display = ('id', 'uploaded_at')
+	list_display = ('id', 'owner', 'uploaded_at')
 	readonly_fields = ('uploaded_at',)
-	search_fields = ('file_path',)
+	search_fields = ('file_path', 'owner__username')
 	list_filter = ('uploaded_at',)
+	raw_id_fields = ('owner',)
 
+
+@admin.register(EquipmentRecord)
+class EquipmentRecordAdmin(admin.ModelAdmin):
+	list_display = ('id', 'dataset', 'name', 'type', 'flowrate', 'pressure', 'temperature')
+	list_filter = ('type',)
+	search_fields = ('name',)
+	raw_id_fields = ('dataset',)
@@ -0,0 +1,246 @@
+"""Per-dataset columnar storage for equipment rows.
+
+Each dataset's rows live in ``MEDIA_ROOT/datasets/<key>/`` as one ``.npy``
+file per column plus a small ``meta.json``. ``Dataset.summary`` only keeps
+the relative directory under the ``artifact`` key, and readers memory-map
+the columns instead of decoding JSON.
+"""
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .utils import NUMERIC_COLUMNS, REQUIRED_COLUMNS, MetricColumns
+
+
+ARTIFACT_ROOT = 'datasets'
+ARTIFACT_VERSION = 1
+HISTOGRAMS_FILE = 'histograms.json'
+ANOMALIES_FILE = 'anomalies.json'
+
+FLOAT_COLUMNS = {col: col.lower() for col in NUMERIC_COLUMNS}
+COLUMN_DTYPES = {
+    'flowrate': '<f8',
+    'pressure': '<f8',
+    'temperature': '<f8',
+    'type': '<i4',
+    'name_offsets': '<i8',
+    'name_data': '|u1',
+}
+
+
+def artifact_path(pointer):
+    return os.path.join(settings.MEDIA_ROOT, pointer)
+
+
+def write_json(pointer, name, data):
+    """Store data derived from the rows (e.g. histograms) next to them."""
+    path = os.path.join(artifact_path(pointer), name)
+    # Written aside and renamed, so concurrent readers never see a partial file
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+
+def write_anomalies(pointer, anomalies):
+    """Store ``detect_anomalies`` output: arrays as columns, the rest as JSON.
+
+    Returns the counts that go into the dataset summary.
+    """
+    path = artifact_path(pointer)
+    for name in ('rows', 'scores', 'flags'):
+        np.save(os.path.join(path, f'anomaly_{name}.npy'), anomalies[name])
+    flags = anomalies['flags']
+    counts = {
+        'count': len(flags),
+        'by_metric': {
+            col.lower(): int(np.count_nonzero(flags & (3 << (2 * i))))
+            for i, col in enumerate(NUMERIC_COLUMNS)
+        },
+    }
+    write_json(pointer, ANOMALIES_FILE, {
+        'z_threshold': anomalies['z_threshold'],
+        'iqr_factor': anomalies['iqr_factor'],
+        'bounds': anomalies['bounds'],
+        **counts,
+    })
+    return counts
+
+
+def artifact_size(pointer):
+    """Bytes used on disk by an artifact directory."""
+    if not pointer:
+        return 0
+    with os.scandir(artifact_path(pointer)) as entries:
+        return sum(entry.stat().st_size for entry in entries if entry.is_file())
+
+
+def delete_artifact(pointer):
+    if pointer:
+        shutil.rmtree(artifact_path(pointer), ignore_errors=True)
+
+
+class ColumnarWriter:
+    """Append DataFrame chunks to a new artifact directory.
+
+    Columns are streamed to raw ``.part`` files and turned into ``.npy``
+    files on ``close``, so rows never have to be held in memory at once.
+    Used as a context manager, the directory is removed if an error escapes.
+    """
+
+    def __init__(self):
+        self.pointer = f'{ARTIFACT_ROOT}/{uuid.uuid4().hex}'
+        self.path = artifact_path(self.pointer)
+        os.makedirs(self.path)
+        self.rows = 0
+        self.types = {}
+        self._name_bytes = 0
+        self._parts = {
+            name: open(os.path.join(self.path, f'{name}.part'), 'wb')
+            for name in COLUMN_DTYPES
+        }
+        self._parts['name_offsets'].write(np.zeros(1, dtype='<i8').tobytes())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+    def append(self, df):
+        for col, name in FLOAT_COLUMNS.items():
+            values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='<f8', na_value=np.nan)
+            self._parts[name].write(values.tobytes())
+
+        local_codes, uniques = pd.factorize(df['Type'])
+        mapping = np.array(
+            [self.types.setdefault(eq_type, len(self.types)) for eq_type in uniques] + [-1],
+            dtype='<i4',
+        )
+        self._parts['type'].write(mapping[local_codes].tobytes())
+
+        encoded = [str(name).encode('utf-8') for name in df['Equipment Name'].fillna('')]
+        lengths = np.fromiter((len(name) for name in encoded), dtype='<i8', count=len(encoded))
+        offsets = self._name_bytes + np.cumsum(lengths)
+        self._parts['name_offsets'].write(offsets.astype('<i8').tobytes())
+        self._parts['name_data'].write(b''.join(encoded))
+        if len(offsets):
+            self._name_bytes = int(offsets[-1])
+
+        self.rows += len(df)
+
+    def close(self):
+        lengths = {name: self.rows for name in COLUMN_DTYPES}
+        lengths['name_offsets'] = self.rows + 1
+        lengths['name_data'] = self._name_bytes
+
+        for name, part in self._parts.items():
+            part.close()
+            part_path = os.path.join(self.path, f'{name}.part')
+            with open(part_path, 'rb') as src, open(os.path.join(self.path, f'{name}.npy'), 'wb') as dst:
+                np.lib.format.write_array_header_1_0(dst, {
+                    'descr': np.lib.format.dtype_to_descr(np.dtype(COLUMN_DTYPES[name])),
+                    'fortran_order': False,
+                    'shape': (lengths[name],),
+                })
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.remove(part_path)
+
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump({
+                'version': ARTIFACT_VERSION,
+                'rows': self.rows,
+                'types': [str(eq_type) for eq_type in self.types],
+            }, f)
+        return self.pointer
+
+    def abort(self):
+        for part in self._parts.values():
+            part.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def write_frame(df):
+    """Write a whole DataFrame as a new artifact and return its pointer."""
+    with ColumnarWriter() as writer:
+        writer.append(df)
+        return writer.close()
+
+
+class ColumnStore:
+    """Read-only, memory-mapped view of a dataset artifact."""
+
+    def __init__(self, pointer):
+        self.pointer = pointer
+        self.path = artifact_path(pointer)
+        with open(os.path.join(self.path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self._columns = {}
+
+    def __len__(self):
+        return self.meta['rows']
+
+    @property
+    def types(self):
+        return self.meta['types']
+
+    def read_json(self, name):
+        """A file stored with ``write_json``, or ``None`` if there is none."""
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def column(self, name):
+        if name not in self._columns:
+            path = os.path.join(self.path, f'{name}.npy')
+            self._columns[name] = np.load(path, mmap_mode='r')
+        return self._columns[name]
+
+    def metric(self, col):
+        return self.column(FLOAT_COLUMNS[col])
+
+    def type_labels(self, start=0, stop=None):
+        codes = self.column('type')[start:stop]
+        labels = np.array(self.types + [None], dtype=object)
+        return labels[codes]
+
+    def names(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return []
+        offsets = self.column('name_offsets')[start:stop + 1]
+        blob = self.column('name_data')[offsets[0]:offsets[-1]].tobytes()
+        relative = (offsets - offsets[0]).tolist()
+        text = blob.decode('utf-8')
+        if len(text) == len(blob):
+            # ASCII: byte offsets are character offsets, slice the decoded text
+            return [text[low:high] for low, high in zip(relative[:-1], relative[1:])]
+        return [blob[low:high].decode('utf-8') for low, high in zip(relative[:-1], relative[1:])]
+
+    def metric_columns(self):
+        """Type codes and metric columns as a ``MetricColumns`` over the
+        memory maps, without decoding the equipment names."""
+        return MetricColumns(self.column('type'), self.types, {col: self.metric(col) for col in NUMERIC_COLUMNS})
+
+    def frame(self, start=0, stop=None):
+        data = {
+            'Equipment Name': self.names(start, stop),
+            'Type': self.type_labels(start, stop),
+        }
+        for col in NUMERIC_COLUMNS:
+            data[col] = np.asarray(self.metric(col)[start:stop])
+        return pd.DataFrame(data, columns=REQUIRED_COLUMNS)
+
+    def records(self, start=0, stop=None):
+        """Rows as ``equipment_data`` dicts, with missing values as ``None``."""
+        df = self.frame(start, stop)
+        return df.astype(object).where(df.notna(), None).to_dict('records')
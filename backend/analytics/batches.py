@@ -0,0 +1,108 @@
+"""Batch uploads: many CSV files, or zips of them, in one request.
+
+Every CSV becomes its own ``UploadJob`` tagged with the batch id, so the
+files are parsed side by side in the upload process pool and each one
+succeeds or fails on its own. All the jobs exist before the first one
+starts, so retention sees the batch as unfinished until its last job is
+done and leaves its datasets alone until then.
+"""
+import hashlib
+import os
+import uuid
+import zipfile
+
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .jobs import enqueue, submit_upload
+from .utils import ZIP_MAGIC, LimitedStream, check_zip_member
+
+
+CSV_SUFFIXES = ('.csv', '.csv.gz', '.csv.zst')
+READ_BLOCK = 1024 * 1024
+
+
+def _is_zip(file):
+    file.seek(0)
+    head = file.read(len(ZIP_MAGIC))
+    file.seek(0)
+    return head == ZIP_MAGIC
+
+
+def _member_sha256(archive, info):
+    hasher = hashlib.sha256()
+    with LimitedStream(archive.open(info)) as member:
+        for block in iter(lambda: member.read(READ_BLOCK), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _submit_member(archive, info, batch_id, owner):
+    name = os.path.basename(info.filename)
+
+    def store():
+        with LimitedStream(archive.open(info)) as member:
+            return default_storage.save(f'csv_files/{name}', File(member, name=name))
+
+    try:
+        check_zip_member(info)
+        digest = _member_sha256(archive, info)
+    except ValidationError as e:
+        return {'filename': name, 'error': ' '.join(e.messages)}
+    job, reused = submit_upload(digest, store, owner=owner, start=False, filename=name, batch_id=batch_id)
+    return {'filename': name, 'job': job, 'reused': reused}
+
+
+def _csv_members(archive):
+    # Yields ``(info, None)`` for each CSV and ``(None, result)`` for the
+    # entries that are reported as errors
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or info.filename.startswith('__MACOSX/') or name.startswith('.'):
+            continue
+        if not name.lower().endswith(CSV_SUFFIXES):
+            yield None, {'filename': name, 'error': 'Not a CSV file'}
+        else:
+            yield info, None
+
+
+def _submit_zip(file, batch_id, owner):
+    results = []
+    with zipfile.ZipFile(file) as archive:
+        for info, result in _csv_members(archive):
+            results.append(result or _submit_member(archive, info, batch_id, owner))
+    return results
+
+
+def submit_batch(files, digests, owner=None):
+    """Queue every CSV in ``files`` for ``owner``, expanding zip archives.
+
+    ``digests`` holds the SHA-256 of each file as it was received, in the
+    same order. Returns the batch id and one result per CSV, with either
+    the job or an error.
+    """
+    batch_id = uuid.uuid4()
+    results = []
+    for file, digest in zip(files, digests):
+        if _is_zip(file):
+            try:
+                results.extend(_submit_zip(file, batch_id, owner))
+            except zipfile.BadZipFile as e:
+                results.append({'filename': file.name, 'error': f'Invalid ZIP file: {e}'})
+            continue
+
+        job, reused = submit_upload(
+            digest,
+            lambda: default_storage.save(f'csv_files/{file.name}', file),
+            owner=owner,
+            start=False,
+            filename=file.name,
+            batch_id=batch_id,
+        )
+        results.append({'filename': file.name, 'job': job, 'reused': reused})
+
+    for result in results:
+        if 'job' in result and not result['reused']:
+            enqueue(result['job'])
+    return batch_id, results
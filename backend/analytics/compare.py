@@ -0,0 +1,150 @@
+"""Differences between two datasets, computed from their artifacts.
+
+Rows are matched on ``Equipment Name`` with one vectorized hash join.
+When a name occurs more than once in a dataset its last row is used, and
+rows without a name are left out. The result is stored next to dataset
+``b``'s rows, keyed by ``a``'s artifact, so each pair is only computed
+once; datasets never change after ingest.
+"""
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .artifacts import write_json
+from .utils import NUMERIC_COLUMNS
+
+
+def _cache_name(a):
+    return f"compare-{a.summary['artifact'].rsplit('/', 1)[-1]}.json"
+
+
+def _columns(dataset):
+    """Names, types and metrics of the named rows, keeping the last row per name."""
+    artifact = dataset.artifact
+    names = pd.Index(artifact.names())
+    rows = np.flatnonzero(~names.duplicated(keep='last') & (names != ''))
+    columns = {'Equipment Name': names[rows], 'Type': artifact.type_labels()[rows]}
+    for col in NUMERIC_COLUMNS:
+        columns[col] = np.asarray(artifact.metric(col))[rows]
+    return columns
+
+
+def _value(value):
+    return None if np.isnan(value) else float(value)
+
+
+def _rows(columns, rows, limit):
+    """Rows at ``rows`` as ``equipment_data`` dicts, the first ``limit`` by name."""
+    names = np.asarray(columns['Equipment Name'])[rows]
+    rows = rows[np.argsort(names, kind='stable')[:limit]]
+    return [
+        {
+            'Equipment Name': columns['Equipment Name'][i],
+            'Type': columns['Type'][i],
+            **{col: _value(columns[col][i]) for col in NUMERIC_COLUMNS},
+        }
+        for i in rows
+    ]
+
+
+def _metric_deltas(a, b, names, types, limit):
+    delta = b - a
+    both = ~np.isnan(delta)
+    changed = both & (delta != 0)
+    # A value that appeared or disappeared also counts as a change
+    changed |= np.isnan(a) != np.isnan(b)
+
+    size = np.abs(np.where(changed & both, delta, 0))
+    top = np.flatnonzero(size)
+    if len(top) > limit:
+        top = top[np.argpartition(-size[top], limit - 1)[:limit]] if limit else top[:0]
+    order = top[np.argsort(-size[top], kind='stable')]
+    return {
+        'changed': int(changed.sum()),
+        'mean_delta': float(delta[both].mean()) if both.any() else None,
+        'min_delta': float(delta[both].min()) if both.any() else None,
+        'max_delta': float(delta[both].max()) if both.any() else None,
+        'largest': [
+            {
+                'Equipment Name': names[i],
+                'Type': types[i],
+                'a': float(a[i]),
+                'b': float(b[i]),
+                'delta': float(delta[i]),
+            }
+            for i in order
+        ],
+    }
+
+
+def _type_shifts(a, b):
+    def by_type(dataset):
+        stats = dataset.summary.get('stats', {}).get('by_type', {})
+        return dataset.summary.get('type_distribution', {}), stats
+
+    counts_a, stats_a = by_type(a)
+    counts_b, stats_b = by_type(b)
+    shifts = {}
+    for eq_type in sorted(set(counts_a) | set(counts_b)):
+        count_a, count_b = counts_a.get(eq_type, 0), counts_b.get(eq_type, 0)
+        shift = {'count': {'a': count_a, 'b': count_b, 'delta': count_b - count_a}}
+        for col in NUMERIC_COLUMNS:
+            metric = col.lower()
+            mean_a = stats_a.get(eq_type, {}).get(metric, {}).get('mean')
+            mean_b = stats_b.get(eq_type, {}).get(metric, {}).get('mean')
+            shift[metric] = {
+                'mean_a': mean_a,
+                'mean_b': mean_b,
+                'delta': None if mean_a is None or mean_b is None else mean_b - mean_a,
+            }
+        shifts[eq_type] = shift
+    return shifts
+
+
+def compute_comparison(a, b, limit=None):
+    """Compare dataset ``a`` (before) with dataset ``b`` (after).
+
+    Lists of equipment are cut to ``limit`` entries; the counts are exact.
+    """
+    limit = limit or settings.COMPARE_MAX_ITEMS
+    cols_a, cols_b = _columns(a), _columns(b)
+
+    # Hash join: the row of a holding each name of b, or -1
+    positions = cols_a['Equipment Name'].get_indexer(cols_b['Equipment Name'])
+    matched_b = np.flatnonzero(positions >= 0)
+    matched_a = positions[matched_b]
+    removed = np.ones(len(cols_a['Equipment Name']), dtype=bool)
+    removed[matched_a] = False
+
+    names = np.asarray(cols_b['Equipment Name'])[matched_b]
+    types = cols_b['Type'][matched_b]
+    return {
+        'a': a.id,
+        'b': b.id,
+        'equipment': {
+            'a': len(cols_a['Equipment Name']),
+            'b': len(cols_b['Equipment Name']),
+            'matched': len(matched_b),
+            'added': len(cols_b['Equipment Name']) - len(matched_b),
+            'removed': int(removed.sum()),
+            'type_changed': int((cols_a['Type'][matched_a] != types).sum()),
+        },
+        'added': _rows(cols_b, np.flatnonzero(positions < 0), limit),
+        'removed': _rows(cols_a, np.flatnonzero(removed), limit),
+        'metrics': {
+            col.lower(): _metric_deltas(cols_a[col][matched_a], cols_b[col][matched_b], names, types, limit)
+            for col in NUMERIC_COLUMNS
+        },
+        'types': _type_shifts(a, b),
+    }
+
+
+def compare_datasets(a, b):
+    """The comparison of ``a`` with ``b``, computed once per pair."""
+    artifact = b.artifact
+    name = _cache_name(a)
+    result = artifact.read_json(name)
+    if result is None:
+        result = compute_comparison(a, b)
+        write_json(b.summary['artifact'], name, result)
+    return result
@@ -0,0 +1,99 @@
+"""Compression of API responses.
+
+``CompressionMiddleware`` encodes ``/api/`` responses of at least
+``COMPRESSION_MIN_SIZE`` bytes with brotli (when the package is installed)
+or gzip, whichever the client's ``Accept-Encoding`` prefers. Streamed
+responses (report PDFs, files) pass through untouched, so they keep
+streaming and serving ranges. Bodies from the response cache are compressed
+once per encoding and the result cached next to them.
+"""
+import gzip
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _gzip(content):
+    # mtime=0 keeps the output, and so cached copies, reproducible
+    return gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _brotli(content):
+    return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+
+# In order of preference when the client accepts both equally
+ENCODERS = {'br': _brotli, 'gzip': _gzip} if brotli is not None else {'gzip': _gzip}
+
+
+def negotiate_encoding(accept_encoding):
+    """The supported encoding ``accept_encoding`` ranks highest, or ``None``."""
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        quality = 1.0
+        params = params.strip().lower()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            qualities[coding] = quality
+
+    best, best_quality = None, 0.0
+    for coding in ENCODERS:
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(response, encoding):
+    """``response``'s body encoded with ``encoding``, from the cache when the
+    body itself came from the response cache."""
+    key = getattr(response, 'response_cache_key', None)
+    if key is None:
+        return ENCODERS[encoding](response.content)
+
+    key = f'{key}:{encoding}'
+    content = cache.get(key)
+    if content is None:
+        content = ENCODERS[encoding](response.content)
+        cache.set(key, content, settings.RESPONSE_CACHE_TIMEOUT)
+    return content
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if not request.path.startswith('/api/') or response.streaming:
+            return response
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE or response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        content = compress(response, encoding)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response.headers['Content-Length'] = str(len(content))
+
+        # A strong ETag names one exact body. Weak, it still matches
+        # If-None-Match, as with Django's GZipMiddleware
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,158 @@
+"""Validators for conditional GETs of the summary, history and report.
+
+Strong ETags are derived from the ids and upload times of the datasets a
+response is built from, plus what else shapes the body (path, query string
+and Accept header). They take one indexed query on ``(owner,
+uploaded_at)`` that never loads a summary, so a matching ``If-None-Match``
+is answered with 304 before any payload is read or encoded. ``conditional``
+goes below ``@api_view``, so that ``request.user`` is already authenticated.
+Stored files are sent by ``ranged_file_response``, which also serves single
+byte ranges, guarded by ``If-Range``.
+"""
+import hashlib
+import os
+from functools import wraps
+
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_http_date_safe, quote_etag
+from django.views.decorators.http import condition
+
+from .models import Dataset
+
+
+# Bump when the body built from the same datasets changes
+ETAG_VERSION = '2'
+HISTORY_SIZE = 5
+
+
+def _etag(request, rows):
+    hasher = hashlib.sha256(ETAG_VERSION.encode())
+    parts = [request.path, request.META.get('QUERY_STRING', ''), request.META.get('HTTP_ACCEPT', '')]
+    parts += [f'{pk}@{uploaded_at.isoformat()}' for pk, uploaded_at in rows]
+    for part in parts:
+        hasher.update(b'\0' + part.encode())
+    return hasher.hexdigest()[:32]
+
+
+def _versions(request, limit):
+    # Cached on the request, the ETag and Last-Modified functions share it
+    cache_key = f'_dataset_versions_{limit}'
+    if not hasattr(request, cache_key):
+        rows = Dataset.objects.owned_by(request.user).order_by('-uploaded_at').values_list('id', 'uploaded_at')
+        setattr(request, cache_key, list(rows[:limit]))
+    return getattr(request, cache_key)
+
+
+def latest_etag(request, *args, **kwargs):
+    rows = _versions(request, 1)
+    return _etag(request, rows) if rows else None
+
+
+def latest_modified(request, *args, **kwargs):
+    rows = _versions(request, 1)
+    return rows[0][1] if rows else None
+
+
+def history_etag(request, *args, **kwargs):
+    return _etag(request, _versions(request, HISTORY_SIZE))
+
+
+def history_modified(request, *args, **kwargs):
+    rows = _versions(request, HISTORY_SIZE)
+    return rows[0][1] if rows else None
+
+
+def conditional(etag_func, last_modified_func):
+    """``condition`` that also lets clients keep the response, provided they
+    check it with the server every time."""
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func, last_modified_func=last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 206, 304):
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, ('Accept', 'Authorization'))
+            return response
+        return wrapper
+    return decorator
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.META.get('HTTP_IF_RANGE')
+    if value is None:
+        return True
+    if value.startswith('"'):
+        return etag is not None and value == quote_etag(etag)
+    # A weak ETag never matches; anything else is a date
+    if value.startswith('W/'):
+        return False
+    date = parse_http_date_safe(value)
+    return date is not None and last_modified is not None and date == int(last_modified.timestamp())
+
+
+def _parse_range(value, size):
+    """``(start, end)`` of a single ``bytes=`` range, ``None`` to send the
+    whole file instead, or ``False`` if no byte of it exists."""
+    unit, _, spec = value.partition('=')
+    # Other units, several ranges and invalid ones get the whole file
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            suffix = int(last)
+            if suffix == 0:
+                return False
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return False
+    if start < 0 or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _read_range(file, length, block_size):
+    while length > 0:
+        chunk = file.read(min(block_size, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+
+def ranged_file_response(request, path, filename, etag=None, last_modified=None):
+    """Stream the file at ``path`` as an attachment, or the part of it a
+    ``Range`` header asks for (206, or 416 past its end).
+
+    ``etag`` and ``last_modified`` are the response's validators, which a
+    range request's ``If-Range`` must match to get a part.
+    """
+    size = os.path.getsize(path)
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _if_range_matches(request, etag, last_modified):
+        byte_range = _parse_range(request.META['HTTP_RANGE'], size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, as_attachment=True, filename=filename)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(file, as_attachment=True, filename=filename, status=206)
+        response.streaming_content = _read_range(file, end - start + 1, response.block_size)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
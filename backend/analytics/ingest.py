@@ -0,0 +1,87 @@
+"""Turn a stored CSV upload into a Dataset.
+
+This is the work ``upload_csv`` used to do inline; it now runs inside the
+upload job workers (see ``analytics.jobs``). Old datasets are removed
+separately by the retention janitor (see ``analytics.retention``).
+"""
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .artifacts import (
+    HISTOGRAMS_FILE, ColumnarWriter, ColumnStore, artifact_size, delete_artifact, write_anomalies, write_json,
+)
+from .models import Dataset, DatasetGeneration, EquipmentRecord, MetricRollup
+from .utils import SummaryAccumulator, compute_histograms, detect_anomalies, summarize_csv
+
+
+def find_duplicate(content_sha256, owner_id=None):
+    """Return the owner's dataset already built from this content, marked as latest."""
+    if not content_sha256:
+        return None
+    dataset = Dataset.objects.filter(owner_id=owner_id, content_sha256=content_sha256).only('id', 'file_path').first()
+    if dataset is not None:
+        now = timezone.now()
+        with transaction.atomic():
+            Dataset.objects.filter(pk=dataset.pk).update(uploaded_at=now)
+            MetricRollup.objects.filter(dataset=dataset).update(uploaded_at=now)
+            DatasetGeneration.objects.bump([owner_id])
+    return dataset
+
+
+def ingest_csv(file_name, progress=None, content_sha256='', owner_id=None, heartbeat=None):
+    """Parse ``file_name`` from storage and create its Dataset for ``owner_id``.
+
+    ``progress`` is called with the fraction of the file consumed after
+    every chunk, and ``heartbeat`` between the passes that follow. If an
+    identical upload finished in the meantime, its dataset is reused and
+    the new copy of the file is dropped.
+    """
+    heartbeat = heartbeat or (lambda: None)
+    duplicate = find_duplicate(content_sha256, owner_id)
+    if duplicate is not None:
+        if duplicate.file_path.name != file_name:
+            default_storage.delete(file_name)
+        return duplicate
+
+    size = default_storage.size(file_name)
+    artifact = None
+
+    with default_storage.open(file_name, 'rb') as file:
+        def on_chunk(chunk):
+            writer.append(chunk)
+            if progress is not None:
+                progress(min(file.tell() / (size or 1), 1.0))
+
+        try:
+            accumulator = SummaryAccumulator()
+            with ColumnarWriter() as writer:
+                summary = summarize_csv(file, on_chunk=on_chunk, accumulator=accumulator)
+                artifact = summary['artifact'] = writer.close()
+            # Second passes over the memory-mapped columns, in chunks
+            heartbeat()
+            columns = ColumnStore(artifact).metric_columns()
+            write_json(artifact, HISTOGRAMS_FILE, compute_histograms(columns, accumulator.sketches))
+            heartbeat()
+            summary['anomalies'] = write_anomalies(artifact, detect_anomalies(columns, accumulator.sketches))
+            heartbeat()
+
+            with transaction.atomic():
+                dataset = Dataset.objects.create(
+                    owner_id=owner_id,
+                    file_path=file_name,
+                    summary=summary,
+                    content_sha256=content_sha256,
+                    stored_bytes=size + artifact_size(artifact)
+                )
+                EquipmentRecord.objects.load_artifact(dataset, dataset.artifact)
+                MetricRollup.objects.bulk_create(
+                    MetricRollup(owner_id=owner_id, dataset=dataset, uploaded_at=dataset.uploaded_at, **rollup)
+                    for rollup in accumulator.rollups()
+                )
+                DatasetGeneration.objects.bump([owner_id])
+        except Exception:
+            delete_artifact(artifact)
+            raise
+
+    return dataset
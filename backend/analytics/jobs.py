@@ -0,0 +1,209 @@
+"""Local background processing of uploads.
+
+``UploadJob`` rows are the queue: a job is claimed by atomically moving it
+from ``queued`` to ``running``, so submitting the same job twice is
+harmless. Jobs run in a process pool owned by the web process; there is no
+external broker. With ``UPLOAD_JOBS_EAGER`` they run inline instead, which
+is what the tests use. Jobs left running by a pool that went away are
+failed when the next pool starts; running jobs refresh ``updated_at``
+between ingest passes, and only a job still running can succeed. Finished jobs wake the retention janitor, which
+removes old datasets outside of the upload path.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Minimum progress change between two writes to the job row
+PROGRESS_STEP = 0.05
+
+
+def _init_worker():
+    # Worker processes are spawned, so they need their own app registry and
+    # database connections. This module is imported there before setup(),
+    # which is why models are only imported inside functions.
+    django.setup()
+    connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=max(min(settings.UPLOAD_WORKERS, os.cpu_count() or 1), 1),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            _fail_stale()
+            _resubmit_queued(_executor)
+        return _executor
+
+
+def _fail_stale():
+    """Fail jobs still ``running`` with no progress for ``UPLOAD_JOB_STALE_AFTER``.
+
+    Their worker died with its pool (a restart, a crash). They are failed
+    rather than rerun, so a file that kills its worker cannot do so forever.
+    """
+    from .models import UploadJob
+
+    cutoff = timezone.now() - timedelta(seconds=settings.UPLOAD_JOB_STALE_AFTER)
+    for job in UploadJob.objects.filter(state=UploadJob.RUNNING, updated_at__lt=cutoff):
+        failed = UploadJob.objects.filter(pk=job.pk, state=UploadJob.RUNNING, updated_at__lt=cutoff).update(
+            state=UploadJob.FAILED,
+            error='Processing was interrupted, please upload the file again',
+            updated_at=timezone.now(),
+        )
+        if failed:
+            logger.warning('Upload job %s was interrupted', job.pk)
+            default_storage.delete(job.file_path.name)
+
+
+def _resubmit_queued(executor):
+    """Pick up jobs that were still queued when the last pool went away."""
+    from .models import UploadJob
+
+    for job_id in UploadJob.objects.filter(state=UploadJob.QUEUED).values_list('id', flat=True):
+        executor.submit(run_job, job_id)
+
+
+def submit_upload(content_sha256, store, owner=None, start=True, **fields):
+    """Queue a stored upload, or reuse the dataset of an identical one.
+
+    ``store`` saves the raw file and returns its storage name; it is not
+    called when ``owner`` already has a dataset with the same content.
+    ``fields`` are set on the new job. Returns the job and whether an
+    existing dataset was reused. With ``start=False`` the new job is only
+    created, and the caller passes it to ``enqueue``.
+    """
+    from .ingest import find_duplicate
+    from .models import UploadJob
+
+    duplicate = find_duplicate(content_sha256, getattr(owner, 'pk', None))
+    if duplicate is not None:
+        job = UploadJob.objects.create(
+            owner=owner,
+            file_path=duplicate.file_path.name,
+            state=UploadJob.SUCCEEDED,
+            progress=1.0,
+            content_sha256=content_sha256,
+            dataset=duplicate,
+            **fields
+        )
+        return job, True
+
+    job = UploadJob.objects.create(owner=owner, file_path=store(), content_sha256=content_sha256, **fields)
+    if start:
+        enqueue(job)
+    return job, False
+
+
+def enqueue(job):
+    from .retention import enforce_retention, wake_janitor
+
+    if settings.UPLOAD_JOBS_EAGER:
+        run_job(job.pk)
+        enforce_retention(owners=[job.owner_id])
+        return
+
+    def submit():
+        future = get_executor().submit(run_job, job.pk)
+        future.add_done_callback(lambda _: wake_janitor(job.owner_id))
+
+    transaction.on_commit(submit)
+
+
+def _update(job_id, **fields):
+    from .models import UploadJob
+
+    UploadJob.objects.filter(pk=job_id).update(updated_at=timezone.now(), **fields)
+
+
+def _finish(job_id, **fields):
+    """Move a ``running`` job to its final state; ``False`` if it is no
+    longer running, as ``_fail_stale`` took it for dead."""
+    from .models import UploadJob
+
+    return bool(UploadJob.objects.filter(pk=job_id, state=UploadJob.RUNNING).update(
+        updated_at=timezone.now(), **fields
+    ))
+
+
+def _discard(dataset):
+    # The dataset of a job failed while it ran; its upload is already gone
+    from .artifacts import delete_artifact
+    from .models import DatasetGeneration, MetricRollup
+
+    with transaction.atomic():
+        MetricRollup.objects.filter(dataset=dataset).delete()
+        dataset.delete()
+        DatasetGeneration.objects.bump([dataset.owner_id])
+    delete_artifact(dataset.summary.get('artifact'))
+    default_storage.delete(dataset.file_path.name)
+
+
+def _prerender_report(dataset):
+    from .reports import ensure_report
+
+    # The report is also rendered on first download, so failing here is fine
+    try:
+        ensure_report(dataset)
+    except Exception:
+        logger.exception('Rendering the report of dataset %s failed', dataset.pk)
+
+
+def run_job(job_id):
+    from .ingest import ingest_csv
+    from .models import UploadJob
+
+    close_old_connections()
+    claimed = UploadJob.objects.filter(pk=job_id, state=UploadJob.QUEUED).update(
+        state=UploadJob.RUNNING,
+        updated_at=timezone.now(),
+    )
+    if not claimed:
+        return
+
+    job = UploadJob.objects.get(pk=job_id)
+    reported = [0.0]
+
+    def progress(fraction):
+        if fraction - reported[0] >= PROGRESS_STEP:
+            reported[0] = fraction
+            _update(job_id, progress=fraction)
+
+    try:
+        dataset = ingest_csv(
+            job.file_path.name,
+            progress=progress,
+            content_sha256=job.content_sha256,
+            owner_id=job.owner_id,
+            heartbeat=lambda: _update(job_id),
+        )
+    except Exception as e:
+        default_storage.delete(job.file_path.name)
+        _finish(job_id, state=UploadJob.FAILED, error=str(e))
+    else:
+        if not _finish(job_id, state=UploadJob.SUCCEEDED, progress=1.0, dataset=dataset):
+            logger.warning('Upload job %s finished after it was failed, dropping its dataset', job_id)
+            # A reused dataset belongs to another upload and stays
+            if dataset.file_path.name == job.file_path.name:
+                _discard(dataset)
+            return
+        if settings.REPORT_PRERENDER:
+            _prerender_report(dataset)
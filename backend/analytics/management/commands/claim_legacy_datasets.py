@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from analytics.models import Dataset, DatasetGeneration, MetricRollup, UploadJob
+
+
+class Command(BaseCommand):
+    help = ('Give USERNAME the datasets uploaded before datasets had owners, '
+            'which no user can see otherwise')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        try:
+            owner = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist")
+
+        with transaction.atomic():
+            claimed = Dataset.objects.filter(owner__isnull=True).update(owner=owner)
+            MetricRollup.objects.filter(owner__isnull=True).update(owner=owner)
+            UploadJob.objects.filter(owner__isnull=True).update(owner=owner)
+            DatasetGeneration.objects.bump([owner.pk])
+        self.stdout.write(f'Gave {claimed} dataset(s) to {owner.username}')
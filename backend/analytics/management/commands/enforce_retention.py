@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from analytics.retention import enforce_retention
+from analytics.uploads import expire_sessions
+
+
+class Command(BaseCommand):
+    help = ('Delete datasets outside the retention policy (RETENTION_* settings) '
+            'and idle upload sessions (UPLOAD_SESSION_EXPIRY)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, help='Number of newest datasets to keep')
+        parser.add_argument('--max-age-days', type=int, help='Delete datasets older than this')
+        parser.add_argument('--max-bytes', type=int, help='Total bytes the kept datasets may use')
+
+    def handle(self, *args, **options):
+        limits = {
+            name: options[name]
+            for name in ('keep', 'max_age_days', 'max_bytes')
+            if options[name] is not None
+        }
+        deleted = enforce_retention(**limits)
+        self.stdout.write(f'Deleted {deleted} dataset(s)')
+        expired = expire_sessions()
+        self.stdout.write(f'Discarded {expired} upload session(s)')
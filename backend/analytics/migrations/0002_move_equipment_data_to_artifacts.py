@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import migrations
+
+
+# Frozen copy of the version 1 artifact layout (analytics.artifacts), so this
+# migration keeps working whatever later happens to the app code.
+METRIC_COLUMNS = {'Flowrate': 'flowrate', 'Pressure': 'pressure', 'Temperature': 'temperature'}
+
+
+def _write_artifact(rows):
+    df = pd.DataFrame(rows, columns=['Equipment Name', 'Type', *METRIC_COLUMNS])
+    pointer = f'datasets/{uuid.uuid4().hex}'
+    path = os.path.join(settings.MEDIA_ROOT, pointer)
+    os.makedirs(path)
+
+    codes, types = pd.factorize(df['Type'])
+    names = [str(name).encode('utf-8') for name in df['Equipment Name'].fillna('')]
+    offsets = np.zeros(len(names) + 1, dtype='<i8')
+    np.cumsum([len(name) for name in names], out=offsets[1:])
+    columns = {
+        name: pd.to_numeric(df[col], errors='coerce').to_numpy(dtype='<f8', na_value=np.nan)
+        for col, name in METRIC_COLUMNS.items()
+    }
+    columns['type'] = codes.astype('<i4')
+    columns['name_offsets'] = offsets
+    columns['name_data'] = np.frombuffer(b''.join(names), dtype='u1')
+    for name, values in columns.items():
+        np.save(os.path.join(path, f'{name}.npy'), values)
+
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump({'version': 1, 'rows': len(df), 'types': [str(eq_type) for eq_type in types]}, f)
+    return pointer
+
+
+def _read_records(pointer):
+    path = os.path.join(settings.MEDIA_ROOT, pointer)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    def column(name):
+        return np.load(os.path.join(path, f'{name}.npy'))
+
+    offsets = column('name_offsets').tolist()
+    blob = column('name_data').tobytes()
+    labels = np.array(meta['types'] + [None], dtype=object)
+    df = pd.DataFrame({
+        'Equipment Name': [blob[low:high].decode('utf-8') for low, high in zip(offsets[:-1], offsets[1:])],
+        'Type': labels[column('type')],
+        **{col: column(name) for col, name in METRIC_COLUMNS.items()},
+    })
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+def move_rows_to_artifacts(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        summary = dataset.summary
+        if 'equipment_data' not in summary:
+            continue
+        summary['artifact'] = _write_artifact(summary.pop('equipment_data'))
+        dataset.save(update_fields=['summary'])
+
+
+def restore_rows_from_artifacts(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        summary = dataset.summary
+        pointer = summary.pop('artifact', None)
+        if pointer is None:
+            continue
+        summary['equipment_data'] = _read_records(pointer)
+        dataset.save(update_fields=['summary'])
+        shutil.rmtree(os.path.join(settings.MEDIA_ROOT, pointer), ignore_errors=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_rows_to_artifacts, restore_rows_from_artifacts),
+    ]
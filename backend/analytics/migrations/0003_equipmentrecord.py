@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_move_equipment_data_to_artifacts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('type', models.CharField(blank=True, max_length=100)),
+                ('flowrate', models.FloatField(null=True)),
+                ('pressure', models.FloatField(null=True)),
+                ('temperature', models.FloatField(null=True)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='records', to='analytics.dataset')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['dataset', 'type'], name='analytics_e_dataset_0deedc_idx'), models.Index(fields=['dataset', 'flowrate'], name='analytics_e_dataset_3e835a_idx'), models.Index(fields=['dataset', 'pressure'], name='analytics_e_dataset_13792e_idx'), models.Index(fields=['dataset', 'temperature'], name='analytics_e_dataset_cb5046_idx')],
+            },
+        ),
+    ]
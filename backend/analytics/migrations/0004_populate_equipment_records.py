@@ -0,0 +1,61 @@
+import json
+import os
+
+import numpy as np
+from django.conf import settings
+from django.db import migrations
+
+
+BATCH_SIZE = 5000
+
+
+def _iter_rows(pointer):
+    """Rows of a version 1 artifact as ``(name, type, flowrate, pressure,
+    temperature)``, ``BATCH_SIZE`` at a time."""
+    path = os.path.join(settings.MEDIA_ROOT, pointer)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    def column(name):
+        return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+    labels = meta['types'] + ['']
+    offsets, blob, codes = column('name_offsets'), column('name_data'), column('type')
+    metrics = [column(name) for name in ('flowrate', 'pressure', 'temperature')]
+    for start in range(0, meta['rows'], BATCH_SIZE):
+        stop = min(start + BATCH_SIZE, meta['rows'])
+        bounds = offsets[start:stop + 1].tolist()
+        names = [bytes(blob[low:high]).decode('utf-8') for low, high in zip(bounds[:-1], bounds[1:])]
+        values = np.column_stack([np.asarray(metric[start:stop]) for metric in metrics]).tolist()
+        yield [
+            (name, labels[code], *(None if np.isnan(value) else value for value in row))
+            for name, code, row in zip(names, codes[start:stop].tolist(), values)
+        ]
+
+
+def populate_records(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    EquipmentRecord = apps.get_model('analytics', 'EquipmentRecord')
+    for dataset in Dataset.objects.iterator():
+        pointer = dataset.summary.get('artifact')
+        if not pointer or EquipmentRecord.objects.filter(dataset=dataset).exists():
+            continue
+        for rows in _iter_rows(pointer):
+            EquipmentRecord.objects.bulk_create(
+                EquipmentRecord(
+                    dataset=dataset, name=name, type=eq_type,
+                    flowrate=flowrate, pressure=pressure, temperature=temperature,
+                )
+                for name, eq_type, flowrate, pressure, temperature in rows
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_equipmentrecord'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_records, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:47
+
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def hash_existing_uploads(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.only('id', 'file_path').iterator():
+        name = dataset.file_path.name
+        if not name or not default_storage.exists(name):
+            continue
+        hasher = hashlib.sha256()
+        with default_storage.open(name, 'rb') as f:
+            for chunk in f.chunks():
+                hasher.update(chunk)
+        Dataset.objects.filter(pk=dataset.pk).update(content_sha256=hasher.hexdigest())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='content_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadjob',
+            name='content_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.RunPython(hash_existing_uploads, migrations.RunPython.noop),
+    ]
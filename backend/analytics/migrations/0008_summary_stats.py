@@ -0,0 +1,83 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import migrations
+
+
+# Frozen copies of the artifact reader and analytics.utils.compute_stats as
+# they were when this migration was written.
+METRIC_COLUMNS = {'Flowrate': 'flowrate', 'Pressure': 'pressure', 'Temperature': 'temperature'}
+STAT_FIELDS = ['count', 'mean', 'std', 'min', 'max', 'p50', 'p95']
+STAT_QUANTILES = {'p50': 0.5, 'p95': 0.95}
+
+
+def _metric_frame(pointer):
+    path = os.path.join(settings.MEDIA_ROOT, pointer)
+    with open(os.path.join(path, 'meta.json')) as f:
+        types = json.load(f)['types']
+    data = {'Type': pd.Categorical.from_codes(np.load(os.path.join(path, 'type.npy')), categories=types)}
+    for col, name in METRIC_COLUMNS.items():
+        data[col] = np.load(os.path.join(path, f'{name}.npy'))
+    return pd.DataFrame(data)
+
+
+def _stat(value):
+    return None if pd.isna(value) else float(value)
+
+
+def _compute_stats(df):
+    metrics = df[list(METRIC_COLUMNS)]
+
+    def table(keys):
+        grouped = metrics.groupby(keys, observed=True, sort=False)
+        aggregated = grouped.agg(['count', 'mean', 'std', 'min', 'max'])
+        if aggregated.empty:
+            return {}
+        quantiles = grouped.quantile(list(STAT_QUANTILES.values())).unstack()
+        for field, q in STAT_QUANTILES.items():
+            for col in METRIC_COLUMNS:
+                aggregated[col, field] = quantiles[col, q]
+        result = {}
+        for key, row in aggregated.iterrows():
+            result[str(key)] = {}
+            for col, name in METRIC_COLUMNS.items():
+                stats = {field: _stat(row[col, field]) for field in STAT_FIELDS}
+                stats['count'] = int(row[col, 'count'])
+                result[str(key)][name] = stats
+        return result
+
+    overall = table(np.zeros(len(df), dtype=np.int8)).get('0') or {
+        name: {field: 0 if field == 'count' else None for field in STAT_FIELDS}
+        for name in METRIC_COLUMNS.values()
+    }
+    return {'overall': overall, 'by_type': table(df['Type'])}
+
+
+def add_stats(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        pointer = dataset.summary.get('artifact')
+        if pointer and 'stats' not in dataset.summary:
+            dataset.summary['stats'] = _compute_stats(_metric_frame(pointer))
+            dataset.save(update_fields=['summary'])
+
+
+def remove_stats(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        if dataset.summary.pop('stats', None) is not None:
+            dataset.save(update_fields=['summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0007_content_sha256'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_stats, remove_stats),
+    ]
@@ -0,0 +1,84 @@
+import base64
+import json
+import os
+
+import numpy as np
+from django.conf import settings
+from django.db import migrations
+
+
+# Frozen copy of the t-digest in analytics.sketches as it was when this
+# migration was written, reduced to building a sketch from whole columns.
+METRIC_COLUMNS = {'Flowrate': 'flowrate', 'Pressure': 'pressure', 'Temperature': 'temperature'}
+COMPRESSION = 200
+
+
+def _encode(array, dtype):
+    return base64.b64encode(np.ascontiguousarray(array, dtype=dtype).tobytes()).decode()
+
+
+def _sketch(values):
+    values = np.sort(values[~np.isnan(values)])
+    if not len(values):
+        means = weights = np.empty(0)
+        low = high = None
+    else:
+        # Values whose midpoint rank falls in the same unit of the k1 scale
+        # share a centroid
+        low, high = float(values[0]), float(values[-1])
+        midpoints = (np.arange(len(values)) + 0.5) / len(values)
+        scale = COMPRESSION / (2 * np.pi) * np.arcsin(2 * midpoints - 1)
+        buckets = np.floor(scale + COMPRESSION / 4).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        weights = np.add.reduceat(np.ones(len(values)), starts)
+        means = np.add.reduceat(values, starts) / weights
+    return {
+        'compression': COMPRESSION,
+        'min': low,
+        'max': high,
+        'means': _encode(means, '<f8'),
+        'weights': _encode(np.rint(weights), '<u4'),
+    }
+
+
+def _sketches(pointer):
+    path = os.path.join(settings.MEDIA_ROOT, pointer)
+    with open(os.path.join(path, 'meta.json')) as f:
+        types = json.load(f)['types']
+    codes = np.load(os.path.join(path, 'type.npy'))
+    columns = {name: np.load(os.path.join(path, f'{name}.npy')) for name in METRIC_COLUMNS.values()}
+    present = [code for code in range(len(types)) if (codes == code).any()]
+    return {
+        'overall': {name: _sketch(values) for name, values in columns.items()},
+        'by_type': {
+            types[code]: {name: _sketch(values[codes == code]) for name, values in columns.items()}
+            for code in present
+        },
+    }
+
+
+def add_sketches(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        pointer = dataset.summary.get('artifact')
+        if pointer and 'sketches' not in dataset.summary:
+            dataset.summary['sketches'] = _sketches(pointer)
+            dataset.save(update_fields=['summary'])
+
+
+def remove_sketches(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        if dataset.summary.pop('sketches', None) is not None:
+            dataset.save(update_fields=['summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0008_summary_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_sketches, remove_sketches),
+    ]
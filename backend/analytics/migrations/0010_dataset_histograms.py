@@ -0,0 +1,101 @@
+import json
+import os
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.db import migrations
+
+
+# Frozen copy of analytics.utils.compute_histograms with the default bin
+# settings, as it was when this migration was written.
+METRIC_COLUMNS = ['flowrate', 'pressure', 'temperature']
+HISTOGRAMS_FILE = 'histograms.json'
+BINS = 20
+MAX_BINS = 100
+
+
+def _fixed_histogram(values, edges):
+    return np.histogram(values, bins=edges)[0].tolist() if len(edges) else []
+
+
+def _adaptive_histogram(values, max_bins):
+    if not len(values):
+        return {'edges': [], 'counts': []}
+    values = np.sort(values)
+    value_range = values[-1] - values[0]
+    bins = 1
+    if value_range:
+        q75, q25 = np.percentile(values, [75, 25])
+        width = value_range / (np.log2(len(values)) + 1)
+        fd_width = 2 * (q75 - q25) * len(values) ** (-1 / 3)
+        if fd_width > 0:
+            width = min(width, fd_width)
+        bins = int(min(np.ceil(value_range / width), max_bins))
+    counts, edges = np.histogram(values, bins=bins)
+    return {'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def _compute_histograms(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        types = json.load(f)['types']
+    codes = np.load(os.path.join(path, 'type.npy'))
+    present_types = [code for code in range(len(types)) if (codes == code).any()]
+
+    histograms = {}
+    for name in METRIC_COLUMNS:
+        values = np.load(os.path.join(path, f'{name}.npy'))
+        present = ~np.isnan(values)
+        values, value_codes = values[present], codes[present]
+        by_type = {types[code]: values[value_codes == code] for code in present_types}
+        edges = np.histogram_bin_edges(values, bins=BINS) if len(values) else np.empty(0)
+        histograms[name] = {
+            'fixed': {
+                'edges': edges.tolist(),
+                'overall': _fixed_histogram(values, edges),
+                'by_type': {eq_type: _fixed_histogram(group, edges) for eq_type, group in by_type.items()},
+            },
+            'adaptive': {
+                'overall': _adaptive_histogram(values, MAX_BINS),
+                'by_type': {eq_type: _adaptive_histogram(group, MAX_BINS) for eq_type, group in by_type.items()},
+            },
+        }
+    return histograms
+
+
+def add_histograms(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        pointer = dataset.summary.get('artifact')
+        if not pointer:
+            continue
+        path = os.path.join(settings.MEDIA_ROOT, pointer)
+        target = os.path.join(path, HISTOGRAMS_FILE)
+        if os.path.exists(target):
+            continue
+        temp_path = f'{target}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(_compute_histograms(path), f)
+        os.replace(temp_path, target)
+
+
+def remove_histograms(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        pointer = dataset.summary.get('artifact')
+        if pointer:
+            try:
+                os.remove(os.path.join(settings.MEDIA_ROOT, pointer, HISTOGRAMS_FILE))
+            except FileNotFoundError:
+                pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0009_summary_sketches'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_histograms, remove_histograms),
+    ]
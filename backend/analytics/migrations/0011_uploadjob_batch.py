@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0010_dataset_histograms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='batch_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadjob',
+            name='filename',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
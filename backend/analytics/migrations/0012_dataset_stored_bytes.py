@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:02
+
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+
+def _artifact_size(pointer):
+    if not pointer:
+        return 0
+    with os.scandir(os.path.join(settings.MEDIA_ROOT, pointer)) as entries:
+        return sum(entry.stat().st_size for entry in entries if entry.is_file())
+
+
+def measure_existing_datasets(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.only('id', 'file_path', 'summary').iterator():
+        name = dataset.file_path.name
+        size = default_storage.size(name) if name and default_storage.exists(name) else 0
+        try:
+            size += _artifact_size(dataset.summary.get('artifact'))
+        except FileNotFoundError:
+            pass
+        Dataset.objects.filter(pk=dataset.pk).update(stored_bytes=size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0011_uploadjob_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='stored_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(measure_existing_datasets, migrations.RunPython.noop),
+    ]
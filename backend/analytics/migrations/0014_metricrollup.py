@@ -0,0 +1,82 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:08
+
+import json
+import os
+
+import django.db.models.deletion
+import numpy as np
+from django.conf import settings
+from django.db import migrations, models
+
+
+METRIC_COLUMNS = ['flowrate', 'pressure', 'temperature']
+
+
+def _compute_rollups(path):
+    """Frozen copy of analytics.utils.compute_rollups over an artifact's columns."""
+    with open(os.path.join(path, 'meta.json')) as f:
+        types = json.load(f)['types']
+    codes = np.load(os.path.join(path, 'type.npy'))
+    groups = [(None, np.ones(len(codes), dtype=bool))] if len(codes) else []
+    groups += [(eq_type, codes == code) for code, eq_type in enumerate(types) if (codes == code).any()]
+
+    rollups = []
+    for eq_type, selected in groups:
+        for name in METRIC_COLUMNS:
+            values = np.load(os.path.join(path, f'{name}.npy'))[selected]
+            values = values[~np.isnan(values)]
+            rollups.append({
+                'type': eq_type,
+                'metric': name,
+                'count': len(values),
+                'sum': float(values.sum()),
+                'sumsq': float(np.square(values).sum()),
+                'min': float(values.min()) if len(values) else None,
+                'max': float(values.max()) if len(values) else None,
+            })
+    return rollups
+
+
+def add_rollups(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    MetricRollup = apps.get_model('analytics', 'MetricRollup')
+    for dataset in Dataset.objects.iterator():
+        pointer = dataset.summary.get('artifact')
+        if not pointer:
+            continue
+        MetricRollup.objects.bulk_create(
+            MetricRollup(owner_id=dataset.owner_id, dataset=dataset, uploaded_at=dataset.uploaded_at, **rollup)
+            for rollup in _compute_rollups(os.path.join(settings.MEDIA_ROOT, pointer))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0013_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uploaded_at', models.DateTimeField()),
+                ('type', models.CharField(blank=True, max_length=100, null=True)),
+                ('metric', models.CharField(max_length=16)),
+                ('count', models.BigIntegerField()),
+                ('sum', models.FloatField()),
+                ('sumsq', models.FloatField()),
+                ('min', models.FloatField(null=True)),
+                ('max', models.FloatField(null=True)),
+                ('dataset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rollups', to='analytics.dataset')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['uploaded_at', 'id'],
+                'indexes': [models.Index(fields=['owner', 'metric', 'type', 'uploaded_at'], name='analytics_m_owner_i_8b2d56_idx')],
+            },
+        ),
+        migrations.RunPython(add_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,113 @@
+import json
+import os
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.db import migrations
+
+
+# Frozen copies of analytics.utils.detect_anomalies (with the default
+# thresholds) and analytics.artifacts.write_anomalies, as they were when this
+# migration was written.
+METRIC_COLUMNS = ['flowrate', 'pressure', 'temperature']
+ANOMALIES_FILE = 'anomalies.json'
+ANOMALY_FILES = (ANOMALIES_FILE, 'anomaly_rows.npy', 'anomaly_scores.npy', 'anomaly_flags.npy')
+Z_THRESHOLD = 3.5
+IQR_FACTOR = 1.5
+MAD_SCALE = 0.6745
+
+
+def _detect_anomalies(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        types = json.load(f)['types']
+    labels = types + ['']
+    codes = np.load(os.path.join(path, 'type.npy'))
+    codes = np.where(codes < 0, len(types), codes)
+    order = np.argsort(codes, kind='stable')
+    groups = np.split(order, np.flatnonzero(np.diff(codes[order])) + 1) if len(order) else []
+
+    scores = np.full((len(codes), len(METRIC_COLUMNS)), np.nan)
+    flags = np.zeros(len(codes), dtype=np.uint8)
+    bounds = {}
+    for i, name in enumerate(METRIC_COLUMNS):
+        values = np.load(os.path.join(path, f'{name}.npy'))
+        z_bit, iqr_bit = np.uint8(1 << (2 * i)), np.uint8(1 << (2 * i + 1))
+        bounds[name] = {}
+        for rows in groups:
+            group = values[rows]
+            present = group[~np.isnan(group)]
+            if not len(present):
+                continue
+            q1, median, q3 = np.quantile(present, [0.25, 0.5, 0.75])
+            mad = np.median(np.abs(present - median))
+            lower, upper = q1 - IQR_FACTOR * (q3 - q1), q3 + IQR_FACTOR * (q3 - q1)
+            if mad > 0:
+                z = MAD_SCALE * (group - median) / mad
+                scores[rows, i] = z
+                flags[rows[np.abs(np.nan_to_num(z)) > Z_THRESHOLD]] |= z_bit
+            flags[rows[(group < lower) | (group > upper)]] |= iqr_bit
+            bounds[name][labels[codes[rows[0]]]] = {
+                'median': float(median),
+                'mad': float(mad),
+                'q1': float(q1),
+                'q3': float(q3),
+                'lower': float(lower),
+                'upper': float(upper),
+            }
+
+    rows = np.flatnonzero(flags)
+    return rows, scores[rows], flags[rows], bounds
+
+
+def _write_anomalies(path):
+    rows, scores, flags, bounds = _detect_anomalies(path)
+    for name, values in (('rows', rows), ('scores', scores), ('flags', flags)):
+        np.save(os.path.join(path, f'anomaly_{name}.npy'), values)
+    counts = {
+        'count': len(flags),
+        'by_metric': {
+            name: int(np.count_nonzero(flags & (3 << (2 * i))))
+            for i, name in enumerate(METRIC_COLUMNS)
+        },
+    }
+    target = os.path.join(path, ANOMALIES_FILE)
+    temp_path = f'{target}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'z_threshold': Z_THRESHOLD, 'iqr_factor': IQR_FACTOR, 'bounds': bounds, **counts}, f)
+    os.replace(temp_path, target)
+    return counts
+
+
+def add_anomalies(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        pointer = dataset.summary.get('artifact')
+        if pointer and 'anomalies' not in dataset.summary:
+            dataset.summary['anomalies'] = _write_anomalies(os.path.join(settings.MEDIA_ROOT, pointer))
+            dataset.save(update_fields=['summary'])
+
+
+def remove_anomalies(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    for dataset in Dataset.objects.iterator():
+        pointer = dataset.summary.get('artifact')
+        if pointer:
+            for name in ANOMALY_FILES:
+                try:
+                    os.remove(os.path.join(settings.MEDIA_ROOT, pointer, name))
+                except FileNotFoundError:
+                    pass
+        if dataset.summary.pop('anomalies', None) is not None:
+            dataset.save(update_fields=['summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0014_metricrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_anomalies, remove_anomalies),
+    ]
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Rows from before 0013 have no owner, and every query filters by owner, so
+# nobody would see them. They go to LEGACY_DATASET_OWNER, or the first
+# superuser; without either they stay ownerless until
+# ``manage.py claim_legacy_datasets`` is run.
+OWNED_MODELS = ['Dataset', 'MetricRollup', 'UploadJob']
+
+
+def _legacy_owner(User):
+    if settings.LEGACY_DATASET_OWNER:
+        return User.objects.filter(username=settings.LEGACY_DATASET_OWNER).first()
+    return User.objects.filter(is_superuser=True).order_by('date_joined', 'pk').first()
+
+
+def assign_legacy_datasets(apps, schema_editor):
+    Dataset = apps.get_model('analytics', 'Dataset')
+    if not Dataset.objects.filter(owner__isnull=True).exists():
+        return
+    owner = _legacy_owner(apps.get_model(settings.AUTH_USER_MODEL))
+    if owner is None:
+        return
+    for name in OWNED_MODELS:
+        apps.get_model('analytics', name).objects.filter(owner__isnull=True).update(owner=owner)
+    DatasetGeneration = apps.get_model('analytics', 'DatasetGeneration')
+    generation, created = DatasetGeneration.objects.get_or_create(owner=owner, defaults={'value': 1})
+    if not created:
+        DatasetGeneration.objects.filter(pk=generation.pk).update(value=models.F('value') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0016_datasetgeneration'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_legacy_datasets, migrations.RunPython.noop),
+    ]
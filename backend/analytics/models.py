@@ -1,13 +1,232 @@
+import uuid
+
+import numpy as np
+from django.conf import settings
 from django.db import models
 
+from .artifacts import ColumnStore
+from .sketches import MetricSketches
+from .utils import NUMERIC_COLUMNS
+
+
+# Summary entries only the server reads; they are left out of API responses
+INTERNAL_SUMMARY_KEYS = ('sketches',)
+# Summary entries of constant size, all the history lists
+HISTORY_SUMMARY_KEYS = ('total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'type_distribution')
+
+
+class DatasetQuerySet(models.QuerySet):
+    def owned_by(self, user):
+        return self.filter(owner=user)
+    
+    def with_aggregates(self):
+        """Defer the summary, annotating just its ``HISTORY_SUMMARY_KEYS``;
+        the database extracts them, so the rest is never sent or decoded."""
+        return self.defer('summary').annotate(**{key: models.F(f'summary__{key}') for key in HISTORY_SUMMARY_KEYS})
+
 
 class Dataset(models.Model):
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='datasets'
+    )
     file_path = models.FileField(upload_to='csv_files/')
     summary = models.JSONField()
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    content_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    # Bytes of the uploaded file plus its artifact, for size-based retention
+    stored_bytes = models.BigIntegerField(default=0)
+    
+    objects = DatasetQuerySet.as_manager()
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Latest dataset and history of a user
+            models.Index(fields=['owner', 'uploaded_at']),
+        ]
     
     def __str__(self):
         return f"Dataset {self.id} - {self.uploaded_at}"
+    
+    @property
+    def artifact(self):
+        pointer = self.summary.get('artifact')
+        return ColumnStore(pointer) if pointer else None
+    
+    @property
+    def sketches(self):
+        data = self.summary.get('sketches')
+        return MetricSketches.from_dict(data, NUMERIC_COLUMNS) if data else None
+    
+    def public_summary(self):
+        return {key: value for key, value in self.summary.items() if key not in INTERNAL_SUMMARY_KEYS}
+    
+    def equipment_data(self):
+        artifact = self.artifact
+        if artifact is None:
+            return self.summary.get('equipment_data', [])
+        return artifact.records()
+
+
+class DatasetGenerationManager(models.Manager):
+    def current(self, owner):
+        return self.filter(owner=owner).values_list('value', flat=True).first() or 0
+    
+    def bump(self, owner_ids):
+        """Advance the generation of each owner; call it in the transaction
+        that changes their datasets, so both commit together."""
+        for owner_id in set(owner_ids) - {None}:
+            generation, created = self.get_or_create(owner_id=owner_id, defaults={'value': 1})
+            if not created:
+                self.filter(pk=generation.pk).update(value=models.F('value') + 1)
+
+
+class DatasetGeneration(models.Model):
+    """Counts the changes to a user's datasets; cached responses are keyed by it."""
+    owner = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    value = models.BigIntegerField(default=0)
+    
+    objects = DatasetGenerationManager()
+    
+    def __str__(self):
+        return f"Generation {self.value} of user {self.owner_id}"
+
+
+class EquipmentRecordManager(models.Manager):
+    def load_artifact(self, dataset, artifact, batch_size=None):
+        """Insert the artifact's rows for ``dataset`` in fixed-size batches."""
+        batch_size = batch_size or settings.EQUIPMENT_BULK_BATCH_SIZE
+        for start in range(0, len(artifact), batch_size):
+            df = artifact.frame(start, start + batch_size)
+            metrics = df[['Flowrate', 'Pressure', 'Temperature']].to_numpy()
+            self.bulk_create(
+                [
+                    self.model(
+                        dataset=dataset,
+                        name=name,
+                        type=eq_type or '',
+                        flowrate=None if np.isnan(flowrate) else flowrate,
+                        pressure=None if np.isnan(pressure) else pressure,
+                        temperature=None if np.isnan(temperature) else temperature,
+                    )
+                    for name, eq_type, (flowrate, pressure, temperature) in zip(
+                        df['Equipment Name'], df['Type'], metrics.tolist()
+                    )
+                ],
+                batch_size=batch_size,
+            )
+
+
+class EquipmentRecord(models.Model):
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name='records')
+    name = models.CharField(max_length=255, blank=True)
+    type = models.CharField(max_length=100, blank=True)
+    flowrate = models.FloatField(null=True)
+    pressure = models.FloatField(null=True)
+    temperature = models.FloatField(null=True)
+    
+    objects = EquipmentRecordManager()
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['dataset', 'type']),
+            models.Index(fields=['dataset', 'flowrate']),
+            models.Index(fields=['dataset', 'pressure']),
+            models.Index(fields=['dataset', 'temperature']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.type})"
+
+
+class MetricRollup(models.Model):
+    """Additive aggregates of one metric of a dataset, overall or per type.
+    
+    Rows outlive their dataset (``dataset`` becomes null when retention
+    removes it), so trends keep their full history.
+    """
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='rollups')
+    uploaded_at = models.DateTimeField()
+    # None for all of the dataset's rows
+    type = models.CharField(max_length=100, null=True, blank=True)
+    metric = models.CharField(max_length=16)
+    count = models.BigIntegerField()
+    sum = models.FloatField()
+    sumsq = models.FloatField()
+    min = models.FloatField(null=True)
+    max = models.FloatField(null=True)
+    
+    class Meta:
+        ordering = ['uploaded_at', 'id']
+        indexes = [
+            models.Index(fields=['owner', 'metric', 'type', 'uploaded_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.metric} of {self.type or 'all types'} - {self.uploaded_at}"
+
+
+class UploadJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATE_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    file_path = models.FileField(upload_to='csv_files/')
+    filename = models.CharField(max_length=255, blank=True)
+    batch_id = models.UUIDField(null=True, blank=True, db_index=True)
+    state = models.CharField(max_length=16, choices=STATE_CHOICES, default=QUEUED)
+    progress = models.FloatField(default=0.0)
+    content_sha256 = models.CharField(max_length=64, blank=True)
+    dataset = models.ForeignKey(Dataset, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['state', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"UploadJob {self.id} - {self.state}"
+
+
+class UploadSession(models.Model):
+    """A resumable upload whose chunks are written to a partial file."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    received = models.JSONField(default=list)
+    hashed_bytes = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    job = models.ForeignKey(UploadJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"UploadSession {self.id} - {self.filename}"
+    
+    @property
+    def chunk_count(self):
+        return -(-self.size // self.chunk_size)
+    
+    @property
+    def is_complete(self):
+        return self.received == [[0, self.size]]
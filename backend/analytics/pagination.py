@@ -0,0 +1,118 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+SORTABLE_FIELDS = ['flowrate', 'pressure', 'temperature']
+
+
+class EquipmentKeysetPagination(BasePagination):
+    """Keyset pagination over ``(sort field, id)``.
+
+    The cursor holds the sort value and id of the last row on the page, so
+    every page is a range scan on the ``(dataset, <metric>)`` indexes no
+    matter how deep the client pages. NULL metrics sort first ascending and
+    last descending, on every database, and ``after`` follows that order.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    sort_query_param = 'sort'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_sort(request)
+
+        order = ['-id'] if self.descending else ['id']
+        if self.field:
+            if self.descending:
+                order.insert(0, F(self.field).desc(nulls_last=True))
+            else:
+                order.insert(0, F(self.field).asc(nulls_first=True))
+        queryset = queryset.order_by(*order)
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(*cursor))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, settings.EQUIPMENT_PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({'error': 'page_size must be an integer'})
+        if page_size < 1:
+            raise ValidationError({'error': 'page_size must be positive'})
+        return min(page_size, settings.EQUIPMENT_MAX_PAGE_SIZE)
+
+    def get_sort(self, request):
+        sort = request.query_params.get(self.sort_query_param, 'id')
+        descending = sort.startswith('-')
+        field = sort.lstrip('-')
+        if field == 'id':
+            return None, descending
+        if field not in SORTABLE_FIELDS:
+            raise ValidationError({
+                'error': f"sort must be one of: id, {', '.join(SORTABLE_FIELDS)}"
+            })
+        return field, descending
+
+    def after(self, value, pk):
+        """Rows strictly after ``(value, pk)`` in the current ordering."""
+        if self.descending:
+            pk_after = Q(id__lt=pk)
+        else:
+            pk_after = Q(id__gt=pk)
+        if not self.field:
+            return pk_after
+
+        is_null = Q(**{f'{self.field}__isnull': True})
+        if value is None:
+            if self.descending:
+                return is_null & pk_after
+            return (is_null & pk_after) | ~is_null
+
+        lookup = 'lt' if self.descending else 'gt'
+        condition = Q(**{f'{self.field}__{lookup}': value}) | (Q(**{self.field: value}) & pk_after)
+        if self.descending:
+            condition |= is_null
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if value is not None:
+                value = float(value)
+            return value, int(pk)
+        except (TypeError, ValueError):
+            raise ValidationError({'error': 'Invalid cursor'})
+
+    def encode_cursor(self, row):
+        value = getattr(row, self.field) if self.field else None
+        payload = json.dumps([value, row.pk]).encode()
+        return base64.urlsafe_b64encode(payload).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
@@ -0,0 +1,205 @@
+"""Response renderers.
+
+``ORJSONRenderer`` is the project's JSON renderer. It encodes with orjson
+when that is installed and with DRF's stdlib encoder otherwise; either way
+NaN and infinite floats (left by ``pd.to_numeric(errors='coerce')``) are
+written as ``null``, where the stdlib encoder would reject them.
+
+The columnar renderers send equipment rows (a ``Columns`` in the data) as
+typed buffers that clients load into NumPy without parsing text: Arrow IPC
+streams with pyarrow, MessagePack with msgpack. Views offer the ones whose
+package is installed, ``COLUMNAR_RENDERERS``.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+from .utils import NUMERIC_COLUMNS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _finite(data):
+    """``data`` with NaN and infinite floats replaced by ``None``."""
+    if isinstance(data, float):
+        return data if math.isfinite(data) else None
+    if isinstance(data, dict):
+        return {key: _finite(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_finite(value) for value in data]
+    return data
+
+
+class ORJSONRenderer(JSONRenderer):
+    # What orjson cannot encode itself (lazy strings, Decimal, querysets...)
+    # goes through DRF's encoder, as with JSONRenderer
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None:
+            try:
+                return super().render(data, accepted_media_type, renderer_context)
+            except ValueError:
+                return super().render(_finite(data), accepted_media_type, renderer_context)
+
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        content = orjson.dumps(data, default=self.default, option=option)
+
+        # Same escaping as JSONRenderer, keeping the output a JavaScript subset
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return content
+
+
+class Columns:
+    """Equipment rows as column arrays.
+
+    Names are UTF-8 bytes with ``int64`` offsets (Arrow's ``large_string``
+    layout, as the artifacts store them), types ``int32`` codes into
+    ``types`` (-1 when missing), metrics ``float64`` with NaN when missing.
+    """
+
+    def __init__(self, name_offsets, name_data, type_codes, types, metrics, ids=None):
+        self.name_offsets = np.ascontiguousarray(name_offsets, dtype='<i8')
+        self.name_data = np.ascontiguousarray(name_data, dtype='u1')
+        self.type_codes = np.ascontiguousarray(type_codes, dtype='<i4')
+        self.types = [str(eq_type) for eq_type in types]
+        self.metrics = {col: np.ascontiguousarray(values, dtype='<f8') for col, values in metrics.items()}
+        self.ids = None if ids is None else np.ascontiguousarray(ids, dtype='<i8')
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        """All rows of a ``ColumnStore``, without copying the memory maps."""
+        return cls(
+            artifact.column('name_offsets'),
+            artifact.column('name_data'),
+            artifact.column('type'),
+            artifact.types,
+            {col: artifact.metric(col) for col in NUMERIC_COLUMNS},
+        )
+
+    @classmethod
+    def from_rows(cls, rows, with_ids=False):
+        """From ``equipment_data`` dicts (with an ``id`` each if ``with_ids``)."""
+        names = [(row.get('Equipment Name') or '').encode('utf-8') for row in rows]
+        offsets = np.zeros(len(names) + 1, dtype='<i8')
+        np.cumsum([len(name) for name in names], out=offsets[1:])
+        codes, types = pd.factorize(pd.Series([row.get('Type') for row in rows], dtype=object))
+        return cls(
+            offsets,
+            np.frombuffer(b''.join(names), dtype='u1'),
+            codes,
+            types,
+            {col: np.array([row.get(col) for row in rows], dtype='<f8') for col in NUMERIC_COLUMNS},
+            [row['id'] for row in rows] if with_ids else None,
+        )
+
+
+def _split_columns(data):
+    """``(columns, data)``: the ``Columns`` in ``data``, and ``data`` with
+    ``None`` in its place."""
+    if isinstance(data, Columns):
+        return data, None
+    if isinstance(data, dict):
+        for key, value in data.items():
+            columns, rest = _split_columns(value)
+            if columns is not None:
+                return columns, {**data, key: rest}
+    return None, data
+
+
+class ColumnarRenderer(BaseRenderer):
+    charset = None
+    render_style = 'binary'
+
+
+class ArrowStreamRenderer(ColumnarRenderer):
+    """One record batch of the ``Columns``, with the rest of the body as
+    JSON in the schema metadata under ``body``."""
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        columns, rest = _split_columns(data)
+        metadata = {'body': ORJSONRenderer().render(rest)}
+
+        sink = pyarrow.BufferOutputStream()
+        if columns is None:
+            with pyarrow.ipc.new_stream(sink, pyarrow.schema([], metadata=metadata)):
+                pass
+            return sink.getvalue().to_pybytes()
+
+        arrays = {}
+        if columns.ids is not None:
+            arrays['id'] = pyarrow.array(columns.ids)
+        arrays['Equipment Name'] = pyarrow.LargeStringArray.from_buffers(
+            len(columns), pyarrow.py_buffer(columns.name_offsets), pyarrow.py_buffer(columns.name_data)
+        )
+        arrays['Type'] = pyarrow.DictionaryArray.from_arrays(
+            pyarrow.array(columns.type_codes, mask=columns.type_codes < 0),
+            pyarrow.array(columns.types, type=pyarrow.string()),
+        )
+        for col, values in columns.metrics.items():
+            # NaN stays NaN rather than null, so clients can map the buffer as is
+            arrays[col] = pyarrow.array(values)
+
+        batch = pyarrow.RecordBatch.from_arrays(list(arrays.values()), names=list(arrays))
+        batch = batch.replace_schema_metadata(metadata)
+        with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+
+class MessagePackRenderer(ColumnarRenderer):
+    """The body as MessagePack, with ``Columns`` as a map of raw
+    little-endian buffers: ``Equipment Name`` as ``{offsets, data}``,
+    ``Type`` as ``{codes, categories}`` and each metric as ``float64``."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    default = encoders.JSONEncoder().default
+
+    def encode(self, obj):
+        if isinstance(obj, Columns):
+            packed = {}
+            if obj.ids is not None:
+                packed['id'] = obj.ids.tobytes()
+            packed['Equipment Name'] = {'offsets': obj.name_offsets.tobytes(), 'data': obj.name_data.tobytes()}
+            packed['Type'] = {'codes': obj.type_codes.tobytes(), 'categories': obj.types}
+            for col, values in obj.metrics.items():
+                packed[col] = values.tobytes()
+            return packed
+        return self.default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return msgpack.packb(data, default=self.encode)
+
+
+COLUMNAR_RENDERERS = [
+    renderer
+    for renderer, package in ((ArrowStreamRenderer, pyarrow), (MessagePackRenderer, msgpack))
+    if package is not None
+]
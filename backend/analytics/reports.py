@@ -0,0 +1,310 @@
+"""PDF reports of datasets.
+
+A report only depends on its dataset, which never changes after ingest, and
+is rendered with invariant output. So it is rendered once, by the upload
+worker (``REPORT_PRERENDER``) or on the first download, and stored in the
+dataset's artifact directory under a name holding the dataset id and
+``REPORT_VERSION``. Retention removes it with the artifact.
+"""
+import glob
+import io
+import os
+import uuid
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from django.core.files.storage import default_storage
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.pdfencrypt import StandardEncryption
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas as pdfgen_canvas
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .artifacts import artifact_path, artifact_size
+from .conditional import latest_etag
+from .models import Dataset
+
+
+# Bump when the layout changes, so stored reports are rendered again
+REPORT_VERSION = 1
+REPORT_FILENAME = 'equipment_report.pdf'
+
+
+def report_etag(request, *args, **kwargs):
+    """``latest_etag`` that also changes with ``REPORT_VERSION``."""
+    etag = latest_etag(request)
+    return f'{etag}-v{REPORT_VERSION}' if etag else None
+
+
+def report_path(dataset):
+    """Where ``dataset``'s report is stored, or ``None`` without an artifact."""
+    pointer = dataset.summary.get('artifact')
+    if not pointer:
+        return None
+    return os.path.join(artifact_path(pointer), f'report-{dataset.id}-v{REPORT_VERSION}.pdf')
+
+
+def ensure_report(dataset):
+    """Path of ``dataset``'s stored report, rendering it if there is none
+    yet; ``None`` for datasets without an artifact."""
+    path = report_path(dataset)
+    if path is None or os.path.exists(path):
+        return path
+
+    content = render_report(dataset)
+    # Written aside and renamed, so concurrent downloads never see a partial file
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    for stale in glob.glob(os.path.join(os.path.dirname(path), 'report-*.pdf')):
+        if stale != path:
+            os.remove(stale)
+    # The report counts towards the dataset's size for retention. Measured
+    # on disk rather than added, so concurrent renders are only counted once
+    csv_bytes = default_storage.size(dataset.file_path.name) if dataset.file_path else 0
+    stored_bytes = csv_bytes + artifact_size(dataset.summary['artifact'])
+    Dataset.objects.filter(pk=dataset.pk).update(stored_bytes=stored_bytes)
+    return path
+
+
+def render_report(dataset):
+    """The password-protected PDF report of ``dataset``, as bytes."""
+    summary = dataset.summary
+    
+    # Generate password: first 4 letters of "equipment" + sum of total_count digits
+    base_name = "equipment_report"
+    first_four = base_name[:4]  # "equi"
+    
+    # Logic: sum of digits in total_count
+    total_count = summary.get('total_count', 0)
+    digit_sum = sum(int(digit) for digit in str(total_count))
+    
+    pdf_password = f"{first_four}{digit_sum}"
+    
+    buffer = io.BytesIO()
+    # Invariant output, so the same dataset always gives the same bytes
+    doc = SimpleDocTemplate(buffer, pagesize=letter, 
+                            rightMargin=72, leftMargin=72,
+                            topMargin=72, bottomMargin=72, invariant=True)
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Title'],
+        fontSize=24,
+        textColor=colors.HexColor('#2563eb'),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#1e293b'),
+        spaceAfter=12,
+        spaceBefore=20,
+        fontName='Helvetica-Bold'
+    )
+    
+    title = Paragraph("Chemical Equipment Parameter Report", title_style)
+    elements.append(title)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    summary_heading = Paragraph("Summary Statistics", heading_style)
+    elements.append(summary_heading)
+    elements.append(Spacer(1, 0.15*inch))
+    
+    # Datasets from before per-metric stats only have the averages
+    stats = summary.get('stats') or {}
+    equipment_data = [
+        {
+            'Equipment Name': record.name,
+            'Type': record.type,
+            'Flowrate': record.flowrate,
+            'Pressure': record.pressure,
+            'Temperature': record.temperature,
+        }
+        for record in dataset.records.order_by('id')[:10]
+    ]
+
+    summary_data = [
+        ['Metric', 'Mean', 'Std', 'Min', 'P50', 'P95', 'Max'],
+        ['Total Equipment Count', str(summary['total_count']), '-', '-', '-', '-', '-'],
+    ]
+    for label in ('Flowrate', 'Pressure', 'Temperature'):
+        metric = stats.get('overall', {}).get(label.lower()) or {'mean': summary.get(f'avg_{label.lower()}')}
+        summary_data.append([label] + [
+            _format_value(metric.get(field)) for field in ('mean', 'std', 'min', 'p50', 'p95', 'max')
+        ])
+    
+    summary_table = Table(summary_data, colWidths=[1.8*inch] + [0.75*inch] * 6)
+    summary_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('TOPPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#1e293b')),
+        ('FONTSIZE', (0, 1), (-1, -1), 11),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e2e8f0')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 12),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+        ('TOPPADDING', (0, 1), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 10),
+    ]))
+    elements.append(summary_table)
+    elements.append(Spacer(1, 0.4*inch))
+    
+    type_heading = Paragraph("Equipment Type Distribution", heading_style)
+    elements.append(type_heading)
+    elements.append(Spacer(1, 0.15*inch))
+    
+    type_data = [['Equipment Type', 'Count', 'Avg Flow', 'Avg Press', 'Avg Temp']]
+    for eq_type, count in summary['type_distribution'].items():
+        type_stats = stats.get('by_type', {}).get(str(eq_type), {})
+        type_data.append([str(eq_type), str(count)] + [
+            _format_value(type_stats.get(metric, {}).get('mean'))
+            for metric in ('flowrate', 'pressure', 'temperature')
+        ])
+    
+    type_table = Table(type_data, colWidths=[2.1*inch, 1*inch, 1.1*inch, 1.1*inch, 1.1*inch])
+    type_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7c3aed')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('TOPPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#1e293b')),
+        ('FONTSIZE', (0, 1), (-1, -1), 11),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e2e8f0')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 12),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
+        ('TOPPADDING', (0, 1), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 10),
+    ]))
+    elements.append(type_table)
+    elements.append(Spacer(1, 0.4*inch))
+
+    # Top 10 Equipment Table
+    if equipment_data:
+        top_heading = Paragraph("Top 10 Equipment Data", heading_style)
+        elements.append(top_heading)
+        elements.append(Spacer(1, 0.15*inch))
+
+        top_data = [['Name', 'Type', 'Flow', 'Press', 'Temp']]
+        for item in equipment_data:
+            top_data.append([
+                str(item.get('Equipment Name', '')),
+                str(item.get('Type', '')),
+                _format_value(item.get('Flowrate')),
+                _format_value(item.get('Pressure')),
+                _format_value(item.get('Temperature'))
+            ])
+        
+        top_table = Table(top_data, colWidths=[2*inch, 1.5*inch, 0.8*inch, 0.8*inch, 0.9*inch])
+        top_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0f172a')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('TOPPADDING', (0, 0), (-1, 0), 8),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#1e293b')),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e2e8f0')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]))
+        elements.append(top_table)
+        elements.append(Spacer(1, 0.4*inch))
+
+    
+    charts_heading = Paragraph("Visualizations", heading_style)
+    elements.append(charts_heading)
+    elements.append(Spacer(1, 0.15*inch))
+    
+    chart_buffer1 = io.BytesIO()
+    fig1, ax1 = plt.subplots(figsize=(6, 4))
+    types = list(summary['type_distribution'].keys())
+    counts = list(summary['type_distribution'].values())
+    colors_list = ['#2563eb', '#7c3aed', '#10b981', '#f59e0b', '#ef4444']
+    ax1.pie(counts, labels=types, autopct='%1.1f%%', colors=colors_list[:len(types)], 
+            startangle=90, textprops={'fontsize': 10, 'fontweight': 'bold'})
+    ax1.set_title('Equipment Type Distribution', fontsize=14, fontweight='bold', pad=20)
+    plt.tight_layout()
+    plt.savefig(chart_buffer1, format='png', dpi=150, bbox_inches='tight')
+    plt.close()
+    chart_buffer1.seek(0)
+    
+    chart_img1 = Image(chart_buffer1, width=5*inch, height=3.3*inch)
+    elements.append(chart_img1)
+    elements.append(Spacer(1, 0.3*inch))
+    
+    chart_buffer2 = io.BytesIO()
+    fig2, ax2 = plt.subplots(figsize=(6, 4))
+    stats = ['Flowrate', 'Pressure', 'Temperature']
+    values = [
+        summary['avg_flowrate'],
+        summary['avg_pressure'],
+        summary['avg_temperature']
+    ]
+    bars = ax2.bar(stats, values, color=['#2563eb', '#10b981', '#f59e0b'], 
+                    edgecolor='white', linewidth=1.5)
+    ax2.set_title('Average Statistics', fontsize=14, fontweight='bold', pad=20)
+    ax2.set_ylabel('Value', fontweight='bold', fontsize=11)
+    ax2.grid(True, alpha=0.3, axis='y', linestyle='--')
+    ax2.set_axisbelow(True)
+    
+    for bar in bars:
+        height = bar.get_height()
+        ax2.text(bar.get_x() + bar.get_width()/2., height,
+                f'{height:.2f}', ha='center', va='bottom', 
+                fontweight='bold', fontsize=10)
+    
+    plt.tight_layout()
+    plt.savefig(chart_buffer2, format='png', dpi=150, bbox_inches='tight')
+    plt.close()
+    chart_buffer2.seek(0)
+    
+    chart_img2 = Image(chart_buffer2, width=5*inch, height=3.3*inch)
+    elements.append(chart_img2)
+    
+    # Build PDF with password protection
+    doc.build(elements, canvasmaker=lambda *args, **kwargs: EncryptedCanvas(pdf_password, *args, **kwargs))
+    return buffer.getvalue()
+
+
+def _format_value(value):
+    return '-' if value is None else f"{float(value):.2f}"
+
+
+# Custom Canvas class for PDF encryption
+class EncryptedCanvas(pdfgen_canvas.Canvas):
+    def __init__(self, password, *args, **kwargs):
+        # Create encryption object
+        enc = StandardEncryption(password, password, canPrint=1, canModify=0, canCopy=0, canAnnotate=0)
+        kwargs['encrypt'] = enc
+        super().__init__(*args, **kwargs)
+    
+    def save(self):
+        super().save()
@@ -0,0 +1,59 @@
+"""Server-side cache of encoded read responses.
+
+Keys hold the user's ``DatasetGeneration``, which every upload and
+retention sweep advances in the same transaction as the data, so entries
+never need invalidating: a change makes the next request miss, and stale
+entries simply expire. Hits return the stored bytes without touching the
+datasets, the serializers or the renderer.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+from .models import DatasetGeneration
+
+
+def response_cache_key(request):
+    generation = DatasetGeneration.objects.current(request.user)
+    # The negotiated media type, not the raw Accept header, picks the body
+    variant = f'{request.get_full_path()}\0{request.accepted_media_type}'
+    digest = hashlib.sha256(variant.encode()).hexdigest()[:32]
+    return f'response:{request.user.pk}:{generation}:{digest}'
+
+
+def cached_response(view):
+    """Cache the rendered 200 responses of a DRF function view.
+
+    Goes below ``@api_view``, where the request is authenticated and its
+    renderer negotiated.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        # The browsable API embeds per-session details (e.g. CSRF tokens)
+        if request.accepted_renderer.format == 'api':
+            return view(request, *args, **kwargs)
+
+        key = response_cache_key(request)
+        hit = cache.get(key)
+        if hit is not None:
+            content, content_type = hit
+            response = HttpResponse(content, content_type=content_type)
+            # Lets CompressionMiddleware cache its output next to the body
+            response.response_cache_key = key
+            return response
+
+        response = view(request, *args, **kwargs)
+        if isinstance(response, Response) and response.status_code == 200:
+            # Render here rather than in finalize_response, to keep the bytes
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = request.parser_context['view'].get_renderer_context()
+            response.render()
+            cache.set(key, (response.content, response['Content-Type']), settings.RESPONSE_CACHE_TIMEOUT)
+            response.response_cache_key = key
+        return response
+    return wrapper
@@ -0,0 +1,174 @@
+"""Retention of old datasets.
+
+Each user's datasets are kept by count (``RETENTION_KEEP_DATASETS``), age
+(``RETENTION_MAX_AGE_DAYS``) and total size on disk
+(``RETENTION_MAX_BYTES``); a limit of 0 turns that rule off. A user's
+newest dataset is always kept, so their summary endpoints keep working,
+and so are the datasets of an upload batch that still has files queued or
+being parsed; they count towards the limits, but are only removed once the
+whole batch is done.
+
+Nothing is deleted while an upload is being handled. The janitor thread,
+started with the WSGI application, sweeps everyone every
+``RETENTION_INTERVAL`` seconds, and the owner of an upload job right after
+it finishes; ``manage.py enforce_retention`` does the same from cron where
+the app is served some other way. Periodic sweeps also discard
+resumable upload sessions idle for ``UPLOAD_SESSION_EXPIRY``. Rows are removed with bulk
+deletes in batches, and their files are only removed once the batch's
+transaction has committed.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .artifacts import delete_artifact
+from .models import Dataset, DatasetGeneration, UploadJob
+from .uploads import expire_sessions
+
+
+logger = logging.getLogger(__name__)
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def _owner_filter(owners):
+    # ``None`` in ``owners`` stands for the datasets uploaded before ownership
+    owner_ids = [owner_id for owner_id in owners if owner_id is not None]
+    condition = Q(owner_id__in=owner_ids)
+    if len(owner_ids) != len(owners):
+        condition |= Q(owner__isnull=True)
+    return condition
+
+
+def _unfinished_batch_datasets():
+    unfinished = UploadJob.objects.filter(
+        batch_id__isnull=False, state__in=[UploadJob.QUEUED, UploadJob.RUNNING]
+    ).values('batch_id')
+    return set(UploadJob.objects.filter(batch_id__in=unfinished, dataset__isnull=False).values_list('dataset_id', flat=True))
+
+
+def expired_dataset_ids(owners=None, keep=None, max_age_days=None, max_bytes=None, now=None):
+    """Ids of the datasets the retention policy no longer keeps.
+
+    Only the datasets of ``owners`` (user ids) are considered, or everyone's
+    if it is ``None``; the limits apply to each owner separately.
+    """
+    keep = settings.RETENTION_KEEP_DATASETS if keep is None else keep
+    max_age_days = settings.RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    max_bytes = settings.RETENTION_MAX_BYTES if max_bytes is None else max_bytes
+    cutoff = (now or timezone.now()) - timedelta(days=max_age_days)
+
+    rows = Dataset.objects.order_by('owner_id', '-uploaded_at', '-id')
+    if owners is not None:
+        rows = rows.filter(_owner_filter(list(owners)))
+
+    exempt = _unfinished_batch_datasets()
+    expired = []
+    current_owner, position, total_bytes = object(), 0, 0
+    for owner_id, dataset_id, uploaded_at, stored_bytes in rows.values_list(
+        'owner_id', 'id', 'uploaded_at', 'stored_bytes'
+    ).iterator():
+        if owner_id != current_owner:
+            current_owner, position, total_bytes = owner_id, 0, 0
+        position += 1
+        total_bytes += stored_bytes
+        if position == 1 or dataset_id in exempt:
+            continue
+        if (
+            (keep and position > keep)
+            or (max_age_days and uploaded_at < cutoff)
+            or (max_bytes and total_bytes > max_bytes)
+        ):
+            expired.append(dataset_id)
+    return expired
+
+
+def _delete_batch(dataset_ids, started):
+    # Datasets touched since the sweep started (a duplicate upload marks its
+    # dataset as latest) are no longer expired and are left alone.
+    with transaction.atomic():
+        doomed = Dataset.objects.filter(pk__in=dataset_ids, uploaded_at__lte=started)
+        files = list(doomed.values_list('file_path', 'summary__artifact', 'owner_id'))
+        doomed.delete()
+        DatasetGeneration.objects.bump(owner_id for _, _, owner_id in files)
+
+    for file_name, artifact, _ in files:
+        if file_name:
+            default_storage.delete(file_name)
+        delete_artifact(artifact)
+    return len(files)
+
+
+def enforce_retention(owners=None, batch_size=None, **limits):
+    """Delete the datasets of ``owners`` (everyone's if ``None``) that are
+    outside the retention policy.
+
+    ``limits`` override the settings (``keep``, ``max_age_days``,
+    ``max_bytes``). Returns the number of datasets deleted.
+    """
+    batch_size = batch_size or settings.RETENTION_DELETE_BATCH
+    started = timezone.now()
+    expired = expired_dataset_ids(owners, now=started, **limits)
+
+    deleted = 0
+    for start in range(0, len(expired), batch_size):
+        deleted += _delete_batch(expired[start:start + batch_size], started)
+    return deleted
+
+
+class Janitor(threading.Thread):
+    """Daemon thread that enforces retention periodically or when woken."""
+
+    def __init__(self, interval):
+        super().__init__(name='retention-janitor', daemon=True)
+        self.interval = interval
+        self.wakeup = threading.Event()
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def request(self, owner_id):
+        with self.lock:
+            self.pending.add(owner_id)
+        self.wakeup.set()
+
+    def run(self):
+        while True:
+            woken = self.wakeup.wait(self.interval)
+            with self.lock:
+                self.wakeup.clear()
+                owners, self.pending = self.pending, set()
+            try:
+                # A timeout means a periodic sweep of everyone
+                enforce_retention(owners if woken else None)
+                if not woken:
+                    expire_sessions()
+            except Exception:
+                logger.exception('Retention sweep failed')
+            finally:
+                close_old_connections()
+
+
+def start_janitor():
+    """Start the janitor of this process if it is not running yet.
+
+    Called when the WSGI application loads, so periodic sweeps run in every
+    serving process whether or not anyone uploads.
+    """
+    global _janitor
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = Janitor(settings.RETENTION_INTERVAL)
+            _janitor.start()
+    return _janitor
+
+
+def wake_janitor(owner_id):
+    """Ask the janitor to sweep ``owner_id``'s datasets, starting it on first use."""
+    start_janitor().request(owner_id)
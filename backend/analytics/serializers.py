@@ -1,13 +1,118 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Dataset
+from .models import HISTORY_SUMMARY_KEYS, Dataset, EquipmentRecord, UploadJob, UploadSession
+from .uploads import create_session
 
 
-class DatasetSerializer(serializers.ModelSerializer):
+def parse_fields(request, allowed):
+    """The ``?fields=`` sparse fieldset as ``{name: None or set of keys}``,
+    or ``None`` to keep every field.
+    
+    ``name`` keeps a whole field of the response and ``name.key`` one key of
+    a dict field, e.g. ``fields=id,summary.total_count``. Raises
+    ``ValueError`` for a name outside ``allowed``.
+    """
+    value = request.query_params.get('fields')
+    if value is None:
+        return None
+    
+    fields = {}
+    for path in filter(None, (path.strip() for path in value.split(','))):
+        name, _, key = path.partition('.')
+        if name not in allowed:
+            raise ValueError(f"fields must be among: {', '.join(allowed)}")
+        if not key:
+            fields[name] = None
+        elif fields.get(name, set()) is not None:
+            fields.setdefault(name, set()).add(key)
+    return fields
+
+
+def sparse(data, fields):
+    """``data`` cut down to ``fields`` (from ``parse_fields``)."""
+    if fields is None:
+        return data
+    result = {}
+    for name, value in data.items():
+        if name not in fields:
+            continue
+        keys = fields[name]
+        if keys is not None and isinstance(value, dict):
+            value = {key: item for key, item in value.items() if key in keys}
+        result[name] = value
+    return result
+
+
+def wants(fields, name, key=None):
+    """Whether ``fields`` keeps field ``name`` (or its ``key``)."""
+    if fields is None:
+        return True
+    if name not in fields:
+        return False
+    return fields[name] is None or key is None or key in fields[name]
+
+
+class DatasetHistorySerializer(serializers.ModelSerializer):
+    """History entry of a dataset from ``Dataset.objects.with_aggregates()``;
+    its summary holds only the ``HISTORY_SUMMARY_KEYS``."""
+    summary = serializers.SerializerMethodField()
+    
     class Meta:
         model = Dataset
         fields = ['id', 'file_path', 'summary', 'uploaded_at']
-        read_only_fields = ['id', 'uploaded_at']
+        read_only_fields = fields
+    
+    def get_summary(self, obj):
+        return {key: getattr(obj, key) for key in HISTORY_SUMMARY_KEYS}
+
+
+class EquipmentRecordSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EquipmentRecord
+        fields = ['id', 'name', 'type', 'flowrate', 'pressure', 'temperature']
+    
+    def to_representation(self, instance):
+        # Same keys as the rows of the uploaded CSV
+        data = super().to_representation(instance)
+        return {
+            'id': data['id'],
+            'Equipment Name': data['name'],
+            'Type': data['type'],
+            'Flowrate': data['flowrate'],
+            'Pressure': data['pressure'],
+            'Temperature': data['temperature'],
+        }
+
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadJob
+        fields = ['id', 'filename', 'batch_id', 'state', 'progress', 'dataset_id', 'error', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    upload_id = serializers.UUIDField(source='id', read_only=True)
+    chunk_count = serializers.IntegerField(read_only=True)
+    complete = serializers.BooleanField(source='is_complete', read_only=True)
+    
+    class Meta:
+        model = UploadSession
+        fields = ['upload_id', 'filename', 'size', 'chunk_size', 'chunk_count',
+                  'received', 'complete', 'sha256', 'job_id', 'created_at']
+        read_only_fields = ['chunk_size', 'received', 'sha256', 'job_id', 'created_at']
+        extra_kwargs = {'size': {'min_value': 1}}
+    
+    def validate_size(self, value):
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Uploads are limited to {settings.UPLOAD_MAX_SIZE} bytes'
+            )
+        return value
+    
+    def create(self, validated_data):
+        return create_session(validated_data['filename'], validated_data['size'], validated_data.get('owner'))
 
 
 class CSVUploadSerializer(serializers.Serializer):
@@ -0,0 +1,172 @@
+"""Mergeable quantile sketches for the metric columns.
+
+``QuantileSketch`` is a merging t-digest: values are kept as a few dozen
+weighted centroids whose size is bounded by the k1 scale function, so
+centroids are small in the tails and larger around the median. Sketches
+built from separate chunks or workers merge into one with the same error
+bound, and serialize to a couple of KB.
+"""
+import base64
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_COMPRESSION = 200
+
+
+def _encode(array, dtype):
+    return base64.b64encode(np.ascontiguousarray(array, dtype=dtype).tobytes()).decode()
+
+
+def _decode(data, dtype):
+    return np.frombuffer(base64.b64decode(data), dtype=dtype).astype('f8')
+
+
+class QuantileSketch:
+    """t-digest over float values; NaN values are ignored."""
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def from_values(cls, values, compression=DEFAULT_COMPRESSION):
+        sketch = cls(compression)
+        values = np.asarray(values, dtype='f8')
+        values = np.sort(values[~np.isnan(values)])
+        if len(values):
+            sketch.min, sketch.max = float(values[0]), float(values[-1])
+            sketch._compress(values, np.ones(len(values)))
+        return sketch
+
+    @property
+    def count(self):
+        return int(self.weights.sum())
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        means = np.concatenate([self.means, other.means])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(means, kind='stable')
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress(means[order], weights[order])
+        return self
+
+    def _scale(self, q):
+        return self.compression / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0, 1) - 1)
+
+    def _compress(self, means, weights):
+        # Points whose midpoint falls in the same unit of k1 scale share a
+        # centroid, which caps every centroid at a k-span of about one.
+        total = weights.sum()
+        midpoints = (np.cumsum(weights) - weights / 2) / total
+        buckets = np.floor(self._scale(midpoints) - self._scale(0)).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile(s); ``None`` if the sketch is empty."""
+        if not self.count:
+            return None
+        ranks = np.cumsum(self.weights) - self.weights / 2
+        xp = np.r_[0.0, ranks, self.weights.sum()]
+        fp = np.r_[self.min, self.means, self.max]
+        return np.interp(np.asarray(q, dtype='f8') * self.weights.sum(), xp, fp)
+
+    def rank_error(self, q):
+        """Upper bound on the rank error of ``quantile(q)``, as a fraction."""
+        q = np.asarray(q, dtype='f8')
+        return np.pi * np.sqrt(q * (1 - q)) / self.compression + 1 / max(self.count, 1)
+
+    def to_dict(self):
+        return {
+            'compression': self.compression,
+            'min': self.min,
+            'max': self.max,
+            'means': _encode(self.means, '<f8'),
+            'weights': _encode(np.rint(self.weights), '<u4'),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['compression'])
+        sketch.min, sketch.max = data['min'], data['max']
+        sketch.means = _decode(data['means'], '<f8')
+        sketch.weights = _decode(data['weights'], '<u4')
+        return sketch
+
+
+class MetricSketches:
+    """One sketch per metric column, overall and per equipment type."""
+
+    def __init__(self, columns, compression=DEFAULT_COMPRESSION):
+        self.columns = list(columns)
+        self.compression = compression
+        self.overall = self._new_sketches()
+        self.by_type = {}
+
+    def _new_sketches(self):
+        return {col: QuantileSketch(self.compression) for col in self.columns}
+
+    def _type_sketches(self, eq_type):
+        if eq_type not in self.by_type:
+            self.by_type[eq_type] = self._new_sketches()
+        return self.by_type[eq_type]
+
+    def update(self, df):
+        codes, uniques = pd.factorize(df['Type'])
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+        group_codes = sorted_codes[np.r_[0, boundaries]] if len(codes) else []
+
+        for col in self.columns:
+            values = df[col].to_numpy(dtype='f8', na_value=np.nan)
+            self.overall[col].merge(QuantileSketch.from_values(values, self.compression))
+            for code, group in zip(group_codes, np.split(values[order], boundaries)):
+                if code >= 0:
+                    sketch = QuantileSketch.from_values(group, self.compression)
+                    self._type_sketches(str(uniques[code]))[col].merge(sketch)
+        return self
+
+    def merge(self, other):
+        for col in self.columns:
+            self.overall[col].merge(other.overall[col])
+        for eq_type, sketches in other.by_type.items():
+            mine = self._type_sketches(eq_type)
+            for col in self.columns:
+                mine[col].merge(sketches[col])
+        return self
+
+    def get(self, col, eq_type=None):
+        """The sketch of ``col`` for ``eq_type`` (all rows if ``None``)."""
+        if eq_type is None:
+            return self.overall[col]
+        sketches = self.by_type.get(eq_type)
+        return sketches[col] if sketches else None
+
+    def to_dict(self):
+        def dump(sketches):
+            return {col.lower(): sketch.to_dict() for col, sketch in sketches.items()}
+
+        return {
+            'overall': dump(self.overall),
+            'by_type': {eq_type: dump(sketches) for eq_type, sketches in self.by_type.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data, columns):
+        def load(sketches):
+            return {col: QuantileSketch.from_dict(sketches[col.lower()]) for col in columns}
+
+        result = cls(columns)
+        result.overall = load(data['overall'])
+        result.by_type = {eq_type: load(sketches) for eq_type, sketches in data['by_type'].items()}
+        return result
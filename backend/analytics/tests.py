@@ -1,18 +1,66 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipIf
+
+import numpy as np
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
 from io import StringIO
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import artifacts, compression, jobs, reports
+from .artifacts import ColumnarWriter, ColumnStore
+from .parsers import ORJSONParser
+from .renderers import Columns, ORJSONRenderer, msgpack, pyarrow
+from . import uploads
+from .jobs import run_job
+from .models import HISTORY_SUMMARY_KEYS, Dataset, DatasetGeneration, EquipmentRecord, MetricRollup, UploadJob, UploadSession
+from .retention import enforce_retention
+from .sketches import MetricSketches, QuantileSketch
+from .utils import NUMERIC_COLUMNS, REQUIRED_COLUMNS, LimitedStream, MetricColumns, parse_csv, compute_histograms, compute_rollups, compute_stats, detect_anomalies, compute_summary, summarize_csv, SummaryAccumulator, zstandard
+
+
+VALID_CSV = (
+	"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+	"Pump A,Pump,10.5,1.2,25.0\n"
+	"Valve B,Valve,5.0,0.8,22.5\n"
+	"Compressor C,Compressor,20.0,2.5,40.0\n"
+)
+
 
-from .utils import parse_csv, compute_summary
+class MediaRootMixin:
+	def setUp(self):
+		super().setUp()
+		self.media_root = tempfile.mkdtemp()
+		self.media_override = override_settings(MEDIA_ROOT=self.media_root)
+		self.media_override.enable()
+
+	def tearDown(self):
+		self.media_override.disable()
+		shutil.rmtree(self.media_root, ignore_errors=True)
+		super().tearDown()
 
 
 class UtilsTests(TestCase):
 	def setUp(self):
-		self.valid_csv = StringIO(
-			"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
-			"Pump A,Pump,10.5,1.2,25.0\n"
-			"Valve B,Valve,5.0,0.8,22.5\n"
-			"Compressor C,Compressor,20.0,2.5,40.0\n"
-		)
+		self.valid_csv = StringIO(VALID_CSV)
 
 		self.missing_cols_csv = StringIO(
 			"Name,Category,Flow,Press,Temp\n"
@@ -24,6 +72,27 @@ class UtilsTests(TestCase):
 		self.assertEqual(len(df), 3)
 		self.assertIn('Equipment Name', df.columns)
 
+	def test_parse_csv_applies_schema(self):
+		df = parse_csv(StringIO(
+			"Notes,Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+			"spare,Pump A,Pump,10,1,25\n"
+		))
+		self.assertEqual(sorted(df.columns), sorted(REQUIRED_COLUMNS))
+		self.assertEqual(df['Type'].dtype, 'category')
+		self.assertEqual(df['Flowrate'].dtype, 'float64')
+
+	def test_non_numeric_value_falls_back_to_lenient_parser(self):
+		chunks = []
+		summary = summarize_csv(
+			StringIO(VALID_CSV + "Pump D,Pump,n/a?,1.0,30.0\n"),
+			chunksize=2, on_chunk=chunks.append,
+		)
+		self.assertEqual(summary['total_count'], 4)
+		self.assertEqual(summary['type_distribution']['Pump'], 2)
+		names = [name for chunk in chunks for name in chunk['Equipment Name']]
+		self.assertEqual(names, ['Pump A', 'Valve B', 'Compressor C', 'Pump D'])
+		self.assertTrue(chunks[-1]['Flowrate'].isna().iloc[-1])
+
 	def test_parse_csv_missing_columns_raises(self):
 		with self.assertRaises(ValidationError):
 			parse_csv(self.missing_cols_csv)
@@ -36,3 +105,1033 @@ class UtilsTests(TestCase):
 		self.assertAlmostEqual(summary['avg_flowrate'], (10.5 + 5.0 + 20.0) / 3)
 		self.assertIn('Pump', summary['type_distribution'])
 
+	def test_compute_stats_overall_and_per_type(self):
+		df = parse_csv(StringIO(VALID_CSV + "Pump D,Pump,,1.0,30.0\n"))
+		stats = compute_stats(df)
+		flowrate = stats['overall']['flowrate']
+		self.assertEqual(flowrate['count'], 3)
+		self.assertAlmostEqual(flowrate['mean'], (10.5 + 5.0 + 20.0) / 3)
+		self.assertEqual((flowrate['min'], flowrate['p50'], flowrate['max']), (5.0, 10.5, 20.0))
+		pump = stats['by_type']['Pump']
+		self.assertEqual(pump['temperature']['count'], 2)
+		# Quantiles come from the t-digest, which holds two values exactly
+		self.assertEqual(pump['temperature']['p95'], 30.0)
+		self.assertEqual(pump['temperature']['std'], np.std([25.0, 30.0], ddof=1))
+		self.assertIsNone(pump['flowrate']['std'])
+		self.assertEqual(compute_summary(df)['stats'], stats)
+
+	def test_compute_histograms(self):
+		df = parse_csv(StringIO(VALID_CSV + "Pump D,Pump,,1.0,30.0\n"))
+		sketches = MetricSketches(NUMERIC_COLUMNS).update(df)
+		histograms = compute_histograms(MetricColumns.from_frame(df), sketches, bins=3, max_bins=2)
+		fixed = histograms['flowrate']['fixed']
+		self.assertEqual(fixed['edges'], [5.0, 10.0, 15.0, 20.0])
+		self.assertEqual(fixed['overall'], [1, 1, 1])
+		self.assertEqual(fixed['by_type']['Pump'], [0, 1, 0])
+		adaptive = histograms['temperature']['adaptive']
+		self.assertEqual(sum(adaptive['overall']['counts']), 4)
+		self.assertLessEqual(len(adaptive['overall']['counts']), 2)
+		self.assertEqual(adaptive['by_type']['Valve'], {'edges': [22.0, 23.0], 'counts': [1]})
+
+	def test_summarize_csv_matches_compute_summary(self):
+		expected = compute_summary(parse_csv(StringIO(self.valid_csv.getvalue())))
+		summary = summarize_csv(StringIO(self.valid_csv.getvalue()), chunksize=1)
+		self.assertEqual(summary['total_count'], expected['total_count'])
+		self.assertEqual(summary['type_distribution'], expected['type_distribution'])
+		for key in ('avg_flowrate', 'avg_pressure', 'avg_temperature'):
+			self.assertAlmostEqual(summary[key], expected[key])
+
+	def test_summarize_csv_passes_chunks(self):
+		chunks = []
+		summary = summarize_csv(self.valid_csv, chunksize=2, on_chunk=chunks.append)
+		self.assertEqual(summary['total_count'], 3)
+		self.assertNotIn('equipment_data', summary)
+		self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+
+	def test_summarize_csv_missing_columns_raises(self):
+		with self.assertRaises(ValidationError):
+			summarize_csv(self.missing_cols_csv, chunksize=1)
+
+	def test_accumulator_merge(self):
+		left, right = SummaryAccumulator(), SummaryAccumulator()
+		df = parse_csv(self.valid_csv)
+		left.update(df.iloc[:1].copy())
+		right.update(df.iloc[1:].copy())
+		summary = left.merge(right).summary()
+		self.assertEqual(summary['total_count'], 3)
+		self.assertAlmostEqual(summary['avg_pressure'], (1.2 + 0.8 + 2.5) / 3)
+		self.assertEqual(left.moments[None]['Temperature'].min, 22.5)
+		self.assertEqual(left.moments[None]['Flowrate'].max, 20.0)
+		pressure = left.stats()['overall']['pressure']
+		self.assertAlmostEqual(pressure['std'], np.std([1.2, 0.8, 2.5], ddof=1))
+		self.assertEqual((pressure['p50'], pressure['p95']), (compute_stats(df)['overall']['pressure']['p50'], 2.5))
+		self.assertEqual([(r['type'], r['count']) for r in left.rollups()], [(r['type'], r['count']) for r in compute_rollups(df)])
+
+
+class SketchTests(TestCase):
+	def test_merged_sketch_stays_within_error_bound(self):
+		values = np.random.default_rng(0).lognormal(size=200000)
+		sketch = QuantileSketch()
+		for chunk in np.array_split(values, 7):
+			sketch.merge(QuantileSketch.from_values(chunk))
+		self.assertEqual(sketch.count, len(values))
+		self.assertLessEqual(len(sketch.means), sketch.compression // 2 + 1)
+
+		qs = np.array([0.001, 0.1, 0.5, 0.95, 0.999])
+		ranks = np.searchsorted(np.sort(values), sketch.quantile(qs)) / len(values)
+		self.assertTrue(np.all(np.abs(ranks - qs) <= sketch.rank_error(qs)))
+
+		restored = QuantileSketch.from_dict(sketch.to_dict())
+		np.testing.assert_allclose(restored.quantile(qs), sketch.quantile(qs))
+
+	def test_small_inputs_are_exact(self):
+		sketch = QuantileSketch.from_values([20.0, np.nan, 5.0, 10.5])
+		self.assertEqual(sketch.count, 3)
+		self.assertEqual(sketch.quantile(0.5), 10.5)
+		self.assertEqual(sketch.quantile(0), 5.0)
+		self.assertEqual(sketch.quantile(1), 20.0)
+		self.assertIsNone(QuantileSketch().quantile(0.5))
+
+	def test_summary_sketches_per_type(self):
+		summary = summarize_csv(StringIO(VALID_CSV + "Pump D,Pump,30.0,1.0,30.0\n"), chunksize=2)
+		sketches = MetricSketches.from_dict(summary['sketches'], ['Flowrate'])
+		self.assertEqual(sketches.get('Flowrate').count, 4)
+		self.assertEqual(sketches.get('Flowrate', 'Pump').quantile(0.5), 20.25)
+		self.assertIsNone(sketches.get('Flowrate', 'Mixer'))
+
+
+class ArtifactTests(MediaRootMixin, TestCase):
+	def test_round_trip_across_chunks(self):
+		with ColumnarWriter() as writer:
+			summarize_csv(StringIO(VALID_CSV + ",Pump,oops,,1\n"), chunksize=2, on_chunk=writer.append)
+			pointer = writer.close()
+
+		store = ColumnStore(pointer)
+		self.assertEqual(len(store), 4)
+		self.assertEqual(store.types, ['Pump', 'Valve', 'Compressor'])
+		self.assertEqual(store.names(1, 3), ['Valve B', 'Compressor C'])
+		records = store.records()
+		self.assertEqual(records[2]['Flowrate'], 20.0)
+		self.assertEqual(records[3]['Type'], 'Pump')
+		self.assertIsNone(records[3]['Flowrate'])
+		self.assertEqual(records[3]['Equipment Name'], '')
+
+	def test_failed_write_removes_directory(self):
+		with self.assertRaises(ValidationError):
+			with ColumnarWriter() as writer:
+				summarize_csv(StringIO("Name\nx\n"), on_chunk=writer.append)
+		self.assertEqual(os.listdir(os.path.join(self.media_root, 'datasets')), [])
+
+
+@override_settings(UPLOAD_JOBS_EAGER=True, REPORT_PRERENDER=False)
+class APITestCase(MediaRootMixin, TestCase):
+	def setUp(self):
+		super().setUp()
+		# Cached responses are keyed by user id, which the test database reuses
+		cache.clear()
+		self.user = User.objects.create(username='operator')
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+
+	def upload(self, name='plant.csv', content=VALID_CSV, status_code=202):
+		"""Upload a CSV and return the finished job's status payload."""
+		if isinstance(content, str):
+			content = content.encode()
+		response = self.client.post(
+			'/api/upload/',
+			{'file': SimpleUploadedFile(name, content)},
+			format='multipart',
+		)
+		self.assertEqual(response.status_code, status_code)
+		return self.client.get(response['Location'])
+
+
+class UploadViewTests(APITestCase):
+
+	def test_upload_stores_rows_outside_summary(self):
+		response = self.upload()
+		self.assertEqual(response.data['state'], UploadJob.SUCCEEDED)
+		dataset = Dataset.objects.get(pk=response.data['dataset_id'])
+		self.assertNotIn('equipment_data', dataset.summary)
+		self.assertEqual(len(dataset.artifact), 3)
+		self.assertEqual(dataset.summary['stats']['by_type']['Valve']['pressure']['max'], 0.8)
+
+		response = self.client.get('/api/summary/')
+		self.assertEqual(response.status_code, 200)
+		rows = response.data['summary']['equipment_data']
+		self.assertEqual([row['Equipment Name'] for row in rows], ['Pump A', 'Valve B', 'Compressor C'])
+
+	def test_upload_creates_equipment_records(self):
+		response = self.upload(content=VALID_CSV + "Pump D,Pump,,1.0,30.0\n")
+		dataset = Dataset.objects.get(pk=response.data['dataset_id'])
+		self.assertEqual(dataset.records.count(), 4)
+		self.assertEqual(dataset.records.filter(type='Pump').count(), 2)
+		self.assertIsNone(dataset.records.get(name='Pump D').flowrate)
+
+	def test_failed_job_reports_error(self):
+		response = self.upload(content="Name,Category\nx,y\n")
+		self.assertEqual(response.data['state'], UploadJob.FAILED)
+		self.assertIn('Missing required columns', response.data['error'])
+		self.assertIsNone(response.data['dataset_id'])
+		self.assertFalse(Dataset.objects.exists())
+		self.assertEqual(os.listdir(os.path.join(self.media_root, 'csv_files')), [])
+
+	def test_identical_upload_reuses_dataset(self):
+		first = self.upload().data
+		dataset = Dataset.objects.get(pk=first['dataset_id'])
+		self.assertEqual(dataset.content_sha256, hashlib.sha256(VALID_CSV.encode()).hexdigest())
+
+		second = self.upload(name='copy.csv', status_code=200).data
+		self.assertEqual(second['state'], UploadJob.SUCCEEDED)
+		self.assertEqual(second['dataset_id'], dataset.pk)
+		self.assertEqual(Dataset.objects.count(), 1)
+		self.assertEqual(os.listdir(os.path.join(self.media_root, 'csv_files')), ['plant.csv'])
+
+		self.upload(content=VALID_CSV + "Pump D,Pump,1.0,1.0,30.0\n")
+		self.assertEqual(Dataset.objects.count(), 2)
+
+	def test_compressed_uploads(self):
+		archive = io.BytesIO()
+		with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+			zf.writestr('export/plant.csv', VALID_CSV + "Pump D,Pump,1.0,1.0,30.0\n")
+		files = {
+			'plant.csv.gz': gzip.compress(VALID_CSV.encode()),
+			'plant.zip': archive.getvalue(),
+			'plant.csv.zst': zstandard.ZstdCompressor().compress(VALID_CSV.encode() + b"Valve E,Valve,1,1,1\n"),
+		}
+
+		for name, content in files.items():
+			with self.subTest(name=name):
+				job = self.upload(name=name, content=content).data
+				self.assertEqual(job['state'], UploadJob.SUCCEEDED, job['error'])
+				dataset = Dataset.objects.get(pk=job['dataset_id'])
+				self.assertIn(dataset.summary['total_count'], (3, 4))
+				self.assertEqual(dataset.file_path.name, f'csv_files/{name}')
+				with dataset.file_path.open('rb') as f:
+					self.assertEqual(f.read(), content)
+
+	def test_decompressed_size_limit(self):
+		archive = io.BytesIO()
+		with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+			zf.writestr('plant.csv', VALID_CSV)
+		files = {'plant.csv.gz': gzip.compress(VALID_CSV.encode()), 'plant.zip': archive.getvalue()}
+		with self.settings(UPLOAD_MAX_DECOMPRESSED_SIZE=len(VALID_CSV) - 1):
+			for name, content in files.items():
+				with self.subTest(name=name):
+					job = self.upload(name=name, content=content).data
+					self.assertEqual(job['state'], UploadJob.FAILED)
+					self.assertIn(f'larger than {len(VALID_CSV) - 1} bytes', job['error'])
+
+		# A zip member that understates its size is still cut off
+		stream = LimitedStream(io.BytesIO(b'x' * 100), limit=60)
+		self.assertEqual(len(stream.read(50)), 50)
+		stream.seek(0)
+		self.assertEqual(len(stream.read(60)), 60)
+		with self.assertRaises(ValidationError):
+			stream.read(10)
+
+	def test_zip_with_several_files_fails(self):
+		archive = io.BytesIO()
+		with zipfile.ZipFile(archive, 'w') as zf:
+			zf.writestr('a.csv', VALID_CSV)
+			zf.writestr('b.csv', VALID_CSV)
+		job = self.upload(name='plant.zip', content=archive.getvalue()).data
+		self.assertEqual(job['state'], UploadJob.FAILED)
+		self.assertIn('exactly one CSV file', job['error'])
+
+	def test_gzip_encoded_body(self):
+		response = self.client.post(
+			'/api/upload/', gzip.compress(VALID_CSV.encode()),
+			content_type='text/csv',
+			HTTP_CONTENT_ENCODING='gzip',
+			HTTP_CONTENT_DISPOSITION='attachment; filename="plant.csv"',
+		)
+		self.assertEqual(response.status_code, 202)
+		job = self.client.get(response['Location']).data
+		dataset = Dataset.objects.get(pk=job['dataset_id'])
+		self.assertEqual(dataset.summary['total_count'], 3)
+		self.assertEqual(dataset.file_path.name, 'csv_files/plant.csv.gz')
+
+		response = self.client.post(
+			'/api/upload/', VALID_CSV.encode(), content_type='text/csv', HTTP_CONTENT_ENCODING='br',
+			HTTP_CONTENT_DISPOSITION='attachment; filename="plant.csv"',
+		)
+		self.assertEqual(response.status_code, 415)
+
+	def test_job_is_claimed_once(self):
+		job = UploadJob.objects.create(file_path='csv_files/missing.csv', state=UploadJob.RUNNING)
+		run_job(job.pk)
+		job.refresh_from_db()
+		self.assertEqual(job.state, UploadJob.RUNNING)
+
+	def test_stale_running_jobs_fail_on_pool_start(self):
+		stale = UploadJob.objects.create(file_path='csv_files/stale.csv', state=UploadJob.RUNNING)
+		live = UploadJob.objects.create(file_path='csv_files/live.csv', state=UploadJob.RUNNING)
+		UploadJob.objects.filter(pk=stale.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+		with mock.patch('analytics.jobs._executor', None), mock.patch('analytics.jobs.ProcessPoolExecutor') as executor:
+			with self.assertLogs('analytics.jobs', 'WARNING'):
+				jobs.get_executor()
+		self.assertFalse(executor.return_value.submit.called)
+		stale.refresh_from_db()
+		live.refresh_from_db()
+		self.assertEqual(stale.state, UploadJob.FAILED)
+		self.assertIn('interrupted', stale.error)
+		self.assertEqual(live.state, UploadJob.RUNNING)
+
+	def test_job_failed_while_running_keeps_no_dataset(self):
+		def fail_then_write(*args):
+			UploadJob.objects.filter(state=UploadJob.RUNNING).update(state=UploadJob.FAILED, error='Processing was interrupted')
+			return artifacts.write_anomalies(*args)
+
+		with mock.patch('analytics.ingest.write_anomalies', side_effect=fail_then_write):
+			with self.assertLogs('analytics.jobs', 'WARNING'):
+				job = self.upload().data
+		self.assertEqual(job['state'], UploadJob.FAILED)
+		self.assertIsNone(job['dataset_id'])
+		self.assertFalse(Dataset.objects.exists())
+		self.assertFalse(MetricRollup.objects.exists())
+
+	def test_unknown_job(self):
+		response = self.client.get('/api/jobs/00000000-0000-0000-0000-000000000000/')
+		self.assertEqual(response.status_code, 404)
+
+	def test_pdf_report(self):
+		self.upload()
+		response = self.client.get('/api/report/pdf/')
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response['Content-Type'], 'application/pdf')
+
+
+class ReportTests(APITestCase):
+	def test_rendered_once_and_stored(self):
+		dataset_id = self.upload().data['dataset_id']
+		stored_bytes = Dataset.objects.get(pk=dataset_id).stored_bytes
+		with mock.patch('analytics.reports.render_report', wraps=reports.render_report) as render_report:
+			first = self.client.get('/api/report/pdf/')
+			second = self.client.get('/api/report/pdf/')
+		self.assertEqual(render_report.call_count, 1)
+		content = b''.join(first.streaming_content)
+		self.assertTrue(content.startswith(b'%PDF'))
+		self.assertEqual(b''.join(second.streaming_content), content)
+		self.assertEqual(first['Accept-Ranges'], 'bytes')
+		self.assertIn('equipment_report.pdf', first['Content-Disposition'])
+
+		dataset = Dataset.objects.get(pk=dataset_id)
+		path = reports.report_path(dataset)
+		self.assertTrue(path.endswith(f'report-{dataset_id}-v{reports.REPORT_VERSION}.pdf'))
+		self.assertEqual(dataset.stored_bytes, stored_bytes + os.path.getsize(path))
+
+	def test_etag_changes_with_report_version(self):
+		self.upload()
+		etag = self.client.get('/api/report/pdf/')['ETag']
+		self.assertEqual(self.client.get('/api/report/pdf/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+		with mock.patch.object(reports, 'REPORT_VERSION', reports.REPORT_VERSION + 1):
+			response = self.client.get('/api/report/pdf/', HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], etag)
+
+	def test_dataset_without_stats(self):
+		dataset = Dataset.objects.get(pk=self.upload().data['dataset_id'])
+		del dataset.summary['stats']
+		self.assertTrue(reports.render_report(dataset).startswith(b'%PDF'))
+
+	def test_prerendered_after_upload(self):
+		with self.settings(REPORT_PRERENDER=True):
+			dataset_id = self.upload().data['dataset_id']
+		self.assertTrue(os.path.exists(reports.report_path(Dataset.objects.get(pk=dataset_id))))
+
+	def test_ranges(self):
+		self.upload()
+		full = self.client.get('/api/report/pdf/')
+		content = b''.join(full.streaming_content)
+
+		part = self.client.get('/api/report/pdf/', HTTP_RANGE='bytes=0-9')
+		self.assertEqual(part.status_code, 206)
+		self.assertEqual(b''.join(part.streaming_content), content[:10])
+		self.assertEqual(part['Content-Length'], '10')
+		self.assertEqual(part['Content-Range'], f'bytes 0-9/{len(content)}')
+		self.assertEqual(part['ETag'], full['ETag'])
+
+		tail = self.client.get('/api/report/pdf/', HTTP_RANGE='bytes=-5', HTTP_IF_RANGE=full['ETag'])
+		self.assertEqual(b''.join(tail.streaming_content), content[-5:])
+		self.assertEqual(self.client.get('/api/report/pdf/', HTTP_RANGE=f'bytes={len(content)}-').status_code, 416)
+
+		# A stale If-Range gets the whole, current report
+		stale = self.client.get('/api/report/pdf/', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+		self.assertEqual(stale.status_code, 200)
+		self.assertEqual(b''.join(stale.streaming_content), content)
+
+
+class EquipmentRecordTests(MediaRootMixin, TestCase):
+	def test_load_artifact_in_batches(self):
+		dataset = Dataset.objects.create(file_path='csv_files/plant.csv', summary={})
+		with ColumnarWriter() as writer:
+			summarize_csv(StringIO(VALID_CSV), on_chunk=writer.append)
+			dataset.summary['artifact'] = writer.close()
+
+		with self.assertNumQueries(2):
+			EquipmentRecord.objects.load_artifact(dataset, dataset.artifact, batch_size=2)
+		self.assertEqual(
+			list(dataset.records.values_list('name', flat=True)),
+			['Pump A', 'Valve B', 'Compressor C'],
+		)
+
+
+class EquipmentEndpointTests(APITestCase):
+	def setUp(self):
+		super().setUp()
+		rows = "".join(
+			f"Unit {i},{'Pump' if i % 2 else 'Valve'},{'' if i % 5 == 0 else i % 4},1.0,20.0\n"
+			for i in range(23)
+		)
+		response = self.upload(content="Equipment Name,Type,Flowrate,Pressure,Temperature\n" + rows)
+		self.url = f"/api/datasets/{response.data['dataset_id']}/equipment/"
+
+	def collect(self, params):
+		names, url = [], self.url
+		while url:
+			response = self.client.get(url, params)
+			self.assertEqual(response.status_code, 200)
+			self.assertLessEqual(len(response.data['results']), params.get('page_size', 100))
+			names += [row['Equipment Name'] for row in response.data['results']]
+			url, params = response.data['next'], {}
+		return names
+
+	def test_pages_follow_sort_order(self):
+		for sort in ('flowrate', '-flowrate'):
+			names = self.collect({'sort': sort, 'page_size': 4})
+			records = EquipmentRecord.objects.order_by(sort, sort.replace('flowrate', 'id'))
+			self.assertEqual(names, [record.name for record in records])
+
+	def test_type_filter_and_page_size_cap(self):
+		names = self.collect({'type': 'Valve', 'page_size': 5})
+		self.assertEqual(len(names), 12)
+		with self.settings(EQUIPMENT_MAX_PAGE_SIZE=3):
+			response = self.client.get(self.url, {'page_size': 50})
+		self.assertEqual(len(response.data['results']), 3)
+
+	def test_invalid_parameters(self):
+		self.assertEqual(self.client.get(self.url, {'sort': 'name'}).status_code, 400)
+		self.assertEqual(self.client.get(self.url, {'cursor': 'bogus'}).status_code, 400)
+		self.assertEqual(self.client.get('/api/datasets/999/equipment/').status_code, 404)
+
+
+class RetentionTests(APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.datasets = []
+		for age in (3, 2, 1, 0):
+			job = self.upload(name=f'day{age}.csv', content=VALID_CSV + f"Pump {age},Pump,1,1,{age}\n").data
+			Dataset.objects.filter(pk=job['dataset_id']).update(uploaded_at=timezone.now() - timedelta(days=age))
+			self.datasets.append(Dataset.objects.get(pk=job['dataset_id']))
+
+	def remaining(self):
+		return list(Dataset.objects.order_by('uploaded_at').values_list('id', flat=True))
+
+	def test_keep_count_deletes_rows_and_files(self):
+		oldest = self.datasets[0]
+		self.assertGreater(oldest.stored_bytes, oldest.file_path.size)
+		self.assertEqual(enforce_retention(keep=2, batch_size=1), 2)
+		self.assertEqual(self.remaining(), [d.id for d in self.datasets[2:]])
+		self.assertFalse(EquipmentRecord.objects.filter(dataset=oldest).exists())
+		self.assertFalse(os.path.exists(oldest.file_path.path))
+		self.assertFalse(os.path.exists(os.path.join(self.media_root, oldest.summary['artifact'])))
+
+	def test_age_and_size_limits(self):
+		self.assertEqual(enforce_retention(keep=0, max_age_days=3, max_bytes=0), 1)
+		size = sum(d.stored_bytes for d in self.datasets[2:])
+		self.assertEqual(enforce_retention(keep=0, max_age_days=0, max_bytes=size), 1)
+		self.assertEqual(self.remaining(), [d.id for d in self.datasets[2:]])
+
+		# The newest dataset survives any limit
+		enforce_retention(keep=0, max_age_days=0, max_bytes=1)
+		Dataset.objects.update(uploaded_at=timezone.now() - timedelta(days=30))
+		enforce_retention(keep=0, max_age_days=1, max_bytes=0)
+		self.assertEqual(self.remaining(), [self.datasets[-1].id])
+
+	def test_upload_does_not_delete_inline(self):
+		with self.settings(UPLOAD_JOBS_EAGER=False, RETENTION_KEEP_DATASETS=1):
+			with mock.patch('analytics.jobs.get_executor') as get_executor, self.captureOnCommitCallbacks(execute=True):
+				self.upload(name='new.csv', content=VALID_CSV + "Pump N,Pump,1,1,1\n")
+		self.assertEqual(Dataset.objects.count(), 4)
+		future = get_executor.return_value.submit.return_value
+		self.assertTrue(future.add_done_callback.called)
+
+
+class OwnershipTests(APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.job = self.upload().data
+		self.other = APIClient()
+		self.other.force_authenticate(User.objects.create(username='visitor'))
+
+	def test_other_users_see_nothing(self):
+		dataset_id = self.job['dataset_id']
+		self.assertEqual(Dataset.objects.get(pk=dataset_id).owner, self.user)
+		self.assertEqual(self.other.get('/api/summary/').status_code, 404)
+		self.assertEqual(self.other.get('/api/history/').data, [])
+		self.assertEqual(self.other.get(f'/api/jobs/{self.job["id"]}/').status_code, 404)
+		for path in ('equipment', 'histograms', 'quantiles'):
+			self.assertEqual(self.other.get(f'/api/datasets/{dataset_id}/{path}/').status_code, 404)
+		self.assertEqual(self.client.get('/api/summary/').data['dataset_id'], dataset_id)
+
+	def test_duplicates_and_retention_are_per_user(self):
+		response = self.other.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', VALID_CSV.encode())}, format='multipart')
+		self.assertEqual(response.status_code, 202)
+		theirs = self.other.get(response['Location']).data['dataset_id']
+		self.assertNotEqual(theirs, self.job['dataset_id'])
+
+		self.upload(name='newer.csv', content=VALID_CSV + "Pump N,Pump,1,1,1\n")
+		self.assertEqual(enforce_retention(keep=1), 1)
+		self.assertFalse(Dataset.objects.filter(pk=self.job['dataset_id']).exists())
+		self.assertTrue(Dataset.objects.filter(pk=theirs).exists())
+
+	def test_claim_legacy_datasets(self):
+		dataset_id = self.job['dataset_id']
+		Dataset.objects.update(owner=None)
+		MetricRollup.objects.update(owner=None)
+		self.assertEqual(self.other.get('/api/summary/').status_code, 404)
+
+		call_command('claim_legacy_datasets', 'visitor', stdout=io.StringIO())
+		self.assertEqual(self.other.get('/api/summary/').data['dataset_id'], dataset_id)
+		self.assertFalse(MetricRollup.objects.filter(owner=None).exists())
+		with self.assertRaises(CommandError):
+			call_command('claim_legacy_datasets', 'nobody')
+
+
+class BatchUploadTests(APITestCase):
+	def test_batch_of_files_and_zip(self):
+		archive = io.BytesIO()
+		with zipfile.ZipFile(archive, 'w') as zf:
+			zf.writestr('unit/line2.csv', VALID_CSV + "Pump D,Pump,1.0,1.0,30.0\n")
+			zf.writestr('unit/readme.txt', 'notes')
+			zf.writestr('__MACOSX/unit/._line2.csv', 'junk')
+		response = self.client.post('/api/upload/batch/', {'files': [
+			SimpleUploadedFile('line1.csv', VALID_CSV.encode()),
+			SimpleUploadedFile('broken.csv', b'Name\nx\n'),
+			SimpleUploadedFile('unit.zip', archive.getvalue()),
+			SimpleUploadedFile('line1-copy.csv', VALID_CSV.encode()),
+		]}, format='multipart')
+		self.assertEqual(response.status_code, 202)
+		files = {item['filename']: item for item in response.data['files']}
+		self.assertEqual(list(files), ['line1.csv', 'broken.csv', 'line2.csv', 'readme.txt', 'line1-copy.csv'])
+		self.assertEqual(files['readme.txt']['error'], 'Not a CSV file')
+		# Copies inside one batch are only matched once the first is parsed
+		self.assertFalse(files['line1-copy.csv']['reused'])
+
+		batch = self.client.get(response['Location']).data
+		self.assertTrue(batch['finished'])
+		self.assertEqual(batch['counts'], {UploadJob.SUCCEEDED: 3, UploadJob.FAILED: 1})
+		jobs = {job['filename']: job for job in batch['jobs']}
+		self.assertIn('Missing required columns', jobs['broken.csv']['error'])
+		self.assertEqual(Dataset.objects.get(pk=jobs['line2.csv']['dataset_id']).summary['total_count'], 4)
+		self.assertEqual(jobs['line1.csv']['dataset_id'], jobs['line1-copy.csv']['dataset_id'])
+
+	def test_retention_keeps_the_datasets_of_a_running_batch(self):
+		files = [SimpleUploadedFile(f'line{i}.csv', (VALID_CSV + f"Pump {i},Pump,1,1,1\n").encode()) for i in range(8)]
+		remaining = []
+
+		def sweep(*args, **kwargs):
+			deleted = enforce_retention(*args, **kwargs)
+			remaining.append(Dataset.objects.count())
+			return deleted
+
+		with mock.patch('analytics.retention.enforce_retention', side_effect=sweep):
+			response = self.client.post('/api/upload/batch/', {'files': files}, format='multipart')
+		self.assertEqual(response.status_code, 202)
+		# Every file got its dataset and none was swept while the batch ran
+		self.assertEqual(remaining, [1, 2, 3, 4, 5, 6, 7, settings.RETENTION_KEEP_DATASETS])
+		jobs = UploadJob.objects.filter(batch_id=response.data['batch_id'])
+		self.assertEqual(jobs.filter(state=UploadJob.SUCCEEDED).count(), 8)
+
+	def test_batch_zip_member_size_limit(self):
+		archive = io.BytesIO()
+		with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+			zf.writestr('big.csv', VALID_CSV + "Pump D,Pump,1.0,1.0,30.0\n" * 100)
+			zf.writestr('small.csv', VALID_CSV)
+		with self.settings(UPLOAD_MAX_DECOMPRESSED_SIZE=len(VALID_CSV) + 10):
+			response = self.client.post('/api/upload/batch/', {
+				'files': [SimpleUploadedFile('units.zip', archive.getvalue())],
+			}, format='multipart')
+		self.assertEqual(response.status_code, 202)
+		files = {item['filename']: item for item in response.data['files']}
+		self.assertIn('uncompressed', files['big.csv']['error'])
+		self.assertIn('job_id', files['small.csv'])
+
+	def test_batch_requires_files(self):
+		self.assertEqual(self.client.post('/api/upload/batch/', {}, format='multipart').status_code, 400)
+		self.assertEqual(self.client.get('/api/batches/00000000-0000-0000-0000-000000000000/').status_code, 404)
+
+
+class CompareEndpointTests(APITestCase):
+	def test_compare_two_uploads(self):
+		before = self.upload(name='week1.csv').data['dataset_id']
+		after = self.upload(name='week2.csv', content=(
+			"Equipment Name,Type,Flowrate,Pressure,Temperature\n"
+			"Pump A,Pump,12.5,1.2,25.0\n"
+			"Valve B,Pump,5.0,,22.5\n"
+			"Reactor D,Reactor,30.0,3.0,90.0\n"
+		)).data['dataset_id']
+
+		response = self.client.get('/api/datasets/compare/', {'a': before, 'b': after})
+		self.assertEqual(response.status_code, 200)
+		data = response.data
+		self.assertEqual(data['equipment'], {'a': 3, 'b': 3, 'matched': 2, 'added': 1, 'removed': 1, 'type_changed': 1})
+		self.assertEqual(data['added'][0]['Equipment Name'], 'Reactor D')
+		self.assertEqual(data['removed'][0]['Type'], 'Compressor')
+		flowrate = data['metrics']['flowrate']
+		self.assertEqual(flowrate['changed'], 1)
+		self.assertEqual(flowrate['largest'], [{'Equipment Name': 'Pump A', 'Type': 'Pump', 'a': 10.5, 'b': 12.5, 'delta': 2.0}])
+		self.assertEqual(data['metrics']['pressure']['changed'], 1)
+		self.assertEqual(data['types']['Pump']['count'], {'a': 1, 'b': 2, 'delta': 1})
+		self.assertEqual(data['types']['Pump']['temperature']['delta'], -1.25)
+
+		# Served from the stored result the second time
+		with mock.patch('analytics.compare.compute_comparison') as compute:
+			cached = self.client.get('/api/datasets/compare/', {'a': before, 'b': after, 'limit': 0})
+		compute.assert_not_called()
+		self.assertEqual(cached.data['added'], [])
+		self.assertEqual(cached.data['equipment'], data['equipment'])
+
+	def test_compare_validation(self):
+		dataset_id = self.upload().data['dataset_id']
+		self.assertEqual(self.client.get('/api/datasets/compare/', {'a': dataset_id}).status_code, 400)
+		self.assertEqual(self.client.get('/api/datasets/compare/', {'a': dataset_id, 'b': 999}).status_code, 404)
+		self.assertEqual(self.client.get('/api/datasets/compare/', {'a': dataset_id, 'b': dataset_id}).data['equipment']['matched'], 3)
+
+
+class TrendTests(APITestCase):
+	def test_rollups_add_up(self):
+		rollups = compute_rollups(parse_csv(StringIO(VALID_CSV + "Pump D,Pump,,3.0,35.0\n")))
+		pump = next(r for r in rollups if r['type'] == 'Pump' and r['metric'] == 'pressure')
+		self.assertEqual(pump, {'type': 'Pump', 'metric': 'pressure', 'count': 2, 'sum': 4.2, 'sumsq': 1.44 + 9.0, 'min': 1.2, 'max': 3.0})
+		flowrate = next(r for r in rollups if r['type'] is None and r['metric'] == 'flowrate')
+		self.assertEqual((flowrate['count'], flowrate['sum']), (3, 35.5))
+
+	def test_trends_per_dataset_and_bucket(self):
+		first = self.upload(name='a.csv').data['dataset_id']
+		second = self.upload(name='b.csv', content=VALID_CSV + "Pump D,Pump,20.5,2.0,30.0\n").data['dataset_id']
+		self.assertEqual(MetricRollup.objects.filter(dataset_id=second, type=None).count(), 3)
+		Dataset.objects.filter(pk=first).update(uploaded_at=timezone.now() - timedelta(days=40))
+		MetricRollup.objects.filter(dataset_id=first).update(uploaded_at=timezone.now() - timedelta(days=40))
+
+		response = self.client.get('/api/trends/', {'metric': 'flowrate', 'type': 'Pump'})
+		self.assertEqual(response.status_code, 200)
+		points = response.data['series']['flowrate']
+		self.assertEqual([p['dataset_id'] for p in points], [first, second])
+		self.assertEqual(points[1]['mean'], 15.5)
+		self.assertAlmostEqual(points[1]['std'], 7.0710678)
+
+		# Rollups outlive retention and combine per bucket
+		enforce_retention(keep=1)
+		since = (timezone.now() - timedelta(days=60)).date().isoformat()
+		response = self.client.get('/api/trends/', {'metric': 'flowrate', 'bucket': 'month', 'since': since})
+		points = response.data['series']['flowrate']
+		self.assertEqual(sum(p['datasets'] for p in points), 2)
+		self.assertEqual(sum(p['count'] for p in points), 7)
+
+		self.assertEqual(self.client.get('/api/trends/', {'since': 'yesterday'}).status_code, 400)
+		self.assertEqual(self.client.get('/api/trends/', {'bucket': 'year'}).status_code, 400)
+
+	def test_duplicate_upload_moves_its_rollups(self):
+		dataset_id = self.upload().data['dataset_id']
+		Dataset.objects.filter(pk=dataset_id).update(uploaded_at=timezone.now() - timedelta(days=40))
+		MetricRollup.objects.filter(dataset_id=dataset_id).update(uploaded_at=timezone.now() - timedelta(days=40))
+		self.upload(name='again.csv', status_code=200)
+
+		uploaded_at = Dataset.objects.get(pk=dataset_id).uploaded_at
+		self.assertEqual(set(MetricRollup.objects.filter(dataset_id=dataset_id).values_list('uploaded_at', flat=True)), {uploaded_at})
+
+
+OUTLIER_CSV = "Equipment Name,Type,Flowrate,Pressure,Temperature\n" + "".join(
+	f"Pump {i},Pump,{10 + i % 3},1.{i % 4},25.0\n" for i in range(20)
+) + "Pump X,Pump,95.0,1.1,25.0\nValve Y,Valve,5.0,0.8,22.5\n"
+
+
+class AnomalyTests(APITestCase):
+	def test_detects_per_type_outliers(self):
+		df = parse_csv(StringIO(OUTLIER_CSV))
+		with self.settings(CSV_CHUNK_SIZE=8):
+			anomalies = detect_anomalies(
+				MetricColumns.from_frame(df), MetricSketches(NUMERIC_COLUMNS).update(df), z_threshold=3.5, iqr_factor=1.5
+			)
+		self.assertEqual(anomalies['rows'].tolist(), [20])
+		self.assertEqual(anomalies['flags'].tolist(), [0b11])
+		self.assertGreater(anomalies['scores'][0, 0], 3.5)
+		self.assertEqual(anomalies['bounds']['flowrate']['Pump']['median'], 11.0)
+		# A single value has a MAD of 0 and no z-score
+		self.assertEqual(anomalies['bounds']['pressure']['Valve']['mad'], 0.0)
+
+	def test_anomalies_endpoint(self):
+		dataset_id = self.upload(content=OUTLIER_CSV).data['dataset_id']
+		self.assertEqual(Dataset.objects.get(pk=dataset_id).summary['anomalies']['by_metric']['flowrate'], 1)
+
+		response = self.client.get(f'/api/datasets/{dataset_id}/anomalies/', {'metric': 'flowrate'})
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.data['count'], 1)
+		result = response.data['results'][0]
+		self.assertEqual((result['row'], result['Equipment Name'], result['Type']), (20, 'Pump X', 'Pump'))
+		self.assertEqual(result['flowrate']['value'], 95.0)
+		self.assertTrue(result['flowrate']['z_outlier'] and result['flowrate']['iqr_outlier'])
+		self.assertFalse(result['pressure']['z_outlier'])
+		self.assertEqual(list(response.data['bounds']), ['flowrate'])
+
+		self.assertEqual(self.client.get(f'/api/datasets/{dataset_id}/anomalies/', {'type': 'Valve'}).data['count'], 0)
+		self.assertEqual(self.client.get(f'/api/datasets/{dataset_id}/anomalies/', {'metric': 'mass'}).status_code, 400)
+
+
+class ConditionalGetTests(APITestCase):
+	def test_summary_history_and_report_revalidate(self):
+		self.upload()
+		for path in ('/api/summary/', '/api/history/', '/api/report/pdf/'):
+			response = self.client.get(path)
+			etag = response['ETag']
+			self.assertFalse(etag.startswith('W/'))
+			self.assertIn('no-cache', response['Cache-Control'])
+			self.assertIn('Last-Modified', response)
+
+			with mock.patch.object(Dataset, 'public_summary') as public_summary:
+				cached = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+			self.assertEqual(cached.status_code, 304)
+			self.assertEqual(cached.content, b'')
+			public_summary.assert_not_called()
+
+		summary_etag = self.client.get('/api/summary/')['ETag']
+		history_etag = self.client.get('/api/history/')['ETag']
+		self.upload(name='next.csv', content=VALID_CSV + "Pump D,Pump,1,1,1\n")
+		self.assertEqual(self.client.get('/api/summary/', HTTP_IF_NONE_MATCH=summary_etag).status_code, 200)
+		self.assertEqual(self.client.get('/api/history/', HTTP_IF_NONE_MATCH=history_etag).status_code, 200)
+
+	def test_etags_are_per_user(self):
+		self.upload()
+		etag = self.client.get('/api/summary/')['ETag']
+		other = APIClient()
+		other.force_authenticate(User.objects.create(username='visitor'))
+		other.post('/api/upload/', {'file': SimpleUploadedFile('plant.csv', VALID_CSV.encode())}, format='multipart')
+		self.assertEqual(other.get('/api/summary/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class JSONTests(TestCase):
+	data = {
+		'uploaded_at': datetime(2024, 5, 1, 12, 30, 15, 250000, tzinfo=dt_timezone.utc),
+		'values': [1.5, float('nan'), np.float64('inf'), None],
+		'type': 'Pump \u2028',
+	}
+
+	def test_renderer_matches_stdlib_and_writes_null_for_nan(self):
+		expected = JSONRenderer().render({**self.data, 'values': [1.5, None, None, None]})
+		self.assertEqual(ORJSONRenderer().render(self.data), expected)
+		with mock.patch('analytics.renderers.orjson', None):
+			self.assertEqual(ORJSONRenderer().render(self.data), expected)
+		self.assertIn(b'\n  ', ORJSONRenderer().render(self.data, 'application/json; indent=2'))
+
+	def test_parser(self):
+		parser = ORJSONParser()
+		self.assertEqual(parser.parse(io.BytesIO(b'{"a": [1, 2.5, null]}')), {'a': [1, 2.5, None]})
+		for body in (b'{"a": NaN}', b'{"a": '):
+			with self.assertRaises(ParseError):
+				parser.parse(io.BytesIO(body))
+
+
+class ColumnarRendererTests(APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.dataset = Dataset.objects.get(pk=self.upload(content=VALID_CSV + ",,,,\n").data['dataset_id'])
+
+	def test_columns_from_artifact_and_rows_agree(self):
+		from_artifact = Columns.from_artifact(self.dataset.artifact)
+		from_rows = Columns.from_rows(self.dataset.equipment_data())
+		self.assertEqual(len(from_artifact), 4)
+		np.testing.assert_array_equal(from_artifact.name_offsets, from_rows.name_offsets)
+		self.assertEqual(from_artifact.name_data.tobytes(), b'Pump AValve BCompressor C')
+		self.assertEqual(
+			[from_artifact.types[code] if code >= 0 else None for code in from_artifact.type_codes],
+			[from_rows.types[code] if code >= 0 else None for code in from_rows.type_codes],
+		)
+		np.testing.assert_array_equal(from_artifact.metrics['Flowrate'], from_rows.metrics['Flowrate'])
+		self.assertTrue(np.isnan(from_rows.metrics['Pressure'][-1]))
+
+	@skipIf(msgpack is None, 'msgpack is not installed')
+	def test_msgpack(self):
+		response = self.client.get('/api/summary/', HTTP_ACCEPT='application/msgpack')
+		self.assertEqual(response['Content-Type'], 'application/msgpack')
+		body = msgpack.unpackb(response.content)
+		self.assertEqual(body['dataset_id'], self.dataset.id)
+		columns = body['summary']['equipment_data']
+		flowrate = np.frombuffer(columns['Flowrate'], dtype='<f8')
+		np.testing.assert_array_equal(flowrate[:3], [10.5, 5.0, 20.0])
+		self.assertTrue(np.isnan(flowrate[3]))
+		codes = np.frombuffer(columns['Type']['codes'], dtype='<i4')
+		self.assertEqual(columns['Type']['categories'][codes[1]], 'Valve')
+
+		page = msgpack.unpackb(self.client.get(
+			f'/api/datasets/{self.dataset.id}/equipment/', {'page_size': 2, 'format': 'msgpack'}
+		).content)
+		self.assertIsNotNone(page['next'])
+		self.assertEqual(len(np.frombuffer(page['results']['id'], dtype='<i8')), 2)
+
+	@skipIf(pyarrow is None, 'pyarrow is not installed')
+	def test_arrow(self):
+		response = self.client.get('/api/summary/', HTTP_ACCEPT='application/vnd.apache.arrow.stream')
+		self.assertEqual(response['Content-Type'], 'application/vnd.apache.arrow.stream')
+		table = pyarrow.ipc.open_stream(response.content).read_all()
+		self.assertEqual(table.column('Equipment Name').to_pylist(), ['Pump A', 'Valve B', 'Compressor C', ''])
+		self.assertEqual(table.column('Type').to_pylist(), ['Pump', 'Valve', 'Compressor', None])
+		self.assertTrue(np.isnan(table.column('Temperature').to_numpy()[-1]))
+		body = json.loads(table.schema.metadata[b'body'])
+		self.assertEqual(body['dataset_id'], self.dataset.id)
+		self.assertIsNone(body['summary']['equipment_data'])
+
+		page = pyarrow.ipc.open_stream(self.client.get(
+			f'/api/datasets/{self.dataset.id}/equipment/', {'format': 'arrow', 'type': 'Valve'}
+		).content).read_all()
+		self.assertEqual(page.column('Equipment Name').to_pylist(), ['Valve B'])
+		self.assertIsNone(json.loads(page.schema.metadata[b'body'])['next'])
+
+
+class SparseFieldsetTests(APITestCase):
+	def test_history_lists_aggregates_without_loading_summaries(self):
+		self.upload()
+		with mock.patch.object(Dataset, 'public_summary') as public_summary:
+			entry = self.client.get('/api/history/').data[0]
+		public_summary.assert_not_called()
+		self.assertEqual(list(entry['summary']), list(HISTORY_SUMMARY_KEYS))
+		self.assertEqual(entry['summary']['total_count'], 3)
+		self.assertAlmostEqual(entry['summary']['avg_flowrate'], 35.5 / 3)
+		self.assertEqual(entry['summary']['type_distribution'], {'Pump': 1, 'Valve': 1, 'Compressor': 1})
+		self.assertEqual(Dataset.objects.with_aggregates().get().get_deferred_fields(), {'summary'})
+
+	def test_fields(self):
+		dataset_id = self.upload().data['dataset_id']
+		history = self.client.get('/api/history/', {'fields': 'id,summary.total_count'})
+		self.assertEqual(history.data, [{'id': dataset_id, 'summary': {'total_count': 3}}])
+
+		with mock.patch.object(Dataset, 'equipment_data') as equipment_data:
+			summary = self.client.get('/api/summary/', {'fields': 'dataset_id,summary.total_count,summary.avg_pressure'})
+		equipment_data.assert_not_called()
+		self.assertEqual(summary.data, {'dataset_id': dataset_id, 'summary': {'total_count': 3, 'avg_pressure': 1.5}})
+		self.assertEqual(len(self.client.get('/api/summary/', {'fields': 'summary'}).data['summary']['equipment_data']), 3)
+
+		for path in ('/api/history/', '/api/summary/'):
+			response = self.client.get(path, {'fields': 'id,owner'})
+			self.assertEqual(response.status_code, 400)
+			self.assertIsInstance(response.json()['error'], str)
+
+
+class ResponseCacheTests(APITestCase):
+	def test_hits_skip_the_serializers(self):
+		self.upload()
+		for path in ('/api/summary/', '/api/history/'):
+			response = self.client.get(path)
+			with mock.patch.object(Dataset, 'public_summary') as public_summary:
+				cached = self.client.get(path)
+			public_summary.assert_not_called()
+			self.assertEqual(cached.status_code, 200)
+			self.assertEqual(cached.content, response.content)
+			self.assertEqual(cached['Content-Type'], response['Content-Type'])
+			self.assertEqual(cached['ETag'], response['ETag'])
+
+	def test_uploads_and_retention_advance_the_generation(self):
+		self.upload()
+		first = DatasetGeneration.objects.current(self.user)
+		summary = self.client.get('/api/summary/').content
+
+		self.upload(name='next.csv', content=VALID_CSV + "Pump D,Pump,1,1,1\n")
+		self.assertGreater(DatasetGeneration.objects.current(self.user), first)
+		self.assertNotEqual(self.client.get('/api/summary/').content, summary)
+
+		# A duplicate upload moves its dataset back to the top
+		before = DatasetGeneration.objects.current(self.user)
+		self.upload(status_code=200)
+		self.assertGreater(DatasetGeneration.objects.current(self.user), before)
+		self.assertEqual(self.client.get('/api/summary/').data['summary']['total_count'], 3)
+
+		before = DatasetGeneration.objects.current(self.user)
+		self.assertEqual(enforce_retention(keep=1), 1)
+		self.assertGreater(DatasetGeneration.objects.current(self.user), before)
+		self.assertEqual(len(self.client.get('/api/history/').data), 1)
+
+	def test_entries_are_per_user_and_media_type(self):
+		self.upload()
+		self.client.get('/api/summary/')
+		other = APIClient()
+		other.force_authenticate(User.objects.create(username='visitor'))
+		self.assertEqual(other.get('/api/summary/').status_code, 404)
+		self.assertEqual(DatasetGeneration.objects.current(User.objects.get(username='visitor')), 0)
+
+		html = self.client.get('/api/summary/', HTTP_ACCEPT='text/html')
+		self.assertTrue(html['Content-Type'].startswith('text/html'))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionTests(APITestCase):
+	def test_negotiation(self):
+		self.assertEqual(compression.negotiate_encoding('gzip, deflate'), 'gzip')
+		self.assertEqual(compression.negotiate_encoding('br;q=0.5, gzip'), 'gzip')
+		self.assertEqual(compression.negotiate_encoding('*'), next(iter(compression.ENCODERS)))
+		self.assertIsNone(compression.negotiate_encoding('gzip;q=0, identity'))
+		self.assertIsNone(compression.negotiate_encoding(''))
+
+	def test_brotli(self):
+		self.upload()
+		plain = self.client.get('/api/history/')
+		response = self.client.get('/api/history/', HTTP_ACCEPT_ENCODING='br')
+		self.assertEqual(response['Content-Encoding'], 'br')
+		self.assertEqual(compression.brotli.decompress(response.content), plain.content)
+
+	def test_compresses_api_responses_and_revalidates(self):
+		self.upload()
+		plain = self.client.get('/api/history/')
+		self.assertNotIn('Content-Encoding', plain)
+
+		response = self.client.get('/api/history/', HTTP_ACCEPT_ENCODING='gzip')
+		self.assertEqual(response['Content-Encoding'], 'gzip')
+		self.assertIn('Accept-Encoding', response['Vary'])
+		self.assertEqual(gzip.decompress(response.content), plain.content)
+		self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+		self.assertEqual(
+			self.client.get('/api/history/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+			304,
+		)
+
+		with self.settings(COMPRESSION_MIN_SIZE=len(plain.content) + 1):
+			self.assertNotIn('Content-Encoding', self.client.get('/api/history/', HTTP_ACCEPT_ENCODING='gzip'))
+
+		# Streamed bodies are left alone
+		middleware = compression.CompressionMiddleware(lambda request: StreamingHttpResponse([b'x' * 1000]))
+		streamed = middleware(RequestFactory().get('/api/report/pdf/', HTTP_ACCEPT_ENCODING='gzip'))
+		self.assertNotIn('Content-Encoding', streamed)
+		self.assertEqual(b''.join(streamed.streaming_content), b'x' * 1000)
+
+	def test_cached_responses_are_compressed_once(self):
+		dataset_id = self.upload().data['dataset_id']
+		encoder = mock.Mock(side_effect=compression.ENCODERS['gzip'])
+		with mock.patch.dict(compression.ENCODERS, {'gzip': encoder}):
+			first = self.client.get('/api/summary/', HTTP_ACCEPT_ENCODING='gzip')
+			second = self.client.get('/api/summary/', HTTP_ACCEPT_ENCODING='gzip')
+			self.assertEqual(encoder.call_count, 1)
+			# Responses outside the response cache are compressed every time
+			for _ in range(2):
+				self.client.get(f'/api/datasets/{dataset_id}/equipment/', HTTP_ACCEPT_ENCODING='gzip')
+			self.assertEqual(encoder.call_count, 3)
+		self.assertEqual(second['Content-Encoding'], 'gzip')
+		self.assertEqual(second.content, first.content)
+
+
+class DistributionEndpointTests(APITestCase):
+	def test_histograms(self):
+		dataset_id = self.upload().data['dataset_id']
+		url = f'/api/datasets/{dataset_id}/histograms/'
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(set(response.data['histograms']), {'flowrate', 'pressure', 'temperature'})
+		pressure = self.client.get(url, {'metric': 'pressure'}).data['histograms']['pressure']
+		self.assertEqual(sum(pressure['fixed']['overall']), 3)
+		self.assertEqual(sum(pressure['fixed']['by_type']['Valve']), 1)
+		self.assertEqual(self.client.get(url, {'metric': 'density'}).status_code, 400)
+		self.assertEqual(self.client.get('/api/datasets/999/histograms/').status_code, 404)
+
+	def test_quantiles(self):
+		dataset_id = self.upload().data['dataset_id']
+		self.assertNotIn('sketches', self.client.get('/api/summary/').data['summary'])
+
+		url = f'/api/datasets/{dataset_id}/quantiles/'
+		response = self.client.get(url, {'q': '0,0.5,1', 'metric': 'flowrate'})
+		self.assertEqual(response.status_code, 200)
+		flowrate = response.data['quantiles']['flowrate']
+		self.assertEqual(flowrate['count'], 3)
+		self.assertEqual([item['value'] for item in flowrate['values']], [5.0, 10.5, 20.0])
+		self.assertEqual(list(response.data['quantiles']), ['flowrate'])
+
+		response = self.client.get(url, {'type': 'Valve'})
+		self.assertEqual(response.data['quantiles']['pressure']['values'][0]['value'], 0.8)
+		self.assertEqual(self.client.get(url, {'type': 'Mixer'}).status_code, 404)
+		self.assertEqual(self.client.get(url, {'q': '1.5'}).status_code, 400)
+		self.assertEqual(self.client.get(url, {'metric': 'density'}).status_code, 400)
+		self.assertEqual(self.client.get('/api/datasets/999/quantiles/').status_code, 404)
+
+
+@override_settings(UPLOAD_CHUNK_SIZE=40)
+class ResumableUploadTests(APITestCase):
+	def setUp(self):
+		super().setUp()
+		self.content = VALID_CSV.encode()
+		response = self.client.post('/api/uploads/', {'filename': 'plant.csv', 'size': len(self.content)})
+		self.assertEqual(response.status_code, 201)
+		self.url = f"/api/uploads/{response.data['upload_id']}/"
+		self.chunk_count = response.data['chunk_count']
+
+	def put_chunk(self, index, data=None):
+		if data is None:
+			data = self.content[index * 40:(index + 1) * 40]
+		return self.client.put(f'{self.url}chunks/{index}/', data, content_type='application/octet-stream')
+
+	def test_out_of_order_chunks_and_finalize(self):
+		order = list(reversed(range(self.chunk_count)))
+		for index in order[:-1]:
+			self.assertEqual(self.put_chunk(index).status_code, 200)
+		self.assertEqual(self.client.post(f'{self.url}finalize/').status_code, 400)
+		self.assertEqual(self.client.get(self.url).data['received'], [[40, len(self.content)]])
+
+		self.put_chunk(order[-1])
+		response = self.client.post(f'{self.url}finalize/', {'sha256': hashlib.sha256(self.content).hexdigest()})
+		self.assertEqual(response.status_code, 202)
+		job = self.client.get(response['Location']).data
+		self.assertEqual(job['state'], UploadJob.SUCCEEDED)
+		self.assertEqual(Dataset.objects.get(pk=job['dataset_id']).summary['total_count'], 3)
+		self.assertEqual(os.listdir(os.path.join(self.media_root, uploads.SESSION_DIR)), [])
+
+	def test_hash_catches_up_in_another_process(self):
+		self.put_chunk(0)
+		uploads._hashers.clear()
+		for index in range(1, self.chunk_count):
+			self.put_chunk(index)
+		session = UploadSession.objects.get()
+		self.assertEqual(uploads.advance_hash(session).hexdigest(), hashlib.sha256(self.content).hexdigest())
+
+	def test_rejects_bad_chunks(self):
+		self.assertEqual(self.put_chunk(0, b'short').status_code, 400)
+		self.assertEqual(self.put_chunk(self.chunk_count).status_code, 400)
+		response = self.client.put(
+			f'{self.url}chunks/1/', self.content[40:80],
+			content_type='application/octet-stream', HTTP_CONTENT_RANGE='bytes 0-39/*',
+		)
+		self.assertEqual(response.status_code, 400)
+		self.assertEqual(self.client.get(self.url).data['received'], [])
+
+	def test_checksum_mismatch(self):
+		for index in range(self.chunk_count):
+			self.put_chunk(index)
+		response = self.client.post(f'{self.url}finalize/', {'sha256': '0' * 64})
+		self.assertEqual(response.status_code, 400)
+		self.assertFalse(UploadJob.objects.exists())
+
+	def test_finalize_reuses_identical_dataset(self):
+		dataset_id = self.upload().data['dataset_id']
+		for index in range(self.chunk_count):
+			self.put_chunk(index)
+		response = self.client.post(f'{self.url}finalize/')
+		self.assertEqual(response.status_code, 200)
+		self.assertTrue(response.data['reused'])
+		self.assertEqual(self.client.get(response['Location']).data['dataset_id'], dataset_id)
+		self.assertEqual(os.listdir(os.path.join(self.media_root, uploads.SESSION_DIR)), [])
+
+	def test_size_and_session_limits(self):
+		with self.settings(UPLOAD_MAX_SIZE=100):
+			response = self.client.post('/api/uploads/', {'filename': 'big.csv', 'size': 101})
+		self.assertEqual(response.status_code, 400)
+		self.assertIn('size', response.data)
+
+		with self.settings(UPLOAD_MAX_OPEN_SESSIONS=2):
+			self.assertEqual(self.client.post('/api/uploads/', {'filename': 'b.csv', 'size': 10}).status_code, 201)
+			response = self.client.post('/api/uploads/', {'filename': 'c.csv', 'size': 10})
+		self.assertEqual(response.status_code, 429)
+
+	def test_idle_sessions_expire(self):
+		self.put_chunk(0)
+		session = UploadSession.objects.get()
+		self.assertEqual(uploads.expire_sessions(), 0)
+		UploadSession.objects.update(updated_at=timezone.now() - timedelta(days=2))
+		self.assertEqual(uploads.expire_sessions(), 1)
+		self.assertFalse(UploadSession.objects.exists())
+		self.assertFalse(os.path.exists(uploads.partial_path(session)))
@@ -0,0 +1,83 @@
+"""Metric trends across uploads, answered from ``MetricRollup`` rows alone.
+
+Each point is either one dataset or, with a ``bucket``, every dataset
+uploaded in the same day, week or month; counts, sums and sums of squares
+add up, so a bucket's mean and standard deviation are exact.
+"""
+import math
+
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from .models import MetricRollup
+
+
+BUCKETS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+
+def _point(row):
+    count = row['count']
+    mean = row['sum'] / count if count else None
+    std = None
+    if count > 1:
+        variance = (row['sumsq'] - row['sum'] * mean) / (count - 1)
+        std = math.sqrt(max(variance, 0.0))
+    return {
+        'count': count,
+        'mean': mean,
+        'std': std,
+        'min': row['min'],
+        'max': row['max'],
+    }
+
+
+def metric_trends(owner, metrics, eq_type=None, since=None, until=None, bucket=None):
+    """Series of ``{time, ..., count, mean, std, min, max}`` points per metric.
+
+    ``eq_type`` selects one equipment type instead of all rows. Without a
+    bucket every point is one dataset and carries its ``dataset_id`` (null
+    once retention removed it); with one, points carry the number of
+    ``datasets`` they combine.
+    """
+    rollups = MetricRollup.objects.filter(owner=owner, metric__in=metrics, type=eq_type)
+    if since is not None:
+        rollups = rollups.filter(uploaded_at__gte=since)
+    if until is not None:
+        rollups = rollups.filter(uploaded_at__lt=until)
+
+    if bucket is None:
+        rows = rollups.order_by('uploaded_at', 'id').values(
+            'metric', 'dataset_id', 'uploaded_at', 'count', 'sum', 'sumsq', 'min', 'max'
+        )
+    else:
+        rows = rollups.annotate(period=BUCKETS[bucket]('uploaded_at')).values('metric', 'period').annotate(
+            # Annotations may not reuse the field names
+            datasets=Count('id'),
+            total_count=Sum('count'),
+            total_sum=Sum('sum'),
+            total_sumsq=Sum('sumsq'),
+            lowest=Min('min'),
+            highest=Max('max'),
+        ).order_by('period')
+
+    series = {metric: [] for metric in metrics}
+    for row in rows:
+        if bucket is None:
+            point = {'time': row['uploaded_at'], 'dataset_id': row['dataset_id']}
+        else:
+            point = {'time': row['period'], 'datasets': row['datasets']}
+            row = {
+                'metric': row['metric'],
+                'count': row['total_count'],
+                'sum': row['total_sum'],
+                'sumsq': row['total_sumsq'],
+                'min': row['lowest'],
+                'max': row['highest'],
+            }
+        point.update(_point(row))
+        series[row['metric']].append(point)
+    return series
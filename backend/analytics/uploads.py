@@ -0,0 +1,221 @@
+"""Resumable chunked uploads.
+
+Chunks are written in place into a preallocated partial file under
+``MEDIA_ROOT/upload_sessions``, so they may arrive in any order and be
+retried. The SHA-256 of the contiguous prefix is advanced as chunks land,
+which means finalizing neither re-reads nor re-hashes the file. Hash state
+lives in the process; a process that missed earlier chunks catches up from
+disk once.
+"""
+import hashlib
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import submit_upload
+from .models import UploadSession
+
+
+SESSION_DIR = 'upload_sessions'
+READ_BLOCK = 64 * 1024
+
+# upload id -> [sha256 object, bytes hashed so far]
+_hashers = {}
+_hash_lock = threading.Lock()
+
+
+class HashingUploadHandler(FileUploadHandler):
+    """Computes the SHA-256 of each uploaded file as its chunks arrive.
+
+    It has to be the first handler so that it sees every chunk; it passes
+    the data on and leaves storing the file to the handlers after it.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.digests = {}
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests.setdefault(self.field_name, []).append(self.hasher.hexdigest())
+        return None
+
+
+def file_sha256(file):
+    """SHA-256 of an already received file, for when the handler did not run."""
+    hasher = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    file.seek(0)
+    return hasher.hexdigest()
+
+
+def partial_path(session):
+    return os.path.join(settings.MEDIA_ROOT, SESSION_DIR, f'{session.pk}.part')
+
+
+def create_session(filename, size, owner=None):
+    session = UploadSession.objects.create(
+        owner=owner,
+        filename=os.path.basename(filename),
+        size=size,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+    )
+    path = partial_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.truncate(size)
+    return session
+
+
+def merge_range(ranges, start, end):
+    """Add ``[start, end)`` to a sorted list of disjoint ranges."""
+    merged = []
+    for low, high in sorted(ranges + [[start, end]]):
+        if merged and low <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], high)
+        else:
+            merged.append([low, high])
+    return merged
+
+
+def chunk_bounds(session, index):
+    if not 0 <= index < session.chunk_count:
+        raise ValidationError(f'Chunk index must be between 0 and {session.chunk_count - 1}')
+    start = index * session.chunk_size
+    return start, min(start + session.chunk_size, session.size)
+
+
+def write_chunk(session, index, stream):
+    if session.job_id:
+        raise ValidationError('Upload has already been finalized')
+    start, end = chunk_bounds(session, index)
+
+    remaining = end - start
+    with open(partial_path(session), 'r+b') as f:
+        f.seek(start)
+        while remaining and stream is not None:
+            block = stream.read(min(READ_BLOCK, remaining))
+            if not block:
+                break
+            f.write(block)
+            remaining -= len(block)
+    if remaining or (stream is not None and stream.read(1)):
+        raise ValidationError(f'Chunk {index} must be exactly {end - start} bytes')
+
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        session.received = merge_range(session.received, start, end)
+        session.save(update_fields=['received', 'updated_at'])
+
+    advance_hash(session)
+    return session
+
+
+def advance_hash(session):
+    """Hash the newly contiguous bytes and return the running sha256."""
+    with _hash_lock:
+        session.refresh_from_db(fields=['received', 'hashed_bytes'])
+        ranges = session.received
+        contiguous = ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+        hasher, position = _hashers.get(session.pk, (None, None))
+        if hasher is None or position != session.hashed_bytes:
+            hasher, position = hashlib.sha256(), 0
+
+        if position < contiguous:
+            with open(partial_path(session), 'rb') as f:
+                f.seek(position)
+                while position < contiguous:
+                    block = f.read(min(READ_BLOCK, contiguous - position))
+                    hasher.update(block)
+                    position += len(block)
+
+        _hashers[session.pk] = (hasher, position)
+        UploadSession.objects.filter(pk=session.pk, hashed_bytes__lt=position).update(hashed_bytes=position)
+        session.hashed_bytes = position
+        return hasher
+
+
+class _PartialFile(File):
+    """Lets FileSystemStorage move the partial file instead of copying it."""
+
+    def __init__(self, path, name):
+        super().__init__(open(path, 'rb'), name=name)
+        self._path = path
+
+    def temporary_file_path(self):
+        # Only asked for by storages that move the file, which fails on
+        # Windows while it is still open
+        self.close()
+        return self._path
+
+
+def finalize_session(session, expected_sha256=''):
+    if session.job_id:
+        raise ValidationError('Upload has already been finalized')
+    if not session.is_complete:
+        raise ValidationError('Upload is incomplete')
+
+    digest = advance_hash(session).hexdigest()
+    if expected_sha256 and expected_sha256.lower() != digest:
+        raise ValidationError('SHA-256 of the received file does not match')
+
+    def store():
+        with _PartialFile(partial_path(session), session.filename) as partial:
+            return default_storage.save(f'csv_files/{session.filename}', partial)
+
+    job, reused = submit_upload(digest, store, owner=session.owner, filename=session.filename)
+    session.sha256 = digest
+    session.job = job
+    session.save(update_fields=['sha256', 'job', 'updated_at'])
+
+    with _hash_lock:
+        _hashers.pop(session.pk, None)
+    if reused:
+        os.remove(partial_path(session))
+    return job, reused
+
+
+def discard_session(session):
+    with _hash_lock:
+        _hashers.pop(session.pk, None)
+    try:
+        os.remove(partial_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def open_session_count(owner):
+    return UploadSession.objects.filter(owner=owner, job__isnull=True).count()
+
+
+def expire_sessions(now=None):
+    """Discard sessions untouched for ``UPLOAD_SESSION_EXPIRY`` seconds.
+
+    Unfinished ones go with their partial file; finalized ones have handed
+    the file over already. Returns the number of sessions discarded.
+    """
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.UPLOAD_SESSION_EXPIRY)
+    expired = 0
+    for session in UploadSession.objects.filter(updated_at__lt=cutoff).iterator():
+        discard_session(session)
+        expired += 1
+    return expired
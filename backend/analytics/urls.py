@@ -4,8 +4,21 @@ from . import views
 urlpatterns = [
     path('register/', views.register, name='register'),
     path('upload/', views.upload_csv, name='upload_csv'),
+    path('upload/batch/', views.upload_batch, name='upload_batch'),
+    path('batches/<uuid:batch_id>/', views.get_batch, name='get_batch'),
+    path('uploads/', views.create_upload_session, name='create_upload_session'),
+    path('uploads/<uuid:upload_id>/', views.upload_session_detail, name='upload_session_detail'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', views.put_upload_chunk, name='put_upload_chunk'),
+    path('uploads/<uuid:upload_id>/finalize/', views.finalize_upload_session, name='finalize_upload_session'),
+    path('jobs/<uuid:job_id>/', views.get_job, name='get_job'),
     path('summary/', views.get_summary, name='get_summary'),
     path('history/', views.get_history, name='get_history'),
+    path('datasets/compare/', views.get_comparison, name='get_comparison'),
+    path('datasets/<int:dataset_id>/equipment/', views.get_equipment, name='get_equipment'),
+    path('datasets/<int:dataset_id>/histograms/', views.get_histograms, name='get_histograms'),
+    path('datasets/<int:dataset_id>/anomalies/', views.get_anomalies, name='get_anomalies'),
+    path('datasets/<int:dataset_id>/quantiles/', views.get_quantiles, name='get_quantiles'),
+    path('trends/', views.get_trends, name='get_trends'),
     path('report/pdf/', views.generate_pdf_report, name='generate_pdf_report'),
 ]
 
@@ -1,8 +1,158 @@
+import gzip
+import io
+import zipfile
+
+import numpy as np
 import pandas as pd
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
+from .sketches import MetricSketches, QuantileSketch
+
+try:
+    import pyarrow
+    from pyarrow import csv as pyarrow_csv
+except ImportError:
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 
 REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+
+# Declared dtypes, so pandas does not have to infer them. LENIENT_DTYPES is
+# used when a metric column holds something that is not a number.
+CSV_DTYPES = {
+    'Equipment Name': object,
+    'Type': 'category',
+    **dict.fromkeys(NUMERIC_COLUMNS, 'float64'),
+}
+LENIENT_DTYPES = {**CSV_DTYPES, **dict.fromkeys(NUMERIC_COLUMNS, object)}
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+ZIP_MAGIC = b'PK\x03\x04'
+READ_BLOCK = 1024 * 1024
+
+STAT_FIELDS = ['count', 'mean', 'std', 'min', 'max', 'p50', 'p95']
+STAT_QUANTILES = {'p50': 0.5, 'p95': 0.95}
+
+
+class _RestartableStream(io.RawIOBase):
+    """Forward-only decompressor that seeks backwards by starting over."""
+
+    def __init__(self, file, open_stream):
+        self._file = file
+        self._start = file.tell()
+        self._open_stream = open_stream
+        self._stream = open_stream(file)
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation('Can only seek from the start or the current position')
+        if offset < self._position:
+            self._file.seek(self._start)
+            self._stream = self._open_stream(self._file)
+            self._position = 0
+        while self._position < offset:
+            if not self.read(min(READ_BLOCK, offset - self._position)):
+                break
+        return self._position
+
+
+class LimitedStream(io.RawIOBase):
+    """Decompressed stream that fails once it gets past ``limit`` bytes.
+
+    Rereading after a seek backwards does not count twice.
+    """
+
+    def __init__(self, stream, limit=None):
+        self._stream = stream
+        self._limit = limit or settings.UPLOAD_MAX_DECOMPRESSED_SIZE
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._stream.seekable()
+
+    def tell(self):
+        return self._stream.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._stream.seek(offset, whence)
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        if self._stream.tell() > self._limit:
+            raise ValidationError(f'Decompressed upload is larger than {self._limit} bytes')
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def check_zip_member(info, limit=None):
+    """Reject a zip member whose declared size is over the limit, before
+    anything is inflated; ``LimitedStream`` catches sizes that lie."""
+    limit = limit or settings.UPLOAD_MAX_DECOMPRESSED_SIZE
+    if info.file_size > limit:
+        raise ValidationError(f'{info.filename} is larger than {limit} bytes uncompressed')
+
+
+def open_csv_stream(file):
+    """Return a binary stream of the CSV in ``file``, decompressing it.
+
+    gzip, zstd and single-entry zip files are recognised by their leading
+    bytes, whatever the file is called. Decompression happens as the parser
+    reads, so nothing is inflated to disk or held in memory, and stops with
+    an error past ``UPLOAD_MAX_DECOMPRESSED_SIZE`` bytes.
+    """
+    if isinstance(file, io.TextIOBase) or not file.seekable():
+        return file
+    start = file.tell()
+    head = file.read(4)
+    file.seek(start)
+
+    if head.startswith(GZIP_MAGIC):
+        return LimitedStream(gzip.GzipFile(fileobj=file, mode='rb'))
+    if head == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValidationError('zstd compressed uploads need the zstandard package on the server')
+        return LimitedStream(_RestartableStream(file, zstandard.ZstdDecompressor().stream_reader))
+    if head == ZIP_MAGIC:
+        archive = zipfile.ZipFile(file)
+        entries = [entry for entry in archive.infolist() if not entry.is_dir()]
+        if len(entries) != 1:
+            raise ValidationError('ZIP uploads must contain exactly one CSV file')
+        check_zip_member(entries[0])
+        return LimitedStream(archive.open(entries[0]))
+    return file
+
+
+def default_engine():
+    return 'pyarrow' if pyarrow is not None else 'c'
 
 
 def validate_csv_columns(df):
@@ -11,28 +161,552 @@ def validate_csv_columns(df):
         raise ValidationError(f"Missing required columns: {', '.join(missing_columns)}")
 
 
-def parse_csv(file):
+def coerce_numeric(df):
+    """Turn the metric columns into floats in place, with NaN for junk."""
+    for col in NUMERIC_COLUMNS:
+        if not pd.api.types.is_float_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def _read_header(file):
+    start = file.tell()
+    validate_csv_columns(pd.read_csv(file, nrows=0))
+    file.seek(start)
+    return start
+
+
+def parse_csv(file, engine=None):
+    """Read a whole CSV into a DataFrame of ``REQUIRED_COLUMNS``."""
     try:
-        df = pd.read_csv(file)
-        validate_csv_columns(df)
-        return df
+        file = open_csv_stream(file)
+        start = _read_header(file)
+        try:
+            return pd.read_csv(file, usecols=REQUIRED_COLUMNS, dtype=CSV_DTYPES, engine=engine or default_engine())
+        except ValueError:
+            file.seek(start)
+            return coerce_numeric(pd.read_csv(file, usecols=REQUIRED_COLUMNS, dtype=LENIENT_DTYPES))
     except Exception as e:
         raise ValidationError(f"Error parsing CSV: {str(e)}")
 
 
-def compute_summary(df):
-    numeric_cols = ['Flowrate', 'Pressure', 'Temperature']
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    summary = {
-        'total_count': len(df),
-        'avg_flowrate': float(df['Flowrate'].mean()) if not df['Flowrate'].isna().all() else 0.0,
-        'avg_pressure': float(df['Pressure'].mean()) if not df['Pressure'].isna().all() else 0.0,
-        'avg_temperature': float(df['Temperature'].mean()) if not df['Temperature'].isna().all() else 0.0,
-        'type_distribution': df['Type'].value_counts().to_dict(),
-        'equipment_data': df.to_dict('records')
+def _read_typed(file, chunksize, engine):
+    if engine == 'pyarrow' and not isinstance(file, io.TextIOBase):
+        yield from _read_arrow(file, chunksize)
+        return
+    with pd.read_csv(file, usecols=REQUIRED_COLUMNS, dtype=CSV_DTYPES, chunksize=chunksize) as reader:
+        yield from reader
+
+
+def _read_arrow(file, chunksize):
+    # pyarrow's streaming reader parses blocks on several threads; batches
+    # are gathered until there are about ``chunksize`` rows.
+    column_types = {
+        'Equipment Name': pyarrow.string(),
+        'Type': pyarrow.dictionary(pyarrow.int32(), pyarrow.string()),
+        **dict.fromkeys(NUMERIC_COLUMNS, pyarrow.float64()),
+    }
+    reader = pyarrow_csv.open_csv(file, convert_options=pyarrow_csv.ConvertOptions(
+        include_columns=REQUIRED_COLUMNS,
+        column_types=column_types,
+        strings_can_be_null=True,
+    ))
+    batches, rows = [], 0
+    for batch in reader:
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= chunksize:
+            yield pyarrow.Table.from_batches(batches).to_pandas()
+            batches, rows = [], 0
+    if batches:
+        yield pyarrow.Table.from_batches(batches).to_pandas()
+
+
+def _read_lenient(file, chunksize):
+    reader = pd.read_csv(
+        file,
+        usecols=lambda col: col in REQUIRED_COLUMNS,
+        dtype=LENIENT_DTYPES,
+        chunksize=chunksize,
+    )
+    with reader:
+        for chunk in reader:
+            validate_csv_columns(chunk)
+            yield coerce_numeric(chunk)
+
+
+def iter_csv_chunks(file, chunksize=None, engine=None):
+    """Yield the CSV as typed DataFrames of about ``chunksize`` rows.
+
+    Only ``REQUIRED_COLUMNS`` are parsed, with ``CSV_DTYPES``. If a metric
+    holds a value that is not a number, the file is read again with the
+    lenient parser, which makes it NaN, skipping rows already yielded.
+    Streams that cannot seek go straight to the lenient parser. Compressed
+    files are decompressed on the fly, see ``open_csv_stream``.
+    """
+    chunksize = chunksize or settings.CSV_CHUNK_SIZE
+    try:
+        file = open_csv_stream(file)
+        if not file.seekable():
+            yield from _read_lenient(file, chunksize)
+            return
+
+        start = _read_header(file)
+        yielded = 0
+        try:
+            for chunk in _read_typed(file, chunksize, engine or default_engine()):
+                yielded += len(chunk)
+                yield chunk
+        except ValueError:
+            file.seek(start)
+            for chunk in _read_lenient(file, chunksize):
+                if yielded >= len(chunk):
+                    yielded -= len(chunk)
+                    continue
+                yield chunk.iloc[yielded:]
+                yielded = 0
+    except Exception as e:
+        raise ValidationError(f"Error parsing CSV: {str(e)}")
+
+
+class Moments:
+    """Count, sum, sum of squares, min and max of a metric, plus the sum of
+    squared deviations from the mean (``m2``) for a stable variance.
+
+    Built per chunk with ``of`` and combined with ``merge`` (Chan et al.'s
+    parallel update), so they add up across chunks and workers.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def of(cls, values):
+        moments = cls()
+        values = values[~np.isnan(values)]
+        if len(values):
+            moments.count = len(values)
+            moments.sum = float(values.sum())
+            moments.sumsq = float(np.square(values).sum())
+            moments.m2 = float(np.square(values - moments.sum / moments.count).sum())
+            moments.min, moments.max = float(values.min()), float(values.max())
+        return moments
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else None
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        if self.count:
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / (self.count + other.count)
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        else:
+            self.m2, self.min, self.max = other.m2, other.min, other.max
+        self.count += other.count
+        self.sum += other.sum
+        self.sumsq += other.sumsq
+        return self
+
+
+def _group_rows(codes):
+    """``(code, row indices)`` of every non-missing type code, in code order."""
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    boundaries = np.flatnonzero(np.diff(sorted_codes)) + 1
+    return [
+        (sorted_codes[start], rows)
+        for start, rows in zip(np.r_[0, boundaries], np.split(order, boundaries))
+        if len(rows) and sorted_codes[start] >= 0
+    ]
+
+
+class SummaryAccumulator:
+    """Running aggregates behind ``compute_summary``.
+
+    Each chunk is folded in with ``update`` and partial accumulators can be
+    combined with ``merge``, so memory stays bounded by the number of
+    equipment types rather than the number of rows. Besides the summary they
+    give the per-type ``stats`` (quantiles from the t-digest sketches) and
+    the ``rollups`` stored for trends.
+    """
+
+    def __init__(self):
+        self.total_count = 0
+        self.type_counts = {}
+        # Equipment type (None for all rows) -> metric -> Moments
+        self.moments = {None: self._new_moments()}
+        self.sketches = MetricSketches(NUMERIC_COLUMNS)
+
+    @staticmethod
+    def _new_moments():
+        return {col: Moments() for col in NUMERIC_COLUMNS}
+
+    def _type_moments(self, eq_type):
+        if eq_type not in self.moments:
+            self.moments[eq_type] = self._new_moments()
+        return self.moments[eq_type]
+
+    def update(self, df):
+        coerce_numeric(df)
+        self.sketches.update(df)
+        self.total_count += len(df)
+
+        codes, uniques = pd.factorize(df['Type'])
+        groups = [(str(uniques[code]), rows) for code, rows in _group_rows(codes)]
+        for col in NUMERIC_COLUMNS:
+            values = df[col].to_numpy(dtype='f8', na_value=np.nan)
+            self.moments[None][col].merge(Moments.of(values))
+            for eq_type, rows in groups:
+                self._type_moments(eq_type)[col].merge(Moments.of(values[rows]))
+
+        for eq_type, count in df['Type'].value_counts(sort=False).items():
+            if not count:
+                continue
+            self.type_counts[eq_type] = self.type_counts.get(eq_type, 0) + int(count)
+        return self
+
+    def merge(self, other):
+        self.total_count += other.total_count
+        for eq_type, moments in other.moments.items():
+            mine = self._type_moments(eq_type)
+            for col in NUMERIC_COLUMNS:
+                mine[col].merge(moments[col])
+        for eq_type, count in other.type_counts.items():
+            self.type_counts[eq_type] = self.type_counts.get(eq_type, 0) + count
+        self.sketches.merge(other.sketches)
+        return self
+
+    def mean(self, col):
+        return self.moments[None][col].mean or 0.0
+
+    def stats(self):
+        """Count, mean, std, min, max, p50 and p95 of every metric, overall and per type.
+
+        Keyed by lower-case metric name, with ``None`` where a statistic is
+        undefined (e.g. the std of a single value). The quantiles are
+        estimated from the sketches.
+        """
+        def metric_stats(moments, sketch):
+            quantiles = sketch.quantile(list(STAT_QUANTILES.values())) if sketch is not None else None
+            stats = {
+                'count': moments.count,
+                'mean': moments.mean,
+                'std': moments.std,
+                'min': moments.min,
+                'max': moments.max,
+            }
+            for i, field in enumerate(STAT_QUANTILES):
+                stats[field] = None if quantiles is None else float(quantiles[i])
+            return stats
+
+        def table(eq_type):
+            return {
+                col.lower(): metric_stats(self.moments[eq_type][col], self.sketches.get(col, eq_type))
+                for col in NUMERIC_COLUMNS
+            }
+
+        return {
+            'overall': table(None),
+            'by_type': {eq_type: table(eq_type) for eq_type in self.moments if eq_type is not None},
+        }
+
+    def rollups(self):
+        """Count, sum, sum of squares, min and max of every metric, overall and per type.
+
+        Returns one dict per (type, metric), with type ``None`` for all rows.
+        Unlike means and quantiles these add up across datasets, so trends
+        over many uploads can be aggregated from them alone.
+        """
+        return [
+            {
+                'type': eq_type,
+                'metric': col.lower(),
+                'count': moments[col].count,
+                'sum': moments[col].sum,
+                'sumsq': moments[col].sumsq,
+                'min': moments[col].min,
+                'max': moments[col].max,
+            }
+            for eq_type, moments in self.moments.items()
+            if eq_type is not None or self.total_count
+            for col in NUMERIC_COLUMNS
+        ]
+
+    def summary(self):
+        type_distribution = dict(
+            sorted(self.type_counts.items(), key=lambda item: item[1], reverse=True)
+        )
+        return {
+            'total_count': self.total_count,
+            'avg_flowrate': self.mean('Flowrate'),
+            'avg_pressure': self.mean('Pressure'),
+            'avg_temperature': self.mean('Temperature'),
+            'type_distribution': type_distribution,
+            'stats': self.stats(),
+            'sketches': self.sketches.to_dict(),
+        }
+
+
+def compute_stats(df):
+    """``SummaryAccumulator.stats`` of a whole DataFrame."""
+    return SummaryAccumulator().update(df).stats()
+
+
+def compute_rollups(df):
+    """``SummaryAccumulator.rollups`` of a whole DataFrame."""
+    return SummaryAccumulator().update(df).rollups()
+
+
+class MetricColumns:
+    """Type codes (-1 when missing), type labels and metric arrays of a
+    dataset's rows.
+
+    The arrays may be memory maps (see ``ColumnStore.metric_columns``); the
+    passes below only ever copy a chunk of rows, or the rows of one type.
+    """
+
+    def __init__(self, codes, types, metrics):
+        self.codes = codes
+        self.types = [str(eq_type) for eq_type in types]
+        self.metrics = metrics
+
+    @classmethod
+    def from_frame(cls, df):
+        codes, uniques = pd.factorize(df['Type'])
+        metrics = {col: df[col].to_numpy(dtype='f8', na_value=np.nan) for col in NUMERIC_COLUMNS}
+        return cls(codes, uniques, metrics)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def chunks(self, chunksize=None):
+        """``(start, codes, {metric: values})`` for consecutive row ranges."""
+        chunksize = chunksize or settings.CSV_CHUNK_SIZE
+        for start in range(0, len(self), chunksize):
+            stop = start + chunksize
+            yield start, np.asarray(self.codes[start:stop]), {
+                col: np.asarray(values[start:stop]) for col, values in self.metrics.items()
+            }
+
+
+def _bin_edges(sketch, bins):
+    # Equal-width edges over the values' range, as np.histogram picks them
+    return np.histogram_bin_edges(np.empty(0), bins=bins, range=(sketch.min, sketch.max))
+
+
+def _adaptive_edges(sketch, max_bins):
+    # numpy's 'auto' rule (the narrower of Freedman-Diaconis and Sturges),
+    # with the quartiles taken from the sketch and the bin count capped
+    # before any edges are allocated
+    if sketch is None or not sketch.count:
+        return np.empty(0)
+    count, value_range = sketch.count, sketch.max - sketch.min
+    bins = 1
+    if value_range:
+        q25, q75 = sketch.quantile([0.25, 0.75])
+        width = value_range / (np.log2(count) + 1)
+        fd_width = 2 * (q75 - q25) * count ** (-1 / 3)
+        if fd_width > 0:
+            width = min(width, fd_width)
+        bins = int(min(np.ceil(value_range / width), max_bins))
+    return _bin_edges(sketch, bins)
+
+
+def compute_histograms(columns, sketches, bins=None, max_bins=None):
+    """Fixed- and adaptive-bin histograms of every metric, overall and per type.
+
+    Fixed histograms use ``bins`` equal-width bins over the overall range of
+    the metric, shared by all types so their counts line up. Adaptive
+    histograms pick their own edges per type, up to ``max_bins``. Edges come
+    from the ``MetricSketches`` of the rows, and counts from one pass over
+    ``columns`` (a ``MetricColumns``) in chunks.
+    """
+    bins = bins or settings.HISTOGRAM_BINS
+    max_bins = max_bins or settings.HISTOGRAM_MAX_BINS
+    codes_by_type = {eq_type: code for code, eq_type in enumerate(columns.types)}
+    types = [eq_type for eq_type in sketches.by_type if eq_type in codes_by_type]
+
+    def histogram(bin_edges):
+        return {'edges': bin_edges, 'counts': np.zeros(max(len(bin_edges) - 1, 0), dtype=np.int64)}
+
+    # metric -> (fixed, adaptive) -> type (None for all rows) -> edges and counts
+    histograms = {}
+    for col in NUMERIC_COLUMNS:
+        overall = sketches.get(col)
+        fixed = _bin_edges(overall, bins) if overall.count else np.empty(0)
+        histograms[col] = {
+            'fixed': {eq_type: histogram(fixed) for eq_type in [None, *types]},
+            'adaptive': {
+                eq_type: histogram(_adaptive_edges(sketches.get(col, eq_type), max_bins))
+                for eq_type in [None, *types]
+            },
+        }
+
+    for _, chunk_codes, chunk in columns.chunks():
+        for col in NUMERIC_COLUMNS:
+            present = ~np.isnan(chunk[col])
+            values, value_codes = chunk[col][present], chunk_codes[present]
+            groups = {None: values}
+            groups.update((eq_type, values[value_codes == codes_by_type[eq_type]]) for eq_type in types)
+            for kind in histograms[col].values():
+                for eq_type, group in groups.items():
+                    if len(kind[eq_type]['edges']) and len(group):
+                        kind[eq_type]['counts'] += np.histogram(group, bins=kind[eq_type]['edges'])[0]
+
+    def dump(entry):
+        return {'edges': entry['edges'].tolist(), 'counts': entry['counts'].tolist()}
+
+    return {
+        col.lower(): {
+            'fixed': {
+                'edges': kinds['fixed'][None]['edges'].tolist(),
+                'overall': kinds['fixed'][None]['counts'].tolist(),
+                'by_type': {eq_type: kinds['fixed'][eq_type]['counts'].tolist() for eq_type in types},
+            },
+            'adaptive': {
+                'overall': dump(kinds['adaptive'][None]),
+                'by_type': {eq_type: dump(kinds['adaptive'][eq_type]) for eq_type in types},
+            },
+        }
+        for col, kinds in histograms.items()
     }
-    
-    return summary
 
+
+def compute_summary(df):
+    return SummaryAccumulator().update(df).summary()
+
+
+def summarize_csv(file, chunksize=None, on_chunk=None, accumulator=None):
+    """Streaming counterpart of ``parse_csv`` + ``compute_summary``.
+
+    The upload is read ``chunksize`` rows at a time, so peak memory does not
+    depend on the size of the file. ``on_chunk`` receives every chunk after
+    its metric columns have been parsed as floats, e.g. to persist the rows.
+    Pass an ``accumulator`` to keep the aggregates, e.g. for its rollups.
+    """
+    accumulator = accumulator or SummaryAccumulator()
+
+    for chunk in iter_csv_chunks(file, chunksize):
+        accumulator.update(chunk)
+        if on_chunk is not None:
+            on_chunk(chunk)
+
+    return accumulator.summary()
+
+
+# Scales the MAD so robust z-scores match standard scores for normal data
+MAD_SCALE = 0.6745
+
+
+def detect_anomalies(columns, sketches, z_threshold=None, iqr_factor=None):
+    """Flag rows whose metrics are outliers within their equipment type.
+
+    A value is an outlier when its robust z-score, ``MAD_SCALE * (x -
+    median) / MAD``, exceeds ``z_threshold`` in magnitude, or when it lies
+    outside the Tukey fences ``[Q1 - k * IQR, Q3 + k * IQR]`` with ``k =
+    iqr_factor``; medians, MADs and quartiles are per type. Returns the
+    flagged row indices with their z-scores (NaN when the MAD is 0) and a
+    bitmask per row: bit ``2 * i`` is the z test and ``2 * i + 1`` the IQR
+    test of ``NUMERIC_COLUMNS[i]``.
+
+    ``columns`` is a ``MetricColumns`` and ``sketches`` the
+    ``MetricSketches`` of its rows. Medians and quartiles are estimated from
+    the sketches, and MADs from sketches of the absolute deviations built
+    in one pass over the rows in chunks; a second pass scores the rows, so
+    only the flagged rows are kept, however many rows a type has.
+    """
+    z_threshold = z_threshold or settings.ANOMALY_Z_THRESHOLD
+    iqr_factor = iqr_factor or settings.ANOMALY_IQR_FACTOR
+    # Rows without a type form a group of their own, labelled ''
+    labels = columns.types + ['']
+    missing = len(columns.types)
+
+    def new_sketches():
+        return {col: QuantileSketch() for col in NUMERIC_COLUMNS}
+
+    # The accumulator leaves out rows without a type, so theirs is built here
+    group_sketches = [
+        {col: sketches.get(col, eq_type) or QuantileSketch() for col in NUMERIC_COLUMNS}
+        for eq_type in columns.types
+    ] + [new_sketches()]
+    for _, chunk_codes, chunk in columns.chunks():
+        untyped = chunk_codes < 0
+        if untyped.any():
+            for col in NUMERIC_COLUMNS:
+                group_sketches[missing][col].merge(QuantileSketch.from_values(chunk[col][untyped]))
+
+    # Per group (indexed by code, missing last): median, MAD and fences
+    fields = ('median', 'mad', 'lower', 'upper')
+    limits = {col: {field: np.full(len(labels), np.nan) for field in fields} for col in NUMERIC_COLUMNS}
+    quartiles = {col: np.full((len(labels), 3), np.nan) for col in NUMERIC_COLUMNS}
+    for group_index, group in enumerate(group_sketches):
+        for col in NUMERIC_COLUMNS:
+            if group[col].count:
+                quartiles[col][group_index] = group[col].quantile([0.25, 0.5, 0.75])
+                limits[col]['median'][group_index] = quartiles[col][group_index, 1]
+
+    deviations = [new_sketches() for _ in labels]
+    for _, chunk_codes, chunk in columns.chunks():
+        group_index = np.where(chunk_codes < 0, missing, chunk_codes)
+        for col in NUMERIC_COLUMNS:
+            spread = np.abs(chunk[col] - limits[col]['median'][group_index])
+            for index in np.unique(group_index):
+                deviations[index][col].merge(QuantileSketch.from_values(spread[group_index == index]))
+
+    bounds = {col.lower(): {} for col in NUMERIC_COLUMNS}
+    for group_index, label in enumerate(labels):
+        for col in NUMERIC_COLUMNS:
+            if not deviations[group_index][col].count:
+                continue
+            q1, median, q3 = (float(value) for value in quartiles[col][group_index])
+            mad = float(deviations[group_index][col].quantile(0.5))
+            lower, upper = q1 - iqr_factor * (q3 - q1), q3 + iqr_factor * (q3 - q1)
+            for field, value in zip(fields, (median, mad, lower, upper)):
+                limits[col][field][group_index] = value
+            bounds[col.lower()][label] = {
+                'median': median,
+                'mad': mad,
+                'q1': q1,
+                'q3': q3,
+                'lower': lower,
+                'upper': upper,
+            }
+
+    flagged_rows, flagged_scores, flagged_flags = [], [], []
+    for start, chunk_codes, chunk in columns.chunks():
+        group_index = np.where(chunk_codes < 0, missing, chunk_codes)
+        scores = np.full((len(chunk_codes), len(NUMERIC_COLUMNS)), np.nan)
+        flags = np.zeros(len(chunk_codes), dtype=np.uint8)
+        for i, col in enumerate(NUMERIC_COLUMNS):
+            values = chunk[col]
+            median, mad, lower, upper = (limits[col][field][group_index] for field in fields)
+            z_bit, iqr_bit = np.uint8(1 << (2 * i)), np.uint8(1 << (2 * i + 1))
+            scored = mad > 0
+            scores[scored, i] = MAD_SCALE * (values[scored] - median[scored]) / mad[scored]
+            flags[np.abs(np.nan_to_num(scores[:, i])) > z_threshold] |= z_bit
+            flags[(values < lower) | (values > upper)] |= iqr_bit
+        rows = np.flatnonzero(flags)
+        flagged_rows.append(start + rows)
+        flagged_scores.append(scores[rows])
+        flagged_flags.append(flags[rows])
+
+    return {
+        'z_threshold': z_threshold,
+        'iqr_factor': iqr_factor,
+        'rows': np.concatenate(flagged_rows) if flagged_rows else np.empty(0, dtype=np.int64),
+        'scores': np.concatenate(flagged_scores) if flagged_scores else np.empty((0, len(NUMERIC_COLUMNS))),
+        'flags': np.concatenate(flagged_flags) if flagged_flags else np.empty(0, dtype=np.uint8),
+        'bounds': bounds,
+    }
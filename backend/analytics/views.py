@@ -1,25 +1,38 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes, renderer_classes
+from rest_framework.parsers import FileUploadParser, FormParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+from django.conf import settings
 from django.http import HttpResponse, FileResponse
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 from django.contrib.auth.models import User
-from .models import Dataset
-from .serializers import DatasetSerializer, CSVUploadSerializer, RegisterSerializer
-from .utils import parse_csv, compute_summary
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-import io
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Dataset, EquipmentRecord, UploadJob, UploadSession
+from .serializers import (CSVUploadSerializer, DatasetHistorySerializer, EquipmentRecordSerializer, RegisterSerializer,
+                          UploadJobSerializer, UploadSessionSerializer, parse_fields, sparse, wants)
+from .artifacts import ANOMALIES_FILE, HISTOGRAMS_FILE
+from .pagination import EquipmentKeysetPagination
+from .renderers import COLUMNAR_RENDERERS, Columns, ColumnarRenderer
+from .utils import NUMERIC_COLUMNS
+from .batches import submit_batch
+from .compare import compare_datasets
+from .response_cache import cached_response
+from .conditional import (HISTORY_SIZE, conditional, history_etag, history_modified, latest_etag, latest_modified,
+                          ranged_file_response)
+from .trends import BUCKETS, metric_trends
+from .jobs import submit_upload
+from .uploads import (HashingUploadHandler, discard_session, file_sha256, finalize_session,
+                      open_session_count, write_chunk)
+from .reports import REPORT_FILENAME, ensure_report, render_report, report_etag
+import datetime
 import json
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import re
 import numpy as np
 
 
@@ -40,55 +53,253 @@ def register(request):
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser, FileUploadParser])
 def upload_csv(request):
+    # A raw request body (named by Content-Disposition) may be gzip encoded;
+    # it is stored as sent and decompressed while it is parsed, up to
+    # UPLOAD_MAX_DECOMPRESSED_SIZE.
+    encoding = request.headers.get('Content-Encoding', 'identity').lower()
+    is_multipart = request.content_type.startswith('multipart/')
+    if encoding not in ('identity', 'gzip') or (encoding == 'gzip' and is_multipart):
+        return Response(
+            {'error': 'Only raw CSV bodies may be sent with Content-Encoding: gzip'},
+            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+        )
+    
+    # Hash the file while it streams in, before request.data is parsed
+    hashing = HashingUploadHandler(request)
+    request.upload_handlers.insert(0, hashing)
     serializer = CSVUploadSerializer(data=request.data)
     
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     file = serializer.validated_data['file']
+    name = file.name
+    if encoding == 'gzip' and not name.endswith('.gz'):
+        name += '.gz'
+    # FileUploadParser does not pass a field name to the handlers
+    digests = hashing.digests.get('file') or hashing.digests.get(None)
+    content_sha256 = digests[0] if digests else file_sha256(file)
+    
+    job, reused = submit_upload(
+        content_sha256,
+        lambda: default_storage.save(f'csv_files/{name}', file),
+        owner=request.user,
+        filename=name
+    )
+    return _job_response(job, reused)
+
+
+def _job_response(job, reused):
+    status_url = reverse('get_job', args=[job.id])
+    if reused:
+        message = 'Identical CSV already processed'
+        response_status = status.HTTP_200_OK
+    else:
+        message = 'CSV upload accepted for processing'
+        response_status = status.HTTP_202_ACCEPTED
+    return Response({
+        'message': message,
+        'job_id': job.id,
+        'status_url': status_url,
+        'reused': reused
+    }, status=response_status, headers={'Location': status_url})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def upload_batch(request):
+    hashing = HashingUploadHandler(request)
+    request.upload_handlers.insert(0, hashing)
+    files = request.FILES.getlist('files')
+    if not files:
+        return Response(
+            {'error': 'Send one or more files in the "files" field'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    digests = hashing.digests.get('files') or [file_sha256(file) for file in files]
+    batch_id, results = submit_batch(files, digests, owner=request.user)
+    
+    for result in results:
+        job = result.pop('job', None)
+        if job is not None:
+            result['job_id'] = job.id
+            result['status_url'] = reverse('get_job', args=[job.id])
+    
+    status_url = reverse('get_batch', args=[batch_id])
+    return Response({
+        'batch_id': batch_id,
+        'status_url': status_url,
+        'files': results
+    }, status=status.HTTP_202_ACCEPTED, headers={'Location': status_url})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_batch(request, batch_id):
+    jobs = list(UploadJob.objects.filter(owner=request.user, batch_id=batch_id).order_by('created_at'))
+    if not jobs:
+        return Response(
+            {'error': 'Batch not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    counts = {}
+    for job in jobs:
+        counts[job.state] = counts.get(job.state, 0) + 1
+    finished = all(job.state in (UploadJob.SUCCEEDED, UploadJob.FAILED) for job in jobs)
+    return Response({
+        'batch_id': batch_id,
+        'finished': finished,
+        'counts': counts,
+        'jobs': UploadJobSerializer(jobs, many=True).data
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_upload_session(request):
+    serializer = UploadSessionSerializer(data=request.data)
     
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    if open_session_count(request.user) >= settings.UPLOAD_MAX_OPEN_SESSIONS:
+        return Response(
+            {'error': 'Too many unfinished uploads; finish or delete one first'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+    
+    session = serializer.save(owner=request.user)
+    return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+def _get_upload_session(request, upload_id):
     try:
-        df = parse_csv(file)
-        summary = compute_summary(df)
-        
-        file.seek(0)
-        file_name = default_storage.save(f'csv_files/{file.name}', ContentFile(file.read()))
-        
-        dataset = Dataset.objects.create(
-            file_path=file_name,
-            summary=summary
-        )
-        
-        datasets = Dataset.objects.order_by('-uploaded_at')
-        if datasets.count() > 5:
-            for old_dataset in datasets[5:]:
-                if old_dataset.file_path:
-                    default_storage.delete(old_dataset.file_path.name)
-                old_dataset.delete()
-        
-        return Response({
-            'message': 'CSV uploaded and processed successfully',
-            'dataset_id': dataset.id,
-            'summary': summary
-        }, status=status.HTTP_201_CREATED)
-        
-    except Exception as e:
+        return UploadSession.objects.get(pk=upload_id, owner=request.user)
+    except UploadSession.DoesNotExist:
+        return None
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_session_detail(request, upload_id):
+    session = _get_upload_session(request, upload_id)
+    if session is None:
         return Response(
-            {'error': str(e)},
+            {'error': 'Upload not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    if request.method == 'DELETE':
+        discard_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    return Response(UploadSessionSerializer(session).data)
+
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+def put_upload_chunk(request, upload_id, index):
+    session = _get_upload_session(request, upload_id)
+    if session is None:
+        return Response(
+            {'error': 'Upload not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    content_range = request.headers.get('Content-Range')
+    if content_range:
+        match = CONTENT_RANGE_RE.match(content_range)
+        start = index * session.chunk_size
+        end = min(start + session.chunk_size, session.size) - 1
+        if not match or (int(match.group(1)), int(match.group(2))) != (start, end):
+            return Response(
+                {'error': f'Chunk {index} covers bytes {start}-{end}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    try:
+        session = write_chunk(session, index, request.stream)
+    except ValidationError as e:
+        return Response(
+            {'error': ' '.join(e.messages)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response(UploadSessionSerializer(session).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def finalize_upload_session(request, upload_id):
+    session = _get_upload_session(request, upload_id)
+    if session is None:
+        return Response(
+            {'error': 'Upload not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        job, reused = finalize_session(session, request.data.get('sha256', ''))
+    except ValidationError as e:
+        return Response(
+            {'error': ' '.join(e.messages)},
             status=status.HTTP_400_BAD_REQUEST
         )
+    
+    return _job_response(job, reused)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_job(request, job_id):
+    try:
+        job = UploadJob.objects.get(pk=job_id, owner=request.user)
+    except UploadJob.DoesNotExist:
+        return Response(
+            {'error': 'Job not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response(UploadJobSerializer(job).data)
 
 
 @api_view(['GET'])
+@renderer_classes([*api_settings.DEFAULT_RENDERER_CLASSES, *COLUMNAR_RENDERERS])
 @permission_classes([IsAuthenticated])
+@conditional(latest_etag, latest_modified)
+@cached_response
 def get_summary(request):
     try:
-        latest_dataset = Dataset.objects.latest('uploaded_at')
-        return Response({
-            'summary': latest_dataset.summary,
+        fields = parse_fields(request, ['dataset_id', 'summary', 'uploaded_at'])
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        latest_dataset = Dataset.objects.owned_by(request.user).latest('uploaded_at')
+        summary = latest_dataset.public_summary()
+        # The rows are most of the work, only read them when asked for
+        if wants(fields, 'summary', 'equipment_data'):
+            if not isinstance(request.accepted_renderer, ColumnarRenderer):
+                summary['equipment_data'] = latest_dataset.equipment_data()
+            elif latest_dataset.artifact is None:
+                summary['equipment_data'] = Columns.from_rows(latest_dataset.equipment_data())
+            else:
+                summary['equipment_data'] = Columns.from_artifact(latest_dataset.artifact)
+        return Response(sparse({
+            'dataset_id': latest_dataset.id,
+            'summary': summary,
             'uploaded_at': latest_dataset.uploaded_at
-        })
+        }, fields))
     except Dataset.DoesNotExist:
         return Response(
             {'error': 'No datasets found'},
@@ -98,252 +309,331 @@ def get_summary(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(history_etag, history_modified)
+@cached_response
 def get_history(request):
-    datasets = Dataset.objects.all()[:5]
-    serializer = DatasetSerializer(datasets, many=True)
-    return Response(serializer.data)
+    try:
+        fields = parse_fields(request, list(DatasetHistorySerializer.Meta.fields))
+    except ValueError as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    datasets = Dataset.objects.owned_by(request.user).with_aggregates()[:HISTORY_SIZE]
+    serializer = DatasetHistorySerializer(datasets, many=True)
+    return Response([sparse(entry, fields) for entry in serializer.data])
 
 
 @api_view(['GET'])
+@renderer_classes([*api_settings.DEFAULT_RENDERER_CLASSES, *COLUMNAR_RENDERERS])
 @permission_classes([IsAuthenticated])
-def generate_pdf_report(request):
+def get_equipment(request, dataset_id):
+    if not Dataset.objects.owned_by(request.user).filter(pk=dataset_id).exists():
+        return Response(
+            {'error': 'Dataset not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    queryset = EquipmentRecord.objects.filter(dataset_id=dataset_id)
+    equipment_type = request.query_params.get('type')
+    if equipment_type:
+        queryset = queryset.filter(type=equipment_type)
+    
+    paginator = EquipmentKeysetPagination()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = EquipmentRecordSerializer(page, many=True)
+    if isinstance(request.accepted_renderer, ColumnarRenderer):
+        return paginator.get_paginated_response(Columns.from_rows(serializer.data, with_ids=True))
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_histograms(request, dataset_id):
     try:
-        latest_dataset = Dataset.objects.latest('uploaded_at')
-        summary = latest_dataset.summary
+        dataset = Dataset.objects.owned_by(request.user).get(pk=dataset_id)
     except Dataset.DoesNotExist:
         return Response(
-            {'error': 'No datasets found'},
+            {'error': 'Dataset not found'},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Generate password: first 4 letters of "equipment" + sum of total_count digits
-    base_name = "equipment_report"
-    first_four = base_name[:4]  # "equi"
+    artifact = dataset.artifact
+    histograms = artifact.read_json(HISTOGRAMS_FILE) if artifact else None
+    if histograms is None:
+        return Response(
+            {'error': 'No histograms for this dataset'},
+            status=status.HTTP_404_NOT_FOUND
+        )
     
-    # Logic: sum of digits in total_count
-    total_count = summary.get('total_count', 0)
-    digit_sum = sum(int(digit) for digit in str(total_count))
+    metric = request.query_params.get('metric')
+    if metric:
+        if metric not in histograms:
+            return Response(
+                {'error': f"metric must be one of: {', '.join(histograms)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        histograms = {metric: histograms[metric]}
     
-    pdf_password = f"{first_four}{digit_sum}"
+    return Response({
+        'dataset_id': dataset.id,
+        'histograms': histograms
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_comparison(request):
+    try:
+        ids = [int(request.query_params[key]) for key in ('a', 'b')]
+        limit = int(request.query_params.get('limit', settings.COMPARE_MAX_ITEMS))
+    except (KeyError, ValueError):
+        return Response(
+            {'error': 'a and b must be dataset ids, and limit an integer'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not 0 <= limit <= settings.COMPARE_MAX_ITEMS:
+        return Response(
+            {'error': f'limit must be between 0 and {settings.COMPARE_MAX_ITEMS}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                            rightMargin=72, leftMargin=72,
-                            topMargin=72, bottomMargin=72)
-    elements = []
-    styles = getSampleStyleSheet()
+    datasets = Dataset.objects.owned_by(request.user).in_bulk(ids)
+    if len(datasets) != len(set(ids)) or any(datasets[pk].artifact is None for pk in ids):
+        return Response(
+            {'error': 'Dataset not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
     
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Title'],
-        fontSize=24,
-        textColor=colors.HexColor('#2563eb'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
+    result = compare_datasets(datasets[ids[0]], datasets[ids[1]])
+    for key in ('added', 'removed'):
+        result[key] = result[key][:limit]
+    for metric in result['metrics'].values():
+        metric['largest'] = metric['largest'][:limit]
+    return Response(result)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_anomalies(request, dataset_id):
+    try:
+        dataset = Dataset.objects.owned_by(request.user).get(pk=dataset_id)
+    except Dataset.DoesNotExist:
+        return Response(
+            {'error': 'Dataset not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
     
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#1e293b'),
-        spaceAfter=12,
-        spaceBefore=20,
-        fontName='Helvetica-Bold'
-    )
+    artifact = dataset.artifact
+    meta = artifact.read_json(ANOMALIES_FILE) if artifact else None
+    if meta is None:
+        return Response(
+            {'error': 'No anomalies computed for this dataset'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    columns = [col.lower() for col in NUMERIC_COLUMNS]
+    metric = request.query_params.get('metric')
+    if metric and metric not in columns:
+        return Response(
+            {'error': f"metric must be one of: {', '.join(columns)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+        limit = int(request.query_params.get('limit', settings.EQUIPMENT_PAGE_SIZE))
+    except ValueError:
+        return Response(
+            {'error': 'offset and limit must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = min(max(limit, 1), settings.EQUIPMENT_MAX_PAGE_SIZE)
+    
+    rows = artifact.column('anomaly_rows')
+    flags = artifact.column('anomaly_flags')
+    selected = np.ones(len(rows), dtype=bool)
+    if metric:
+        selected &= (flags & (3 << (2 * columns.index(metric)))) != 0
+    equipment_type = request.query_params.get('type')
+    if equipment_type:
+        type_code = artifact.types.index(equipment_type) if equipment_type in artifact.types else -2
+        selected &= artifact.column('type')[rows] == type_code
+    
+    positions = np.flatnonzero(selected)
+    page = positions[offset:offset + limit]
+    page_rows = np.asarray(rows[page])
+    page_flags = np.asarray(flags[page])
+    scores = artifact.column('anomaly_scores')[page]
+    types = np.array(artifact.types + [None], dtype=object)[artifact.column('type')[page_rows]]
+    values = np.column_stack([artifact.metric(col)[page_rows] for col in NUMERIC_COLUMNS])
+    results = []
+    for j, row in enumerate(page_rows.tolist()):
+        result = {'row': row, 'Equipment Name': artifact.names(row, row + 1)[0], 'Type': types[j]}
+        for i, name in enumerate(columns):
+            result[name] = {
+                'value': None if np.isnan(values[j, i]) else float(values[j, i]),
+                'z': None if np.isnan(scores[j, i]) else float(scores[j, i]),
+                'z_outlier': bool(page_flags[j] & (1 << (2 * i))),
+                'iqr_outlier': bool(page_flags[j] & (1 << (2 * i + 1))),
+            }
+        results.append(result)
+    
+    next_url = None
+    if offset + limit < len(positions):
+        next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+    bounds = meta['bounds']
+    if metric:
+        bounds = {metric: bounds[metric]}
+    return Response({
+        'dataset_id': dataset.id,
+        'count': len(positions),
+        'z_threshold': meta['z_threshold'],
+        'iqr_factor': meta['iqr_factor'],
+        'bounds': bounds,
+        'next': next_url,
+        'results': results
+    })
+
+
+DEFAULT_QUANTILES = '0.5,0.9,0.95,0.99'
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_quantiles(request, dataset_id):
+    try:
+        dataset = Dataset.objects.owned_by(request.user).get(pk=dataset_id)
+    except Dataset.DoesNotExist:
+        return Response(
+            {'error': 'Dataset not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    try:
+        qs = [float(q) for q in request.query_params.get('q', DEFAULT_QUANTILES).split(',')]
+    except ValueError:
+        return Response(
+            {'error': 'q must be a comma-separated list of numbers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not all(0 <= q <= 1 for q in qs):
+        return Response(
+            {'error': 'Quantiles must be between 0 and 1'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    metric = request.query_params.get('metric')
+    columns = {col.lower(): col for col in NUMERIC_COLUMNS}
+    if metric and metric not in columns:
+        return Response(
+            {'error': f"metric must be one of: {', '.join(columns)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    sketches = dataset.sketches
+    equipment_type = request.query_params.get('type')
+    if sketches is None or (equipment_type and equipment_type not in sketches.by_type):
+        return Response(
+            {'error': 'No quantile sketch for this dataset and type'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    quantiles = {}
+    for name, col in columns.items():
+        if metric and name != metric:
+            continue
+        sketch = sketches.get(col, equipment_type)
+        values = sketch.quantile(qs)
+        errors = sketch.rank_error(qs)
+        quantiles[name] = {
+            'count': sketch.count,
+            'values': [
+                {
+                    'q': q,
+                    'value': None if values is None else float(values[i]),
+                    'rank_error': float(errors[i]),
+                }
+                for i, q in enumerate(qs)
+            ],
+        }
+    
+    return Response({
+        'dataset_id': dataset.id,
+        'type': equipment_type,
+        'quantiles': quantiles
+    })
+
+
+def _parse_time(value):
+    """An ISO date or datetime; naive values are in the server's time zone."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_trends(request):
+    columns = [col.lower() for col in NUMERIC_COLUMNS]
+    metrics = request.query_params.get('metric')
+    metrics = metrics.split(',') if metrics else columns
+    if not set(metrics) <= set(columns):
+        return Response(
+            {'error': f"metric must be one of: {', '.join(columns)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    bucket = request.query_params.get('bucket')
+    if bucket is not None and bucket not in BUCKETS:
+        return Response(
+            {'error': f"bucket must be one of: {', '.join(BUCKETS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        since, until = (
+            _parse_time(request.query_params[key]) if request.query_params.get(key) else None
+            for key in ('since', 'until')
+        )
+    except ValueError:
+        return Response(
+            {'error': 'since and until must be ISO dates or datetimes'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    title = Paragraph("Chemical Equipment Parameter Report", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    summary_heading = Paragraph("Summary Statistics", heading_style)
-    elements.append(summary_heading)
-    elements.append(Spacer(1, 0.15*inch))
-    
-    # Calculate Min/Max
-    equipment_data = summary.get('equipment_data', [])
-    min_flow = max_flow = min_press = max_press = min_temp = max_temp = 0
-    
-    if equipment_data:
-        flowrates = [float(d['Flowrate']) for d in equipment_data if d.get('Flowrate') is not None]
-        pressures = [float(d['Pressure']) for d in equipment_data if d.get('Pressure') is not None]
-        temperatures = [float(d['Temperature']) for d in equipment_data if d.get('Temperature') is not None]
-        
-        if flowrates:
-            min_flow, max_flow = min(flowrates), max(flowrates)
-        if pressures:
-            min_press, max_press = min(pressures), max(pressures)
-        if temperatures:
-            min_temp, max_temp = min(temperatures), max(temperatures)
-
-    summary_data = [
-        ['Metric', 'Value', 'Min', 'Max'],
-        ['Total Equipment Count', str(summary['total_count']), '-', '-'],
-        ['Flowrate', f"{summary['avg_flowrate']:.2f}", f"{min_flow:.2f}", f"{max_flow:.2f}"],
-        ['Pressure', f"{summary['avg_pressure']:.2f}", f"{min_press:.2f}", f"{max_press:.2f}"],
-        ['Temperature', f"{summary['avg_temperature']:.2f}", f"{min_temp:.2f}", f"{max_temp:.2f}"],
-    ]
-    
-    summary_table = Table(summary_data, colWidths=[2.5*inch, 1.5*inch, 1*inch, 1*inch])
-    summary_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#1e293b')),
-        ('FONTSIZE', (0, 1), (-1, -1), 11),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e2e8f0')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 1), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 10),
-    ]))
-    elements.append(summary_table)
-    elements.append(Spacer(1, 0.4*inch))
-    
-    type_heading = Paragraph("Equipment Type Distribution", heading_style)
-    elements.append(type_heading)
-    elements.append(Spacer(1, 0.15*inch))
-    
-    type_data = [['Equipment Type', 'Count']]
-    for eq_type, count in summary['type_distribution'].items():
-        type_data.append([str(eq_type), str(count)])
-    
-    type_table = Table(type_data, colWidths=[4*inch, 2*inch])
-    type_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#7c3aed')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('TOPPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#1e293b')),
-        ('FONTSIZE', (0, 1), (-1, -1), 11),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e2e8f0')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 12),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 1), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 10),
-    ]))
-    elements.append(type_table)
-    elements.append(Spacer(1, 0.4*inch))
-
-    # Top 10 Equipment Table
-    if equipment_data:
-        top_heading = Paragraph("Top 10 Equipment Data", heading_style)
-        elements.append(top_heading)
-        elements.append(Spacer(1, 0.15*inch))
-
-        top_data = [['Name', 'Type', 'Flow', 'Press', 'Temp']]
-        for item in equipment_data[:10]:
-            top_data.append([
-                str(item.get('Equipment Name', '')),
-                str(item.get('Type', '')),
-                f"{float(item.get('Flowrate', 0)):.2f}",
-                f"{float(item.get('Pressure', 0)):.2f}",
-                f"{float(item.get('Temperature', 0)):.2f}"
-            ])
-        
-        top_table = Table(top_data, colWidths=[2*inch, 1.5*inch, 0.8*inch, 0.8*inch, 0.9*inch])
-        top_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0f172a')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            ('TOPPADDING', (0, 0), (-1, 0), 8),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8fafc')),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#1e293b')),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e2e8f0')),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        elements.append(top_table)
-        elements.append(Spacer(1, 0.4*inch))
-
-    
-    charts_heading = Paragraph("Visualizations", heading_style)
-    elements.append(charts_heading)
-    elements.append(Spacer(1, 0.15*inch))
-    
-    chart_buffer1 = io.BytesIO()
-    fig1, ax1 = plt.subplots(figsize=(6, 4))
-    types = list(summary['type_distribution'].keys())
-    counts = list(summary['type_distribution'].values())
-    colors_list = ['#2563eb', '#7c3aed', '#10b981', '#f59e0b', '#ef4444']
-    ax1.pie(counts, labels=types, autopct='%1.1f%%', colors=colors_list[:len(types)], 
-            startangle=90, textprops={'fontsize': 10, 'fontweight': 'bold'})
-    ax1.set_title('Equipment Type Distribution', fontsize=14, fontweight='bold', pad=20)
-    plt.tight_layout()
-    plt.savefig(chart_buffer1, format='png', dpi=150, bbox_inches='tight')
-    plt.close()
-    chart_buffer1.seek(0)
-    
-    chart_img1 = Image(chart_buffer1, width=5*inch, height=3.3*inch)
-    elements.append(chart_img1)
-    elements.append(Spacer(1, 0.3*inch))
-    
-    chart_buffer2 = io.BytesIO()
-    fig2, ax2 = plt.subplots(figsize=(6, 4))
-    stats = ['Flowrate', 'Pressure', 'Temperature']
-    values = [
-        summary['avg_flowrate'],
-        summary['avg_pressure'],
-        summary['avg_temperature']
-    ]
-    bars = ax2.bar(stats, values, color=['#2563eb', '#10b981', '#f59e0b'], 
-                    edgecolor='white', linewidth=1.5)
-    ax2.set_title('Average Statistics', fontsize=14, fontweight='bold', pad=20)
-    ax2.set_ylabel('Value', fontweight='bold', fontsize=11)
-    ax2.grid(True, alpha=0.3, axis='y', linestyle='--')
-    ax2.set_axisbelow(True)
-    
-    for bar in bars:
-        height = bar.get_height()
-        ax2.text(bar.get_x() + bar.get_width()/2., height,
-                f'{height:.2f}', ha='center', va='bottom', 
-                fontweight='bold', fontsize=10)
-    
-    plt.tight_layout()
-    plt.savefig(chart_buffer2, format='png', dpi=150, bbox_inches='tight')
-    plt.close()
-    chart_buffer2.seek(0)
-    
-    chart_img2 = Image(chart_buffer2, width=5*inch, height=3.3*inch)
-    elements.append(chart_img2)
-    
-    # Build PDF with password protection
-    doc.build(elements, canvasmaker=lambda *args, **kwargs: EncryptedCanvas(pdf_password, *args, **kwargs))
-    buffer.seek(0)
-    
-    response = HttpResponse(buffer.read(), content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename="equipment_report.pdf"'
-    return response
-
-
-# Custom Canvas class for PDF encryption
-from reportlab.pdfgen import canvas as pdfgen_canvas
-from reportlab.lib.pdfencrypt import StandardEncryption
-
-class EncryptedCanvas(pdfgen_canvas.Canvas):
-    def __init__(self, password, *args, **kwargs):
-        # Create encryption object
-        enc = StandardEncryption(password, password, canPrint=1, canModify=0, canCopy=0, canAnnotate=0)
-        kwargs['encrypt'] = enc
-        super().__init__(*args, **kwargs)
-    
-    def save(self):
-        super().save()
+    equipment_type = request.query_params.get('type')
+    return Response({
+        'type': equipment_type,
+        'bucket': bucket,
+        'series': metric_trends(request.user, metrics, equipment_type, since, until, bucket)
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional(report_etag, latest_modified)
+def generate_pdf_report(request):
+    try:
+        latest_dataset = Dataset.objects.owned_by(request.user).latest('uploaded_at')
+    except Dataset.DoesNotExist:
+        return Response(
+            {'error': 'No datasets found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    
+    path = ensure_report(latest_dataset)
+    if path is None:
+        response = HttpResponse(render_report(latest_dataset), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{REPORT_FILENAME}"'
+        return response
+    return ranged_file_response(
+        request, path, REPORT_FILENAME,
+        etag=report_etag(request), last_modified=latest_modified(request),
+    )
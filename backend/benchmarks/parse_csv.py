@@ -0,0 +1,110 @@
+"""
+CSV parser benchmark
+Compares the old inferred-dtype parse with the typed parser on a generated
+file. Run from backend/:  python benchmarks/parse_csv.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chemviz.settings')
+
+import django
+django.setup()
+
+from analytics.utils import NUMERIC_COLUMNS, SummaryAccumulator, iter_csv_chunks, parse_csv, pyarrow
+
+
+TYPES = ['Pump', 'Valve', 'Compressor', 'Heat Exchanger', 'Reactor', 'Condenser']
+
+
+def write_csv(path, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Equipment Name': [f'EQ-{i}' for i in range(rows)],
+        'Type': rng.choice(TYPES, rows),
+        'Flowrate': rng.normal(100, 15, rows).round(2),
+        'Pressure': rng.normal(5, 1, rows).round(3),
+        'Temperature': rng.normal(80, 10, rows).round(1),
+        'Notes': 'n/a',
+    })
+    df.to_csv(path, index=False)
+
+
+def inferred_parse(path):
+    # What parse_csv + compute_summary did before the schema existed
+    df = pd.read_csv(path)
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+def typed_parse(engine):
+    def parse(path):
+        with open(path, 'rb') as f:
+            return parse_csv(f, engine=engine)
+    return parse
+
+
+def inferred_stream(path, chunksize):
+    accumulator = SummaryAccumulator()
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        accumulator.update(chunk)
+    return accumulator.summary()
+
+
+def typed_stream(engine, chunksize):
+    def parse(path):
+        accumulator = SummaryAccumulator()
+        with open(path, 'rb') as f:
+            for chunk in iter_csv_chunks(f, chunksize, engine=engine):
+                accumulator.update(chunk)
+        return accumulator.summary()
+    return parse
+
+
+def measure(label, func, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frame_mb = ''
+    if isinstance(result, pd.DataFrame):
+        frame_mb = f'{result.memory_usage(deep=True).sum() / 2 ** 20:10.1f}'
+    print(f'{label:<32}{elapsed:10.2f}{peak / 2 ** 20:12.1f}{frame_mb:>12}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    args = parser.parse_args()
+
+    engines = ['c'] + (['pyarrow'] if pyarrow is not None else [])
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'equipment.csv')
+        write_csv(path, args.rows)
+        print(f'{args.rows} rows, {os.path.getsize(path) / 2 ** 20:.1f} MiB')
+        print(f'{"":<32}{"seconds":>10}{"peak MiB":>12}{"frame MiB":>12}')
+
+        measure('whole file, inferred', inferred_parse, path)
+        for engine in engines:
+            measure(f'whole file, typed ({engine})', typed_parse(engine), path)
+
+        measure('chunked summary, inferred', lambda p: inferred_stream(p, args.chunksize), path)
+        for engine in engines:
+            measure(f'chunked summary, typed ({engine})', typed_stream(engine, args.chunksize), path)
+
+
+if __name__ == '__main__':
+    main()
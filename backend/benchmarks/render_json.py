@@ -0,0 +1,77 @@
+"""
+JSON renderer benchmark
+Encodes a summary payload with DRF's stdlib JSONRenderer and with
+ORJSONRenderer. Run from backend/:  python benchmarks/render_json.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chemviz.settings')
+
+import django
+django.setup()
+
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from analytics.renderers import ORJSONRenderer, orjson
+
+
+TYPES = ['Pump', 'Valve', 'Compressor', 'Heat Exchanger', 'Reactor', 'Condenser']
+
+
+def summary_payload(rows, seed=0):
+    """A get_summary body with ``rows`` rows of ``equipment_data``."""
+    rng = np.random.default_rng(seed)
+    flowrate = rng.normal(100, 15, rows).round(2)
+    flowrate[rng.random(rows) < 0.01] = np.nan
+    df = pd.DataFrame({
+        'Equipment Name': [f'EQ-{i}' for i in range(rows)],
+        'Type': rng.choice(TYPES, rows),
+        'Flowrate': flowrate,
+        'Pressure': rng.normal(5, 1, rows).round(3),
+        'Temperature': rng.normal(80, 10, rows).round(1),
+    })
+    # As ColumnStore.records() builds them
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    return {
+        'dataset_id': 1,
+        'summary': {'total_count': rows, 'equipment_data': records},
+        'uploaded_at': timezone.now(),
+    }
+
+
+def measure(label, renderer, data, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        content = renderer.render(data)
+        best = min(best, time.perf_counter() - started)
+    size = len(content) / 2 ** 20
+    print(f'{label:<24}{best:10.3f}{size:10.1f}{size / best:12.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = summary_payload(args.rows)
+    print(f'{args.rows} rows')
+    print(f'{"":<24}{"seconds":>10}{"MiB":>10}{"MiB/s":>12}')
+    measure('stdlib (JSONRenderer)', JSONRenderer(), data, args.repeat)
+    if orjson is not None:
+        measure('orjson (ORJSONRenderer)', ORJSONRenderer(), data, args.repeat)
+    else:
+        print('orjson is not installed')
+
+
+if __name__ == '__main__':
+    main()
@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'analytics.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -82,6 +83,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Upload workers write from separate processes
+        'OPTIONS': {'timeout': 20},
     }
 }
 
@@ -128,6 +131,77 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'uploads'
 
+# CSV ingestion
+# Uploads are read in chunks of this many rows so memory use stays bounded
+CSV_CHUNK_SIZE = int(os.environ.get('CSV_CHUNK_SIZE', '50000'))
+# Rows per INSERT when copying equipment rows into EquipmentRecord
+EQUIPMENT_BULK_BATCH_SIZE = int(os.environ.get('EQUIPMENT_BULK_BATCH_SIZE', '5000'))
+# Default and maximum page size of the equipment endpoint
+EQUIPMENT_PAGE_SIZE = int(os.environ.get('EQUIPMENT_PAGE_SIZE', '100'))
+EQUIPMENT_MAX_PAGE_SIZE = int(os.environ.get('EQUIPMENT_MAX_PAGE_SIZE', '1000'))
+# Equal-width bins of the fixed histograms, and the cap on adaptive bins
+HISTOGRAM_BINS = int(os.environ.get('HISTOGRAM_BINS', '20'))
+HISTOGRAM_MAX_BINS = int(os.environ.get('HISTOGRAM_MAX_BINS', '100'))
+# Most equipment listed per section of a dataset comparison
+COMPARE_MAX_ITEMS = int(os.environ.get('COMPARE_MAX_ITEMS', '1000'))
+# Anomalies: robust z-score (median/MAD) limit and Tukey fence factor, per type
+ANOMALY_Z_THRESHOLD = float(os.environ.get('ANOMALY_Z_THRESHOLD', '3.5'))
+ANOMALY_IQR_FACTOR = float(os.environ.get('ANOMALY_IQR_FACTOR', '1.5'))
+
+# Upload processing
+# Uploads are parsed by a local process pool of UPLOAD_WORKERS processes
+# (never more than the CPU count); eager mode runs them inline
+UPLOAD_WORKERS = int(os.environ.get('UPLOAD_WORKERS', '2'))
+UPLOAD_JOBS_EAGER = os.environ.get('UPLOAD_JOBS_EAGER', 'False') == 'True'
+# Running jobs without progress for this many seconds are failed when the
+# process pool starts
+UPLOAD_JOB_STALE_AFTER = int(os.environ.get('UPLOAD_JOB_STALE_AFTER', '900'))
+# Chunk size of resumable uploads (/api/uploads/)
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+# Largest resumable upload, and unfinished ones each user may have open
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', str(1024 * 1024 * 1024)))
+UPLOAD_MAX_OPEN_SESSIONS = int(os.environ.get('UPLOAD_MAX_OPEN_SESSIONS', '4'))
+# Compressed uploads fail once they inflate past this many bytes
+UPLOAD_MAX_DECOMPRESSED_SIZE = int(os.environ.get('UPLOAD_MAX_DECOMPRESSED_SIZE', str(4 * 1024 * 1024 * 1024)))
+# Seconds after their last chunk that the janitor discards upload sessions
+UPLOAD_SESSION_EXPIRY = int(os.environ.get('UPLOAD_SESSION_EXPIRY', str(24 * 60 * 60)))
+
+# Dataset retention (0 turns a limit off; the newest dataset is always kept)
+RETENTION_KEEP_DATASETS = int(os.environ.get('RETENTION_KEEP_DATASETS', '5'))
+RETENTION_MAX_AGE_DAYS = int(os.environ.get('RETENTION_MAX_AGE_DAYS', '0'))
+RETENTION_MAX_BYTES = int(os.environ.get('RETENTION_MAX_BYTES', '0'))
+# Seconds between janitor sweeps; finished uploads also trigger one
+RETENTION_INTERVAL = int(os.environ.get('RETENTION_INTERVAL', '300'))
+# Datasets deleted per transaction
+RETENTION_DELETE_BATCH = int(os.environ.get('RETENTION_DELETE_BATCH', '100'))
+
+# Username that migration 0017 gives the datasets uploaded before datasets
+# had owners; the first superuser when empty
+LEGACY_DATASET_OWNER = os.environ.get('LEGACY_DATASET_OWNER', '')
+
+# Cache
+# Shared by all processes only with a shared backend, e.g.
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# Seconds a cached summary/history response is kept; uploads and retention
+# make new requests miss right away, so this only bounds memory use
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '3600'))
+
+# Render each dataset's PDF report in the upload worker right after ingest,
+# rather than on its first download
+REPORT_PRERENDER = os.environ.get('REPORT_PRERENDER', 'True') == 'True'
+
+# Compression of /api/ responses (brotli when installed, else gzip):
+# smallest body worth compressing, in bytes, and the encoder levels
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -142,6 +216,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson when installed, DRF's stdlib encoder otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'analytics.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'analytics.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # CORS settings
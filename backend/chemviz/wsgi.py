@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'chemviz.settings')
 
 application = get_wsgi_application()
+
+# Periodic retention sweeps and upload session expiry run in the serving
+# process; see analytics.retention
+from analytics.retention import start_janitor  # noqa: E402
+
+start_janitor()
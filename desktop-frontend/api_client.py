@@ -1,44 +1,338 @@
 import requests
 import base64
+import gzip
+import hashlib
 import json
+import os
+import shutil
+import tempfile
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Files larger than this are sent through the resumable upload API
+RESUMABLE_THRESHOLD = 8 * 1024 * 1024
+# Unfinished resumable uploads, so they can continue after a restart
+UPLOAD_STATE_PATH = os.path.join(os.path.expanduser('~'), '.flowdesk_uploads.json')
+# Files with these extensions are already compressed and are sent as they are
+COMPRESSED_EXTENSIONS = ('.gz', '.zst', '.zip')
+METRIC_COLUMNS = ('Flowrate', 'Pressure', 'Temperature')
+
+
+def decode_columns(packed):
+    """Equipment columns of a MessagePack response as NumPy arrays."""
+    offsets = np.frombuffer(packed['Equipment Name']['offsets'], dtype='<i8')
+    data = packed['Equipment Name']['data']
+    columns = {}
+    if 'id' in packed:
+        columns['id'] = np.frombuffer(packed['id'], dtype='<i8')
+    columns['Equipment Name'] = [
+        data[low:high].decode('utf-8') for low, high in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+    categories = np.array(packed['Type']['categories'] + [None], dtype=object)
+    columns['Type'] = categories[np.frombuffer(packed['Type']['codes'], dtype='<i4')]
+    for col in METRIC_COLUMNS:
+        # Read-only views of the response body; missing values are NaN
+        columns[col] = np.frombuffer(packed[col], dtype='<f8')
+    return columns
 
 
 class APIClient:
     def __init__(self, base_url='http://localhost:8000/api'):
         self.base_url = base_url
         self.auth_header = None
+        # (url, Accept) -> (ETag, last response body), for conditional requests
+        self._validators = {}
     
     def set_auth(self, username, password):
         credentials = f"{username}:{password}"
         encoded = base64.b64encode(credentials.encode()).decode()
         self.auth_header = {'Authorization': f'Basic {encoded}'}
+        self._validators.clear()
     
-    def upload_csv(self, file_path):
-        url = f"{self.base_url}/upload/"
-        with open(file_path, 'rb') as f:
-            files = {'file': f}
-            response = requests.post(url, files=files, headers=self.auth_header)
+    def _get_conditional(self, url, accept=None):
+        """GET ``url``, reusing the last body when the server answers 304."""
+        headers = dict(self.auth_header or {})
+        if accept:
+            headers['Accept'] = accept
+        key = (url, accept)
+        cached = self._validators.get(key)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        response = requests.get(url, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        response.raise_for_status()
+        etag = response.headers.get('ETag')
+        if etag:
+            self._validators[key] = (etag, response.content)
+        else:
+            self._validators.pop(key, None)
+        return response.content
+    
+    def upload_csv(self, file_path, wait=True, compress=True):
+        """Upload a CSV, gzip compressing it on the way unless it already is."""
+        compress = compress and not file_path.lower().endswith(COMPRESSED_EXTENSIONS)
+        if os.path.getsize(file_path) > RESUMABLE_THRESHOLD:
+            accepted = self.upload_csv_resumable(file_path, compress=compress)
+        elif compress:
+            with open(file_path, 'rb') as f:
+                body = gzip.compress(f.read(), mtime=0)
+            headers = dict(self.auth_header or {})
+            headers['Content-Type'] = 'text/csv'
+            headers['Content-Encoding'] = 'gzip'
+            headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(file_path)}"'
+            response = requests.post(f"{self.base_url}/upload/", data=body, headers=headers)
             response.raise_for_status()
-            return response.json()
+            accepted = response.json()
+        else:
+            url = f"{self.base_url}/upload/"
+            with open(file_path, 'rb') as f:
+                files = {'file': f}
+                response = requests.post(url, files=files, headers=self.auth_header)
+                response.raise_for_status()
+            accepted = response.json()
+        if not wait:
+            return accepted
+        return self.wait_for_job(accepted['job_id'])
     
-    def get_summary(self):
-        url = f"{self.base_url}/summary/"
+    def upload_batch(self, file_paths, wait=True, compress=True):
+        """Upload several CSVs (or zips of them) in one request.
+        
+        The server processes the files in parallel; each one gets its own
+        job and succeeds or fails on its own.
+        """
+        files = []
+        for file_path in file_paths:
+            name = os.path.basename(file_path)
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            if compress and not name.lower().endswith(COMPRESSED_EXTENSIONS):
+                name, data = f"{name}.gz", gzip.compress(data, mtime=0)
+            files.append(('files', (name, data)))
+        response = requests.post(f"{self.base_url}/upload/batch/", files=files, headers=self.auth_header)
+        response.raise_for_status()
+        accepted = response.json()
+        if not wait:
+            return accepted
+        # Files the server rejected up front (e.g. non-CSV zip members) have no job
+        rejected = [item for item in accepted['files'] if 'error' in item]
+        if len(rejected) == len(accepted['files']):
+            batch = {'batch_id': accepted['batch_id'], 'finished': True, 'counts': {}, 'jobs': []}
+        else:
+            batch = self.wait_for_batch(accepted['batch_id'])
+        batch['rejected'] = rejected
+        return batch
+    
+    def get_batch(self, batch_id):
+        url = f"{self.base_url}/batches/{batch_id}/"
         response = requests.get(url, headers=self.auth_header)
         response.raise_for_status()
         return response.json()
     
-    def get_history(self):
-        url = f"{self.base_url}/history/"
+    def wait_for_batch(self, batch_id, poll_interval=1.0, timeout=None):
+        started = time.monotonic()
+        while True:
+            batch = self.get_batch(batch_id)
+            if batch['finished']:
+                return batch
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Upload batch {batch_id} did not finish in {timeout} seconds")
+            time.sleep(poll_interval)
+    
+    def upload_csv_resumable(self, file_path, retries=3, progress=None, compress=False):
+        """Upload in chunks, skipping chunks the server already has.
+        
+        An interrupted upload of the same unchanged file picks up where it
+        stopped, even after the application was restarted. With ``compress``
+        a gzip copy is uploaded instead; it is written without a timestamp,
+        so the copy made after a restart has the same bytes.
+        """
+        key = self._upload_key(file_path)
+        if compress:
+            copy_path = self._gzip_copy(file_path, key)
+            try:
+                return self._upload_resumable(copy_path, key, retries, progress)
+            finally:
+                os.remove(copy_path)
+        return self._upload_resumable(file_path, key, retries, progress)
+    
+    def _gzip_copy(self, file_path, key):
+        name = hashlib.sha256(key.encode()).hexdigest()[:16]
+        copy_path = os.path.join(tempfile.gettempdir(), f"flowdesk-{name}-{os.path.basename(file_path)}.gz")
+        with open(file_path, 'rb') as src, open(copy_path, 'wb') as raw:
+            with gzip.GzipFile(filename='', fileobj=raw, mode='wb', mtime=0) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        return copy_path
+    
+    def _upload_resumable(self, file_path, key, retries, progress):
+        size = os.path.getsize(file_path)
+        session = self._resume_upload(key)
+        if session is None or session['size'] != size:
+            response = requests.post(
+                f"{self.base_url}/uploads/",
+                json={'filename': os.path.basename(file_path), 'size': size},
+                headers=self.auth_header
+            )
+            response.raise_for_status()
+            session = response.json()
+            self._save_upload_state(key, session['upload_id'])
+        
+        session_url = f"{self.base_url}/uploads/{session['upload_id']}/"
+        chunk_size = session['chunk_size']
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for index in range(session['chunk_count']):
+                data = f.read(chunk_size)
+                digest.update(data)
+                start, end = index * chunk_size, index * chunk_size + len(data)
+                if any(low <= start and end <= high for low, high in session['received']):
+                    continue
+                self._put_chunk(f"{session_url}chunks/{index}/", data, start, size, retries)
+                if progress:
+                    progress(end / size)
+        
+        response = requests.post(
+            f"{session_url}finalize/",
+            json={'sha256': digest.hexdigest()},
+            headers=self.auth_header
+        )
+        response.raise_for_status()
+        self._save_upload_state(key, None)
+        return response.json()
+    
+    def _put_chunk(self, url, data, start, size, retries):
+        headers = dict(self.auth_header or {})
+        headers['Content-Type'] = 'application/octet-stream'
+        headers['Content-Range'] = f"bytes {start}-{start + len(data) - 1}/{size}"
+        for attempt in range(retries + 1):
+            try:
+                response = requests.put(url, data=data, headers=headers)
+                response.raise_for_status()
+                return
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+    
+    def _upload_key(self, file_path):
+        stat = os.stat(file_path)
+        return f"{self.base_url}|{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    
+    def _load_upload_state(self):
+        try:
+            with open(UPLOAD_STATE_PATH) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_upload_state(self, key, upload_id):
+        state = self._load_upload_state()
+        if upload_id is None:
+            state.pop(key, None)
+        else:
+            state[key] = upload_id
+        with open(UPLOAD_STATE_PATH, 'w') as f:
+            json.dump(state, f)
+    
+    def _resume_upload(self, key):
+        upload_id = self._load_upload_state().get(key)
+        if not upload_id:
+            return None
+        response = requests.get(f"{self.base_url}/uploads/{upload_id}/", headers=self.auth_header)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        session = response.json()
+        return None if session['job_id'] else session
+    
+    def get_job(self, job_id):
+        url = f"{self.base_url}/jobs/{job_id}/"
         response = requests.get(url, headers=self.auth_header)
         response.raise_for_status()
         return response.json()
     
-    def download_pdf(self, save_path):
-        url = f"{self.base_url}/report/pdf/"
-        response = requests.get(url, headers=self.auth_header, stream=True)
+    def wait_for_job(self, job_id, poll_interval=1.0, timeout=None):
+        started = time.monotonic()
+        while True:
+            job = self.get_job(job_id)
+            if job['state'] == 'succeeded':
+                return job
+            if job['state'] == 'failed':
+                raise RuntimeError(job['error'] or 'Upload processing failed')
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Upload job {job_id} did not finish in {timeout} seconds")
+            time.sleep(poll_interval)
+    
+    def get_summary(self, fields=None):
+        """The latest dataset's summary; ``fields`` lists the ``?fields=``
+        paths to fetch, e.g. ``['dataset_id', 'summary.total_count']``,
+        instead of the whole body with every equipment row."""
+        url = f"{self.base_url}/summary/"
+        if fields:
+            url += '?' + urlencode({'fields': ','.join(fields)})
+        return json.loads(self._get_conditional(url))
+    
+    def get_summary_columns(self):
+        """Like ``get_summary``, with ``equipment_data`` as NumPy columns
+        (see ``decode_columns``); needs the msgpack package."""
+        if msgpack is None:
+            raise RuntimeError('get_summary_columns needs the msgpack package')
+        body = msgpack.unpackb(self._get_conditional(f"{self.base_url}/summary/", accept='application/msgpack'))
+        body['summary']['equipment_data'] = decode_columns(body['summary']['equipment_data'])
+        return body
+    
+    def get_equipment(self, dataset_id, cursor=None, page_size=None, equipment_type=None, sort=None):
+        url = f"{self.base_url}/datasets/{dataset_id}/equipment/"
+        params = {
+            'cursor': cursor,
+            'page_size': page_size,
+            'type': equipment_type,
+            'sort': sort,
+        }
+        params = {key: value for key, value in params.items() if value is not None}
+        response = requests.get(url, params=params, headers=self.auth_header)
+        response.raise_for_status()
+        return response.json()
+    
+    def get_histograms(self, dataset_id, metric=None):
+        url = f"{self.base_url}/datasets/{dataset_id}/histograms/"
+        params = {'metric': metric} if metric else None
+        response = requests.get(url, params=params, headers=self.auth_header)
         response.raise_for_status()
+        return response.json()
+    
+    def get_quantiles(self, dataset_id, quantiles=(0.5, 0.9, 0.95, 0.99), metric=None, equipment_type=None):
+        url = f"{self.base_url}/datasets/{dataset_id}/quantiles/"
+        params = {
+            'q': ','.join(str(q) for q in quantiles),
+            'metric': metric,
+            'type': equipment_type,
+        }
+        params = {key: value for key, value in params.items() if value is not None}
+        response = requests.get(url, params=params, headers=self.auth_header)
+        response.raise_for_status()
+        return response.json()
+    
+    def get_equipment_page(self, next_url):
+        response = requests.get(next_url, headers=self.auth_header)
+        response.raise_for_status()
+        return response.json()
+    
+    def get_history(self):
+        return json.loads(self._get_conditional(f"{self.base_url}/history/"))
+    
+    def download_pdf(self, save_path):
+        content = self._get_conditional(f"{self.base_url}/report/pdf/")
         with open(save_path, 'wb') as f:
-            f.write(response.content)
+            f.write(content)
     
     def register(self, username, email, password):
         url = f"{self.base_url}/register/"
@@ -14,6 +14,21 @@ import ctypes
 import sys
 
 
+# Rows fetched per request for the equipment table
+EQUIPMENT_PAGE_SIZE = 200
+# The parts of /api/summary/ the cards and charts use; the equipment rows
+# come page by page from the equipment endpoint instead
+SUMMARY_FIELDS = [
+    'dataset_id',
+    'summary.total_count',
+    'summary.avg_flowrate',
+    'summary.avg_pressure',
+    'summary.avg_temperature',
+    'summary.type_distribution',
+    'summary.stats',
+]
+
+
 class LoadingDialog(QDialog):
     def __init__(self, message, parent=None):
         super().__init__(parent)
@@ -118,6 +133,8 @@ class MainWindow(QMainWindow):
         self.client = APIClient()
         self.client.set_auth(username, password)
         self.current_summary = None
+        self.current_dataset_id = None
+        self.equipment_next = None
         self.setWindowTitle('Chemical Equipment Parameter Visualizer')
         self.setWindowIcon(self.create_emoji_icon("🧪"))
         self.is_dark = True  # Enforce dark mode
@@ -453,6 +470,11 @@ class MainWindow(QMainWindow):
         value_label.setObjectName(f'value_{key}')
         layout.addWidget(value_label)
         
+        detail_label = QLabel('')
+        detail_label.setStyleSheet("color: #71717a; font-size: 11px;")
+        detail_label.setObjectName(f'detail_{key}')
+        layout.addWidget(detail_label)
+        
         return card
 
     def create_charts_section(self):
@@ -478,6 +500,15 @@ class MainWindow(QMainWindow):
         self.chart_canvas.setMinimumHeight(400)
         left_layout.addWidget(self.chart_canvas)
         
+        hist_title = QLabel("Metric Distributions")
+        hist_title.setStyleSheet("font-size: 15px; font-weight: 600; color: #fafafa; margin-bottom: 10px;")
+        left_layout.addWidget(hist_title)
+        
+        self.hist_canvas = FigureCanvas(Figure(figsize=(8, 3)))
+        self.hist_canvas.figure.patch.set_facecolor('#09090b')
+        self.hist_canvas.setMinimumHeight(220)
+        left_layout.addWidget(self.hist_canvas)
+        
         layout.addWidget(left_widget, 1) # Stretch factor 1
         
         # Right: Progress Bars (Analytics Overview)
@@ -554,6 +585,12 @@ class MainWindow(QMainWindow):
         self.table.setMinimumHeight(400)
         layout.addWidget(self.table)
         
+        self.load_more_btn = QPushButton('Load more')
+        self.load_more_btn.setObjectName('secondary')
+        self.load_more_btn.clicked.connect(self.load_more_equipment)
+        self.load_more_btn.setVisible(False)
+        layout.addWidget(self.load_more_btn, alignment=Qt.AlignRight)
+        
         return container
     
     def create_history_tab(self):
@@ -568,23 +605,40 @@ class MainWindow(QMainWindow):
         return widget
     
     def upload_csv(self):
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, 'Select CSV File', '', 'CSV Files (*.csv)'
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, 'Select CSV Files', '', 'CSV Files (*.csv *.csv.gz *.csv.zst *.zip)'
         )
         
-        if file_path:
-            progress = LoadingDialog('Uploading CSV file...', self)
+        if file_paths:
+            batch = len(file_paths) > 1 or file_paths[0].lower().endswith('.zip')
+            progress = LoadingDialog('Uploading CSV files...' if batch else 'Uploading CSV file...', self)
             progress.show()
             QApplication.processEvents()
             
-            self.worker = APIWorker(self.client.upload_csv, file_path)
+            if batch:
+                self.worker = APIWorker(self.client.upload_batch, file_paths)
+            else:
+                self.worker = APIWorker(self.client.upload_csv, file_paths[0])
             
             def on_upload_finished(result):
                 progress.close()
-                self.current_summary = result['summary']
-                self.update_ui()
-                self.load_history(show_loading=False)
-                self.show_message(QMessageBox.Information, 'Success', 'CSV uploaded successfully')
+                self.load_summary(show_loading=False)
+                if not batch:
+                    self.show_message(QMessageBox.Information, 'Success', 'CSV uploaded successfully')
+                    return
+                failed = [
+                    f"{item['filename']}: {item['error']}"
+                    for item in result['jobs'] + result['rejected']
+                    if item.get('error')
+                ]
+                uploaded = len(result['jobs']) + len(result['rejected']) - len(failed)
+                if failed:
+                    self.show_message(
+                        QMessageBox.Warning, 'Upload finished',
+                        f"{uploaded} file(s) uploaded, {len(failed)} failed:\n" + '\n'.join(failed)
+                    )
+                else:
+                    self.show_message(QMessageBox.Information, 'Success', f'{uploaded} CSV files uploaded successfully')
             
             def on_upload_error(error):
                 progress.close()
@@ -599,12 +653,13 @@ class MainWindow(QMainWindow):
         progress.show()
         QApplication.processEvents()
         
-        self.worker = APIWorker(self.client.get_summary)
+        self.worker = APIWorker(self.client.get_summary, SUMMARY_FIELDS)
         
         def on_refresh_finished(result):
             progress.close()
             if result:
                 self.current_summary = result['summary']
+                self.current_dataset_id = result.get('dataset_id')
                 self.update_ui()
                 self.load_history(show_loading=False)
                 self.show_message(QMessageBox.Information, 'Success', 'Data refreshed successfully!')
@@ -626,12 +681,13 @@ class MainWindow(QMainWindow):
         else:
             progress = None
         
-        self.worker = APIWorker(self.client.get_summary)
+        self.worker = APIWorker(self.client.get_summary, SUMMARY_FIELDS)
         
         def on_summary_finished(data):
             if progress:
                 progress.close()
             self.current_summary = data['summary']
+            self.current_dataset_id = data.get('dataset_id')
             self.update_ui()
             self.load_history(show_loading=show_loading)
         
@@ -657,27 +713,68 @@ class MainWindow(QMainWindow):
                     value_widget.setText(str(self.current_summary[key]))
                 else:
                     value_widget.setText(f"{self.current_summary[key]:.2f}")
+            detail_widget = card.findChild(QLabel, f'detail_{key}')
+            if detail_widget:
+                detail_widget.setText(self.metric_detail(key))
         
         self.update_table()
         self.update_charts()
     
+    def metric_stats(self, key):
+        """Precomputed overall statistics for an ``avg_<metric>`` key, if any."""
+        overall = self.current_summary.get('stats', {}).get('overall', {})
+        return overall.get(key[len('avg_'):]) if key.startswith('avg_') else None
+    
+    def metric_detail(self, key):
+        stats = self.metric_stats(key)
+        if not stats:
+            return ''
+        fmt = lambda value: '-' if value is None else f"{value:.2f}"
+        return f"p50 {fmt(stats['p50'])} · p95 {fmt(stats['p95'])} · max {fmt(stats['max'])}"
+    
     def update_table(self):
-        if not self.current_summary or 'equipment_data' not in self.current_summary:
-            return
-        
-        data = self.current_summary['equipment_data']
-        if not data:
+        if not self.current_dataset_id:
             return
         
         headers = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
         self.table.setColumnCount(len(headers))
         self.table.setHorizontalHeaderLabels(headers)
-        self.table.setRowCount(len(data))
+        self.table.setRowCount(0)
+        self.load_more_btn.setVisible(False)
+        
+        # Only the first page is fetched; further pages load on demand
+        self.equipment_worker = APIWorker(
+            self.client.get_equipment, self.current_dataset_id, page_size=EQUIPMENT_PAGE_SIZE
+        )
+        self.equipment_worker.finished.connect(self.append_equipment_page)
+        self.equipment_worker.error.connect(
+            lambda error: self.show_message(QMessageBox.Warning, 'Error', f'Failed to load equipment: {error}')
+        )
+        self.equipment_worker.start()
+    
+    def load_more_equipment(self):
+        if not self.equipment_next:
+            return
+        
+        self.load_more_btn.setEnabled(False)
+        self.equipment_worker = APIWorker(self.client.get_equipment_page, self.equipment_next)
+        self.equipment_worker.finished.connect(self.append_equipment_page)
+        self.equipment_worker.error.connect(lambda error: self.load_more_btn.setEnabled(True))
+        self.equipment_worker.start()
+    
+    def append_equipment_page(self, page):
+        data = page['results']
+        self.equipment_next = page['next']
+        self.load_more_btn.setEnabled(True)
+        self.load_more_btn.setVisible(bool(self.equipment_next))
+        
+        first_row = self.table.rowCount()
+        self.table.setRowCount(first_row + len(data))
         
         # Monospace font for numbers
         mono_font = QFont("Consolas", 10)
         
-        for row, item in enumerate(data):
+        for row, item in enumerate(data, start=first_row):
             # Equipment Name
             name_item = QTableWidgetItem(str(item.get('Equipment Name', '')))
             name_item.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
@@ -749,10 +846,44 @@ class MainWindow(QMainWindow):
                 if val_label:
                     val_label.setText(f"{val:.2f}")
                 
-                # Update Progress Bar
+                # Update Progress Bar, scaled to the dataset's own maximum
                 if hasattr(self, 'progress_bars') and key in self.progress_bars:
+                    stats = self.metric_stats(key)
+                    if stats and stats['max']:
+                        max_val = max(int(stats['max']), 1)
                     pbar = self.progress_bars[key]
+                    pbar.setRange(0, max_val)
                     pbar.setValue(int(min(val, max_val)))
+        
+        # 3. Distribution charts, from the histograms computed at upload
+        if self.current_dataset_id:
+            self.histogram_worker = APIWorker(self.client.get_histograms, self.current_dataset_id)
+            self.histogram_worker.finished.connect(self.draw_histograms)
+            self.histogram_worker.error.connect(lambda error: self.draw_histograms({'histograms': {}}))
+            self.histogram_worker.start()
+    
+    def draw_histograms(self, data):
+        fig = self.hist_canvas.figure
+        fig.clear()
+        fig.patch.set_facecolor('#09090b')
+        
+        metrics = [('flowrate', 'Flowrate', '#f97316'), ('pressure', 'Pressure', '#8b5cf6'),
+                   ('temperature', 'Temperature', '#fb923c')]
+        for i, (metric, label, color) in enumerate(metrics, start=1):
+            ax = fig.add_subplot(1, len(metrics), i)
+            ax.set_facecolor('#09090b')
+            ax.set_title(label, color='#a1a1aa', fontsize=10)
+            ax.tick_params(colors='#a1a1aa', labelsize=8)
+            
+            # Adaptive bins fit each metric's spread better than the fixed ones
+            overall = data['histograms'].get(metric, {}).get('adaptive', {}).get('overall', {})
+            edges, counts = overall.get('edges', []), overall.get('counts', [])
+            if counts:
+                widths = [high - low for low, high in zip(edges, edges[1:])]
+                ax.bar(edges[:-1], counts, width=widths, align='edge', color=color, edgecolor='#09090b')
+        
+        fig.tight_layout()
+        self.hist_canvas.draw()
     
     def load_history(self, show_loading=True):
         if show_loading:
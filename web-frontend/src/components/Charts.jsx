@@ -1,3 +1,4 @@
+import { useState } from 'react'
 import { Pie, Bar } from 'react-chartjs-2'
 import {
   Chart as ChartJS,
@@ -21,7 +22,11 @@ ChartJS.register(
   Title
 )
 
-const Charts = ({ summary }) => {
+const HISTOGRAM_METRICS = ['flowrate', 'pressure', 'temperature']
+
+const Charts = ({ summary, histograms }) => {
+  const [histogramMetric, setHistogramMetric] = useState('flowrate')
+
   const typeDistributionData = {
     labels: Object.keys(summary.type_distribution),
     datasets: [
@@ -95,11 +100,14 @@ const Charts = ({ summary }) => {
     }
   }
 
+  // Percentiles come precomputed in summary.stats; older summaries only have averages
+  const metrics = ['flowrate', 'pressure', 'temperature']
+  const overall = summary.stats?.overall
   const statisticsData = {
     labels: ['Flowrate', 'Pressure', 'Temperature'],
     datasets: [
       {
-        label: 'Average Values',
+        label: 'Average',
         data: [
           summary.avg_flowrate,
           summary.avg_pressure,
@@ -110,6 +118,24 @@ const Charts = ({ summary }) => {
         borderWidth: 1,
         borderRadius: 4,
       },
+      ...(overall ? [
+        {
+          label: 'Median (p50)',
+          data: metrics.map((metric) => overall[metric].p50),
+          backgroundColor: 'rgba(59, 130, 246, 0.6)', // Blue
+          borderColor: 'rgba(59, 130, 246, 1)',
+          borderWidth: 1,
+          borderRadius: 4,
+        },
+        {
+          label: 'p95',
+          data: metrics.map((metric) => overall[metric].p95),
+          backgroundColor: 'rgba(249, 115, 22, 0.6)', // Orange
+          borderColor: 'rgba(249, 115, 22, 1)',
+          borderWidth: 1,
+          borderRadius: 4,
+        },
+      ] : []),
     ],
   }
 
@@ -149,11 +175,31 @@ const Charts = ({ summary }) => {
     plugins: {
       ...commonOptions.plugins,
       legend: {
-        display: false // Hide legend for bar chart as it's redundant
+        ...commonOptions.plugins.legend,
+        display: Boolean(overall) // Only needed once percentiles are shown
       }
     }
   }
 
+  // Distributions come pre-binned from the server, a few dozen counts per metric
+  const histogram = histograms?.[histogramMetric]?.fixed
+  const histogramData = histogram && {
+    labels: histogram.overall.map((_, i) =>
+      `${histogram.edges[i].toFixed(1)}–${histogram.edges[i + 1].toFixed(1)}`
+    ),
+    datasets: [
+      {
+        label: 'Equipment Count',
+        data: histogram.overall,
+        backgroundColor: 'rgba(59, 130, 246, 0.6)', // Blue
+        borderColor: 'rgba(59, 130, 246, 1)',
+        borderWidth: 1,
+        barPercentage: 1,
+        categoryPercentage: 1,
+      },
+    ],
+  }
+
   return (
     <div className="charts-grid">
       <div className="chart-wrapper">
@@ -163,11 +209,32 @@ const Charts = ({ summary }) => {
         </div>
       </div>
       <div className="chart-wrapper">
-        <h3>Average Statistics</h3>
+        <h3>{overall ? 'Average and Percentiles' : 'Average Statistics'}</h3>
         <div className="chart-container">
           <Bar data={statisticsData} options={barOptions} />
         </div>
       </div>
+      {histogramData && (
+        <div className="chart-wrapper">
+          <h3>
+            Distribution
+            <select
+              className="histogram-metric"
+              value={histogramMetric}
+              onChange={(e) => setHistogramMetric(e.target.value)}
+            >
+              {HISTOGRAM_METRICS.map((metric) => (
+                <option key={metric} value={metric}>
+                  {metric.charAt(0).toUpperCase() + metric.slice(1)}
+                </option>
+              ))}
+            </select>
+          </h3>
+          <div className="chart-container">
+            <Bar data={histogramData} options={{ ...barOptions, plugins: { ...barOptions.plugins, legend: { display: false } } }} />
+          </div>
+        </div>
+      )}
     </div>
   )
 }
@@ -1,6 +1,15 @@
 import { BarChart3, Droplets, Zap, Thermometer } from 'lucide-react'
 import './SummaryCards.css'
 
+const formatStat = (value) => (value === null || value === undefined ? '-' : value.toFixed(2))
+
+// Spread of a metric from the statistics computed at upload time
+const metricDetail = (summary, metric) => {
+  const stats = summary.stats?.overall?.[metric]
+  if (!stats) return null
+  return `min ${formatStat(stats.min)} · p50 ${formatStat(stats.p50)} · p95 ${formatStat(stats.p95)} · max ${formatStat(stats.max)}`
+}
+
 const SummaryCards = ({ summary }) => {
   const cards = [
     {
@@ -12,18 +21,21 @@ const SummaryCards = ({ summary }) => {
     {
       label: 'Avg Flowrate',
       value: summary.avg_flowrate.toFixed(2),
+      detail: metricDetail(summary, 'flowrate'),
       color: '#3b82f6', // Blue
       icon: <Droplets size={24} />
     },
     {
       label: 'Avg Pressure',
       value: summary.avg_pressure.toFixed(2),
+      detail: metricDetail(summary, 'pressure'),
       color: '#eab308', // Yellow
       icon: <Zap size={24} />
     },
     {
       label: 'Avg Temperature',
       value: summary.avg_temperature.toFixed(2),
+      detail: metricDetail(summary, 'temperature'),
       color: '#ef4444', // Red
       icon: <Thermometer size={24} />
     }
@@ -41,6 +53,7 @@ const SummaryCards = ({ summary }) => {
             <div className="summary-card-value">
               {card.value}
             </div>
+            {card.detail && <div className="summary-card-detail">{card.detail}</div>}
           </div>
         </div>
       ))}
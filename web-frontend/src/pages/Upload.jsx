@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
-import { uploadCSV, getSummary, downloadPDF } from '../services/api'
+import { uploadCSV, waitForJob, getSummary, getHistograms, downloadPDF } from '../services/api'
 import { useTheme } from '../contexts/ThemeContext'
 import EquipmentTable from '../components/EquipmentTable'
 import SummaryCards from '../components/SummaryCards'
@@ -11,6 +11,7 @@ const Upload = ({ onLogout }) => {
   const { isDark, toggleTheme } = useTheme()
   const [file, setFile] = useState(null)
   const [summary, setSummary] = useState(null)
+  const [histograms, setHistograms] = useState(null)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState('')
   const [uploaded, setUploaded] = useState(false)
@@ -24,11 +25,21 @@ const Upload = ({ onLogout }) => {
       const data = await getSummary()
       setSummary(data.summary)
       setUploaded(true)
+      loadHistograms(data.dataset_id)
     } catch (err) {
       console.log('No existing data')
     }
   }
 
+  const loadHistograms = async (datasetId) => {
+    try {
+      const data = await getHistograms(datasetId)
+      setHistograms(data.histograms)
+    } catch (err) {
+      setHistograms(null)
+    }
+  }
+
   const handleFileChange = (e) => {
     setFile(e.target.files[0])
     setError('')
@@ -45,13 +56,13 @@ const Upload = ({ onLogout }) => {
     setError('')
 
     try {
-      const result = await uploadCSV(file)
-      setSummary(result.summary)
-      setUploaded(true)
+      const { job_id } = await uploadCSV(file)
+      await waitForJob(job_id)
+      await loadSummary()
       setFile(null)
       document.getElementById('file-input').value = ''
     } catch (err) {
-      setError(err.response?.data?.error || 'Upload failed')
+      setError(err.response?.data?.error || err.message || 'Upload failed')
     } finally {
       setLoading(false)
     }
@@ -98,7 +109,7 @@ const Upload = ({ onLogout }) => {
             <input
               id="file-input"
               type="file"
-              accept=".csv"
+              accept=".csv,.gz,.zst,.zip"
               onChange={handleFileChange}
               className="input"
             />
@@ -113,7 +124,7 @@ const Upload = ({ onLogout }) => {
           <>
             <SummaryCards summary={summary} />
             <div style={{ marginBottom: '32px' }}>
-              <Charts summary={summary} />
+              <Charts summary={summary} histograms={histograms} />
             </div>
             <EquipmentTable data={summary.equipment_data} />
           </>
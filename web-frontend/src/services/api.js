@@ -55,6 +55,27 @@ export const uploadCSV = async (file) => {
   return response.data
 }
 
+export const getJob = async (jobId) => {
+  const response = await axios.get(
+    `${API_BASE_URL}/jobs/${jobId}/`,
+    getAuthHeader()
+  )
+  return response.data
+}
+
+export const waitForJob = async (jobId, pollInterval = 1000) => {
+  for (;;) {
+    const job = await getJob(jobId)
+    if (job.state === 'succeeded') {
+      return job
+    }
+    if (job.state === 'failed') {
+      throw new Error(job.error || 'Upload processing failed')
+    }
+    await new Promise((resolve) => setTimeout(resolve, pollInterval))
+  }
+}
+
 export const getSummary = async () => {
   const response = await axios.get(
     `${API_BASE_URL}/summary/`,
@@ -63,6 +84,22 @@ export const getSummary = async () => {
   return response.data
 }
 
+export const getHistograms = async (datasetId, metric) => {
+  const response = await axios.get(
+    `${API_BASE_URL}/datasets/${datasetId}/histograms/`,
+    { ...getAuthHeader(), params: { metric } }
+  )
+  return response.data
+}
+
+export const getQuantiles = async (datasetId, { quantiles = [0.5, 0.9, 0.95, 0.99], metric, type } = {}) => {
+  const response = await axios.get(
+    `${API_BASE_URL}/datasets/${datasetId}/quantiles/`,
+    { ...getAuthHeader(), params: { q: quantiles.join(','), metric, type } }
+  )
+  return response.data
+}
+
 export const getHistory = async () => {
   const response = await axios.get(
     `${API_BASE_URL}/history/`,